@@ -5,30 +5,57 @@ import time
 import logging
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
 
 import aiohttp
 from nio import (
+    Api,
     AsyncClient,
     AsyncClientConfig,
     InviteMemberEvent,
     JoinError,
     LoginResponse,
     MatrixRoom,
+    RoomMessageFile,
     RoomMessageText,
     SyncResponse,
+    UploadFilterResponse,
 )
 
-from app.commands import handle_note, handle_status, handle_todo
-from app.config import load_config
+from app.commands import registry
+from app.compaction import Compactor
+from app.config import Config, load_config
+from app.dispatch import RoomDispatcher
+from app.health import HealthProber
+from app.media import MediaTooLarge, download_to_file
 from app.monitor import Monitor, MonitorConfig
-from app.reminders.commands import handle_remind
-from app.reminders.repository import ReminderRepository
-from app.reminders.service import ReminderService
+from app.outbox import (
+    PRIORITY_ALERT,
+    PRIORITY_REMINDER,
+    PRIORITY_REPLY,
+    Outbox,
+    send_client,
+)
+from app.policy import Policy, compile_policy
+from app.reload import ConfigReloader
+from app.reminders.commands import handle_remind_attachment
+from app.reminders.ipc import ScheduleLink
+from app.reminders.worker import (
+    REMINDER_MODES,
+    ReminderProcess,
+    build_reminder_service,
+    db_options,
+    ipc_socket_path,
+    reminder_settings,
+)
+from app.startup import StartupReport
 from app.storage import Storage
+from app.sync import SYNC_PROFILES, SyncTokenStore, build_sync_filter, filter_digest
 
 
 AUTH_FILE = "auth.json"
+SYNC_TOKEN_FILE = "sync_token"
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
@@ -42,25 +69,38 @@ def now_ms() -> int:
     return int(time.time() * 1000)
 
 
+def _monitor_config(cfg: Config) -> MonitorConfig:
+    return MonitorConfig(
+        interval_sec=cfg.monitor_interval_sec,
+        alert_cooldown_min=cfg.alert_cooldown_min,
+        cpu_threshold=cfg.cpu_threshold,
+        cpu_consecutive=cfg.cpu_consecutive,
+        ram_threshold=cfg.ram_threshold,
+        disk_threshold=cfg.disk_threshold,
+        loadavg_threshold=cfg.loadavg_threshold,
+        loadavg_auto_per_core=cfg.loadavg_auto_per_core,
+    )
+
+
 class MatrixBot:
-    def __init__(self):
+    def __init__(self, startup: Optional[StartupReport] = None):
+        self.startup = startup or StartupReport()
         self.cfg = load_config()
+        self.policy = compile_policy(self.cfg)
         self.started_ms = now_ms()
+        if self.cfg.sync_profile not in SYNC_PROFILES:
+            raise RuntimeError(f"SYNC_PROFILE must be one of {', '.join(SYNC_PROFILES)}")
+        if self.cfg.reminder_mode not in REMINDER_MODES:
+            raise RuntimeError(f"REMINDER_MODE must be one of {', '.join(REMINDER_MODES)}")
         self.tz = ZoneInfo(self.cfg.timezone)
         self.last_sync_ms: Optional[int] = None
-
-        self._ensure_writable_dir(
-            self.cfg.store_path,
-            "STORE_PATH 不可寫入，請在 docker-compose.yml 掛 volume 並修正權限。",
-        )
-        self._ensure_writable_dir(
-            self.cfg.data_path,
-            "DATA_PATH 不可寫入，請在 docker-compose.yml 掛 volume 並修正權限。",
-        )
-        reminders_db_path = os.path.join(self.cfg.data_path, "reminders.db")
+        self._first_sync_started = 0.0
+        self.pending_imports: Dict[Tuple[str, str], float] = {}
 
         self.auth_path = os.path.join(self.cfg.store_path, AUTH_FILE)
-        self.auth = self._load_auth()
+        # Loaded in run(), once STORE_PATH has been checked.
+        self.auth: dict = {}
+        self.sync_tokens = SyncTokenStore(os.path.join(self.cfg.store_path, SYNC_TOKEN_FILE))
 
         client_config = AsyncClientConfig(
             encryption_enabled=False,
@@ -74,26 +114,51 @@ class MatrixBot:
             config=client_config,
         )
         self.client.user_agent = f"matrix-bot ({self.cfg.bot_user_id})"
+        self.send_client = send_client(self.cfg.homeserver_url, self.cfg.bot_user_id)
+        self.send_client.user_agent = self.client.user_agent
+        self.outbox = Outbox(
+            self.send_client,
+            rate=self.cfg.send_rate,
+            burst=self.cfg.send_burst,
+            room_rate=self.cfg.send_room_rate,
+            room_burst=self.cfg.send_room_burst,
+            concurrency=self.cfg.send_concurrency,
+        )
         logger.info("STORE_PATH=%s", self.cfg.store_path)
 
-        self.storage = Storage(os.path.join(self.cfg.data_path, "bot.db"))
-        self.reminder_service = ReminderService(
-            repository=ReminderRepository(reminders_db_path),
-            poll_interval_seconds=self.cfg.poll_interval_seconds,
-            default_tz=self.cfg.timezone,
+        self.storage = Storage(os.path.join(self.cfg.data_path, "bot.db"), **db_options(self.cfg))
+        # In process mode the main process still parses and stores reminders;
+        # dispatching runs in app.reminders.worker, which is told about
+        # schedule changes over a Unix socket.
+        self.reminder_link: Optional[ScheduleLink] = None
+        self.reminder_process: Optional[ReminderProcess] = None
+        if self.cfg.reminder_mode == "process":
+            self.reminder_link = ScheduleLink(ipc_socket_path(self.cfg))
+            self.reminder_process = ReminderProcess()
+        self.reminder_service = build_reminder_service(self.cfg, scheduler=self.reminder_link)
+        self.compactor = Compactor(
+            storage=self.storage,
+            repository=self.reminder_service.repository,
+            retention_days=self.cfg.retention_days,
+            batch_size=self.cfg.compaction_batch_size,
         )
-        self.monitor = Monitor(
-            MonitorConfig(
-                interval_sec=self.cfg.monitor_interval_sec,
-                alert_cooldown_min=self.cfg.alert_cooldown_min,
-                cpu_threshold=self.cfg.cpu_threshold,
-                cpu_consecutive=self.cfg.cpu_consecutive,
-                ram_threshold=self.cfg.ram_threshold,
-                disk_threshold=self.cfg.disk_threshold,
-                loadavg_threshold=self.cfg.loadavg_threshold,
-                loadavg_auto_per_core=self.cfg.loadavg_auto_per_core,
-            )
+        # The aiohttp session is created in run(), inside the event loop.
+        self.http: Optional[aiohttp.ClientSession] = None
+        self.health = HealthProber(
+            self.cfg.homeserver_url,
+            interval_sec=self.cfg.health_interval_sec,
+            ttl_sec=self.cfg.health_ttl_sec,
+        )
+        self.dispatcher = RoomDispatcher(
+            workers=self.cfg.command_workers,
+            room_queue_max=self.cfg.command_queue_max,
+        )
+        self.monitor = Monitor(_monitor_config(self.cfg))
+        self.reloader = ConfigReloader(
+            self.cfg, self._apply_config, interval_sec=self.cfg.config_watch_interval_sec
         )
+        self._sync_task: Optional[asyncio.Task] = None
+        self._resync = False
 
     def _ensure_writable_dir(self, path: str, error_message: str) -> None:
         os.makedirs(path, exist_ok=True)
@@ -118,54 +183,82 @@ class MatrixBot:
         with open(self.auth_path, "w", encoding="utf-8") as f:
             json.dump(self.auth, f)
 
-    def _is_admin(self, user_id: str) -> bool:
-        return user_id in self.cfg.admin_users
+    def _is_admin(self, user_id: str, room_id: Optional[str] = None) -> bool:
+        return self.policy.is_admin(user_id, room_id)
+
+    def _allow_public(self, room_id: Optional[str] = None) -> bool:
+        return self.policy.allow_public(room_id)
 
     def _room_allowed(self, room_id: str) -> bool:
-        return room_id in self.cfg.allowed_rooms
+        return self.policy.room_allowed(room_id)
+
+    async def _apply_config(self, cfg: Config, policy: Policy, changed: List[str]) -> None:
+        # Called by ConfigReloader with a config where only hot fields changed.
+        # Everything that can fail is built first, so a bad value leaves the
+        # running config untouched.
+        tz = ZoneInfo(cfg.timezone)
+        monitor_config = _monitor_config(cfg)
+        settings = reminder_settings(cfg)
+        self.cfg, self.policy, self.tz = cfg, policy, tz
+        self.monitor.update_config(monitor_config)
+        self.reminder_service.apply_settings(**settings)
+        if self.reminder_link is not None:
+            # The worker keeps its own copy of the config.
+            self.reminder_link.request_reload()
+        self.compactor.retention_days = cfg.retention_days
+        self.health.interval_sec = cfg.health_interval_sec
+        self.health.ttl_sec = cfg.health_ttl_sec
+        # The lean sync filter names the allowed rooms: restart the sync loop
+        # with a new filter, resuming from the current token.
+        if (
+            cfg.sync_profile == "lean"
+            and {"allowed_rooms", "sync_timeline_limit"} & set(changed)
+            and self._sync_task is not None
+        ):
+            self._resync = True
+            self._sync_task.cancel()
 
     def _format_ts(self, ms: int) -> str:
         dt = datetime.fromtimestamp(ms / 1000, tz=self.tz)
         return dt.strftime("%Y-%m-%d %H:%M:%S %Z")
 
-    async def _health_check(self) -> str:
-        url = self.cfg.homeserver_url.rstrip("/") + "/_matrix/client/versions"
+    async def _download_to(self, mxc_url: str, path: str, max_bytes: int) -> bool:
+        # Raises MediaTooLarge past max_bytes; nio's download has no cap.
+        url = urlparse(mxc_url)
+        _, media_path = Api.download(url.netloc, url.path.lstrip("/"))
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=5) as resp:
-                    if resp.status == 200:
-                        return "OK"
-                    return f"HTTP {resp.status}"
+            await download_to_file(
+                self.http,
+                self.cfg.homeserver_url.rstrip("/") + media_path,
+                path,
+                max_bytes=max_bytes,
+                headers={"Authorization": f"Bearer {self.client.access_token}"},
+            )
+        except MediaTooLarge:
+            raise
         except Exception:
-            return "FAILED"
+            logger.exception("Download failed for %s", mxc_url)
+            return False
+        return True
 
-    async def _send_text(self, room_id: str, message: str) -> None:
+    async def _send_text(
+        self, room_id: str, message: str, *, priority: int = PRIORITY_REPLY
+    ) -> None:
         try:
-            await self.client.room_send(
-                room_id=room_id,
-                message_type="m.room.message",
-                content={"msgtype": "m.text", "body": message},
-            )
+            await self.outbox.send_text(room_id, message, priority=priority)
         except Exception:
             logger.exception("Failed to send message to %s", room_id)
 
     async def _send_text_strict(self, room_id: str, message: str) -> None:
-        await self.client.room_send(
-            room_id=room_id,
-            message_type="m.room.message",
-            content={"msgtype": "m.text", "body": message},
-        )
+        # Raises on failure so ReminderService can record and retry it.
+        await self.outbox.send_text(room_id, message, priority=PRIORITY_REMINDER)
 
     async def _send_markdown(self, room_id: str, message: str) -> None:
-        await self.client.room_send(
-            room_id=room_id,
-            message_type="m.room.message",
-            content={"msgtype": "m.text", "body": message},
-        )
+        await self.outbox.send_text(room_id, message)
 
     async def _handle_invite(self, room: MatrixRoom, event: InviteMemberEvent) -> None:
         try:
-            if not self._is_admin(event.sender):
+            if not self._is_admin(event.sender, room.room_id):
                 logger.info("Ignore invite from non-admin: %s", event.sender)
                 return
             resp = await self.client.join(room.room_id)
@@ -188,47 +281,77 @@ class MatrixBot:
                 return
 
             body = event.body.strip()
-            if body.startswith("!status"):
-                if not self._is_admin(event.sender):
-                    return
-                await handle_status(self, room.room_id)
-                return
-            if body.startswith("!ping"):
-                await self._send_text(room.room_id, "pong")
+            if not body.startswith("!"):
                 return
+            # Handled on the worker pool so a slow command does not hold up
+            # the sync loop or other rooms.
+            self.dispatcher.submit(
+                room.room_id,
+                lambda: registry.dispatch(self, room.room_id, event.sender, body),
+            )
+        except Exception:
+            logger.exception("Message handler error in room %s", room.room_id)
 
-            if body.startswith("!todo"):
-                await handle_todo(self, room.room_id, event.sender, body)
+    async def _handle_file(self, room: MatrixRoom, event: RoomMessageFile) -> None:
+        try:
+            if event.sender == self.client.user_id:
                 return
-
-            if body.startswith("!note"):
-                await handle_note(self, room.room_id, event.sender, body)
+            if event.server_timestamp < self.started_ms:
                 return
-
-            if body.startswith("!remind"):
-                await handle_remind(self, room.room_id, event.sender, body)
+            if not self._room_allowed(room.room_id):
+                return
+            if getattr(room, "encrypted", False):
                 return
+            if (room.room_id, event.sender) not in self.pending_imports:
+                return
+            info = event.source.get("content", {}).get("info", {}) or {}
+            # Same room queue as commands, so an upload stays ordered after
+            # the `!remind import` that announced it.
+            self.dispatcher.submit(
+                room.room_id,
+                lambda: handle_remind_attachment(
+                    self,
+                    room.room_id,
+                    event.sender,
+                    event.body or "",
+                    event.url,
+                    int(info.get("size") or 0),
+                ),
+            )
         except Exception:
-            logger.exception("Message handler error in room %s", room.room_id)
+            logger.exception("File handler error in room %s", room.room_id)
 
     async def _monitor_loop(self) -> None:
         while True:
             try:
-                metrics = self.monitor.collect()
+                metrics = await asyncio.to_thread(self.monitor.collect)
                 alert_msg, recovery_msg = self.monitor.evaluate(metrics)
                 room_id = self.cfg.alert_room_id or (
                     self.cfg.allowed_rooms[0] if self.cfg.allowed_rooms else None
                 )
                 if room_id:
                     if alert_msg:
-                        await self._send_text(room_id, alert_msg)
+                        await self._send_text(room_id, alert_msg, priority=PRIORITY_ALERT)
                     if recovery_msg:
-                        await self._send_text(room_id, recovery_msg)
+                        await self._send_text(room_id, recovery_msg, priority=PRIORITY_ALERT)
                 await asyncio.sleep(self.cfg.monitor_interval_sec)
             except Exception:
                 logger.exception("Monitor loop error")
                 await asyncio.sleep(self.cfg.monitor_interval_sec)
 
+    async def _db_maintenance_loop(self) -> None:
+        databases = [self.storage.db, self.reminder_service.repository.db]
+        while True:
+            await asyncio.sleep(self.cfg.db_maintenance_interval_sec)
+            quiet_sec = max(1, self.cfg.db_maintenance_quiet_sec)
+            for db in databases:
+                while db.idle_seconds() < quiet_sec:
+                    await asyncio.sleep(quiet_sec)
+                try:
+                    await db.run_maintenance()
+                except Exception:
+                    logger.exception("DB maintenance error for %s", db.db_path)
+
     async def _login(self) -> None:
         if self.cfg.bot_access_token:
             self.client.access_token = self.cfg.bot_access_token
@@ -272,16 +395,111 @@ class MatrixBot:
 
     async def _register_handlers(self) -> None:
         self.client.add_event_callback(self._handle_message, RoomMessageText)
+        self.client.add_event_callback(self._handle_file, RoomMessageFile)
         self.client.add_event_callback(self._handle_invite, InviteMemberEvent)
         async def on_sync(resp: SyncResponse):
+            if self.last_sync_ms is None:
+                self.startup.record("first sync", self._first_sync_started)
+                self.startup.finish()
             self.last_sync_ms = now_ms()
+            if self.cfg.sync_profile == "lean":
+                self.sync_tokens.save(resp.next_batch)
 
         self.client.add_response_callback(on_sync, SyncResponse)
 
+    async def _sync_filter_id(self, sync_filter: Dict) -> Union[str, Dict]:
+        # Uploaded once and reused across restarts; re-uploaded when the
+        # filter changes (e.g. ALLOWED_ROOMS). Falls back to the inline filter.
+        digest = filter_digest(sync_filter)
+        if self.auth.get("sync_filter_digest") == digest and self.auth.get("sync_filter_id"):
+            return self.auth["sync_filter_id"]
+        resp = await self.client.upload_filter(**sync_filter)
+        if isinstance(resp, UploadFilterResponse):
+            self.auth["sync_filter_id"] = resp.filter_id
+            self.auth["sync_filter_digest"] = digest
+            self._save_auth()
+            logger.info("Uploaded sync filter %s", resp.filter_id)
+            return resp.filter_id
+        logger.warning("Filter upload failed, using inline filter: %s", resp)
+        return sync_filter
+
+    async def _sync_options(self) -> Dict:
+        if self.cfg.sync_profile == "full":
+            return {"full_state": True}
+        sync_filter = self._lean_sync_filter()
+        # The first sync fetches no timeline: messages sent while the bot was
+        # down would be dropped by the started_ms check anyway. Resuming from
+        # the stored token also skips the initial sync's room state; if the
+        # token was rejected, nio retries as an initial sync.
+        return {
+            "sync_filter": await self._sync_filter_id(sync_filter),
+            "first_sync_filter": build_sync_filter(self.cfg.allowed_rooms, timeline_limit=0),
+            "since": self.sync_tokens.load(),
+            "full_state": False,
+        }
+
+    def _lean_sync_filter(self) -> Dict:
+        return build_sync_filter(
+            self.cfg.allowed_rooms, timeline_limit=self.cfg.sync_timeline_limit
+        )
+
+    async def _run_sync(self, sync_options: Dict) -> None:
+        while True:
+            self._sync_task = asyncio.create_task(
+                self.client.sync_forever(timeout=30000, **sync_options)
+            )
+            try:
+                await self._sync_task
+                return
+            except asyncio.CancelledError:
+                if not self._resync:
+                    raise
+            self._resync = False
+            # Continue from client.next_batch: no backlog skip, no full state.
+            sync_options = {
+                "sync_filter": await self._sync_filter_id(self._lean_sync_filter()),
+                "full_state": False,
+            }
+            logger.info("Sync restarted with the updated room filter")
+
+    async def _prepare_databases(self) -> None:
+        report = self.startup
+        await report.timed(
+            "data dir",
+            asyncio.to_thread(
+                self._ensure_writable_dir,
+                self.cfg.data_path,
+                "DATA_PATH 不可寫入，請在 docker-compose.yml 掛 volume 並修正權限。",
+            ),
+        )
+        # Opening each database also runs its migrations / schema checks.
+        await asyncio.gather(
+            report.timed("bot.db", self.storage.init()),
+            report.timed("reminders.db", self.reminder_service.init()),
+        )
+
+    async def _prepare_session(self) -> Dict:
+        report = self.startup
+        await report.timed(
+            "store dir",
+            asyncio.to_thread(
+                self._ensure_writable_dir,
+                self.cfg.store_path,
+                "STORE_PATH 不可寫入，請在 docker-compose.yml 掛 volume 並修正權限。",
+            ),
+        )
+        self.auth = self._load_auth()
+        await report.timed("login", self._login())
+        self.send_client.access_token = self.client.access_token
+        self.send_client.device_id = self.client.device_id
+        return await report.timed("sync filter", self._sync_options())
+
     async def run(self) -> None:
-        await self.storage.init()
-        await self.reminder_service.init()
-        await self._login()
+        # Database setup does not depend on the homeserver, so it runs while
+        # login and filter setup wait on the network.
+        _, sync_options = await asyncio.gather(
+            self._prepare_databases(), self._prepare_session()
+        )
         await self._register_handlers()
         logger.info(
             "Bot started. User=%s Device=%s Rooms=%d",
@@ -289,13 +507,47 @@ class MatrixBot:
             self.client.device_id,
             len(self.client.rooms),
         )
-        asyncio.create_task(self._monitor_loop())
-        asyncio.create_task(self.reminder_service.run_loop(self._send_text_strict))
-        await self.client.sync_forever(timeout=30000, full_state=True)
+        self.http = aiohttp.ClientSession()
+        self.health.session = self.http
+        self.dispatcher.start()
+        self.reloader.install_signal_handler()
+        tasks = [
+            asyncio.create_task(self.health.run_loop()),
+            asyncio.create_task(self.reloader.run()),
+            asyncio.create_task(self._monitor_loop()),
+            asyncio.create_task(self._db_maintenance_loop()),
+            asyncio.create_task(self.compactor.run_loop(self.cfg.compaction_interval_sec)),
+        ]
+        if self.reminder_process is not None:
+            # Started after login so a password login's token is in auth.json.
+            tasks.append(asyncio.create_task(self.reminder_process.run()))
+            tasks.append(asyncio.create_task(self.reminder_link.run()))
+        else:
+            tasks.append(
+                asyncio.create_task(self.reminder_service.run_loop(self._send_text_strict))
+            )
+        self._first_sync_started = self.startup.now()
+        try:
+            await self._run_sync(sync_options)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.reminder_process is not None:
+                await self.reminder_process.stop()
+            await self.dispatcher.close()
+            await self.outbox.close()
+            await self.reminder_service.close()
+            await self.storage.close()
+            await self.send_client.close()
+            await self.client.close()
+            await self.http.close()
 
 
 async def main():
-    bot = MatrixBot()
+    startup = StartupReport()
+    with startup.phase("config"):
+        bot = MatrixBot(startup)
     await bot.run()
 
 
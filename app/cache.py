@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+class QueryCache:
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        *,
+        ttl_sec: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        # Entries older than ttl_sec are reloaded; 0 keeps them until a write
+        # invalidates them. Set when another process writes the same DB.
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable], Tuple[Any, float]]" = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(
+        self, scope: Hashable, key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if self.max_entries <= 0:
+            return await loader()
+        entry_key = (scope, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None and (
+            self.ttl_sec <= 0 or self.clock() - entry[1] < self.ttl_sec
+        ):
+            self.hits += 1
+            self._entries.move_to_end(entry_key)
+            return entry[0]
+
+        self.misses += 1
+        generation = self._generation(scope)
+        loaded_at = self.clock()
+        value = await loader()
+        # A write to this scope while we were loading makes the result stale.
+        if self._generation(scope) == generation:
+            self._entries[entry_key] = (value, loaded_at)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def _generation(self, scope: Hashable) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(scope, 0)
+
+    def invalidate(self, scope: Optional[Hashable] = None) -> None:
+        if scope is None:
+            self._epoch += 1
+            self._entries.clear()
+            return
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        for entry_key in [k for k in self._entries if k[0] == scope]:
+            del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,5 +1,18 @@
+from app.commands.compact import handle_compact
+from app.commands.deadletter import handle_deadletter
+from app.commands.metrics import handle_metrics
 from app.commands.note import handle_note
-from app.commands.status import handle_status
+from app.commands.registry import registry
+from app.commands.status import handle_ping, handle_status
 from app.commands.todo import handle_todo
 
-__all__ = ["handle_status", "handle_todo", "handle_note"]
+__all__ = [
+    "registry",
+    "handle_status",
+    "handle_ping",
+    "handle_todo",
+    "handle_note",
+    "handle_compact",
+    "handle_deadletter",
+    "handle_metrics",
+]
@@ -0,0 +1,44 @@
+from app.commands.registry import ACL_ADMIN, Invocation, command
+
+
+@command("compact", acl=ACL_ADMIN)
+async def handle_compact(bot, inv: Invocation) -> None:
+    room_id = inv.room_id
+    action = inv.args[0] if inv.args else "status"
+    compactor = bot.compactor
+
+    if action == "run":
+        if not compactor.enabled:
+            await bot._send_text(room_id, "未啟用資料保留（RETENTION_DAYS=0）")
+            return
+        if compactor.running:
+            await bot._send_text(room_id, "壓縮進行中，請稍後")
+            return
+        moved = await compactor.run_once()
+        await bot._send_text(
+            room_id,
+            f"壓縮完成：Todo 封存 {moved['todo']} 筆，提醒封存 {moved['reminders']} 筆",
+        )
+        return
+
+    if action == "status":
+        if not compactor.enabled:
+            await bot._send_text(room_id, "未啟用資料保留（RETENTION_DAYS=0）")
+            return
+        report = await compactor.report()
+        lines = [f"資料保留：{compactor.retention_days} 天"]
+        for name, label in (("todo", "Todo"), ("reminders", "提醒")):
+            st = report[name]
+            lines.append(
+                f"{label}: 使用中 {st['hot']} 筆 / 可封存 {st['eligible']} 筆 / 已封存 {st['archived']} 筆"
+            )
+        last = compactor.last_run
+        if last:
+            lines.append(
+                f"上次壓縮: {bot._format_ts(last['at_ms'])}（{last['elapsed_ms']} ms，"
+                f"Todo {last['todo']} / 提醒 {last['reminders']}）"
+            )
+        await bot._send_text(room_id, "\n".join(lines))
+        return
+
+    await bot._send_text(room_id, "用法: !compact [status|run]")
@@ -0,0 +1,54 @@
+from app.commands.registry import ACL_ADMIN, Invocation, command
+from app.pagination import pop_after
+from app.reminders.time_utils import format_ms_to_local
+
+
+USAGE = "用法: !deadletter [list [--after <token>]|requeue <id>[,<id>...]|requeue all]"
+
+
+@command("deadletter", acl=ACL_ADMIN)
+async def handle_deadletter(bot, inv: Invocation) -> None:
+    room_id = inv.room_id
+    args = inv.args
+    action = args[0] if args else "list"
+    service = bot.reminder_service
+
+    if action == "list":
+        try:
+            after, _ = pop_after(args[1:])
+            page = await service.list_failed(after=after)
+        except ValueError:
+            await bot._send_text(room_id, USAGE)
+            return
+        if not page.items:
+            await bot._send_text(room_id, "沒有發送失敗的提醒")
+            return
+        lines = ["發送失敗的提醒:"]
+        for row in page.items:
+            due_local = format_ms_to_local(row["due_at_ms"], row["tz"])
+            lines.append(
+                f"id={row['id']} {row['user_id']} {row['room_id']} {due_local} {row['text']}"
+                f"（{row['attempts']} 次，{row['last_error'] or '-'}）"
+            )
+        if page.next_after:
+            lines.append(f"下一頁: !deadletter list --after {page.next_after}")
+        await bot._send_text(room_id, "\n".join(lines))
+        return
+
+    if action == "requeue":
+        if len(args) < 2:
+            await bot._send_text(room_id, USAGE)
+            return
+        if args[1] == "all":
+            count = await service.requeue_failed()
+        else:
+            try:
+                ids = sorted({int(x) for x in args[1].split(",") if x})
+            except ValueError:
+                await bot._send_text(room_id, "id 必須是數字，例如 12 或 12,15")
+                return
+            count = await service.requeue_failed(ids)
+        await bot._send_text(room_id, f"已重新排入 {count} 筆提醒")
+        return
+
+    await bot._send_text(room_id, USAGE)
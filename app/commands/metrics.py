@@ -0,0 +1,32 @@
+from app.commands.registry import ACL_ADMIN, Invocation, command, format_ms, registry
+from app.outbox import PRIORITY_ALERT, PRIORITY_REMINDER, PRIORITY_REPLY
+
+
+@command("metrics", acl=ACL_ADMIN)
+async def handle_metrics(bot, inv: Invocation) -> None:
+    lines = ["指令統計（次數 / 錯誤 / 拒絕 / 平均 / p50 / p95 / 最大，ms）:"]
+    for name, st in sorted(registry.stats().items()):
+        if not st.calls and not st.denied:
+            continue
+        avg = st.total_ms / st.calls if st.calls else None
+        lines.append(
+            f"{name}: {st.calls} / {st.errors} / {st.denied} / {format_ms(avg)} / "
+            f"≤{format_ms(st.percentile(0.5))} / ≤{format_ms(st.percentile(0.95))} / {format_ms(st.max_ms)}"
+        )
+    if len(lines) == 1:
+        lines.append("尚無紀錄")
+    queues = bot.dispatcher.stats()
+    if queues:
+        lines.append("房間佇列（目前 / 峰值 / 處理 / 丟棄 / 錯誤 / 最長等待 ms）:")
+        for room_id, (depth, st) in sorted(queues.items()):
+            lines.append(
+                f"{room_id}: {depth} / {st.peak_depth} / {st.processed} / {st.dropped} / "
+                f"{st.errors} / {format_ms(st.max_wait_ms)}"
+            )
+    out = bot.outbox.stats
+    depth = bot.outbox.depth()
+    lines.append(
+        f"發送佇列: 已送 {out.sent} / 失敗 {out.failed} / 429 {out.rate_limited}，"
+        f"等待中 告警 {depth[PRIORITY_ALERT]} / 回覆 {depth[PRIORITY_REPLY]} / 提醒 {depth[PRIORITY_REMINDER]}"
+    )
+    await bot._send_text(inv.room_id, "\n".join(lines))
@@ -1,58 +1,59 @@
 import time
 
+from app.commands.registry import ACL_PUBLIC, Invocation, command
+from app.pagination import pop_after
+
+USAGE = "用法: !note <文字> | !note list [n] [--after <token>] | !note search <keyword|\"片語\"|前綴*>"
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-async def handle_note(bot, room_id: str, sender: str, body: str) -> None:
-    if not bot.cfg.allow_todo_public and not bot._is_admin(sender):
-        return
-    parts = body.split(maxsplit=2)
-    if len(parts) < 2:
-        await bot._send_text(
-            room_id, "用法: !note <文字> | !note list [n] | !note search <keyword>"
-        )
-        return
-
-    sub = parts[1]
+@command("note", acl=ACL_PUBLIC, usage=USAGE, min_args=1)
+async def handle_note(bot, inv: Invocation) -> None:
+    room_id = inv.room_id
+    sub = inv.args[0]
     if sub == "list":
+        try:
+            after, rest = pop_after(inv.args[1:])
+        except ValueError:
+            after, rest = None, []
         n = 10
-        if len(parts) >= 3:
+        if rest:
             try:
-                n = int(parts[2])
+                n = int(rest[0])
             except ValueError:
                 n = 10
-        rows = await bot.storage.note_list(n)
-        if not rows:
+        try:
+            page = await bot.storage.note_list(n, after=after)
+        except ValueError:
+            await bot._send_text(room_id, "分頁 token 無效")
+            return
+        if not page.items:
             await bot._send_text(room_id, "沒有筆記")
             return
         lines = ["最近筆記:"]
-        for nid, text, created_at, sender_id, rid in rows:
+        for nid, text, created_at, sender_id, rid in page.items:
             ts = bot._format_ts(created_at)
             lines.append(f"#{nid} {ts} {sender_id}: {text}")
+        if page.next_after:
+            lines.append(f"下一頁: !note list {n} --after {page.next_after}")
         await bot._send_text(room_id, "\n".join(lines))
         return
 
-    if sub == "search" and len(parts) >= 3:
-        keyword = parts[2]
-        rows = await bot.storage.note_search(keyword)
+    if sub == "search" and len(inv.args) >= 2:
+        query = inv.rest(1)
+        rows = await bot.storage.note_search(query)
         if not rows:
             await bot._send_text(room_id, "找不到")
             return
         lines = ["搜尋結果:"]
-        for nid, text, created_at, sender_id, rid in rows:
+        for nid, text, created_at, sender_id, rid, snippet in rows:
             ts = bot._format_ts(created_at)
-            lines.append(f"#{nid} {ts} {sender_id}: {text}")
+            lines.append(f"#{nid} {ts} {sender_id}: {snippet}")
         await bot._send_text(room_id, "\n".join(lines))
         return
 
-    text = body[len("!note") :].strip()
-    if text:
-        note_id = await bot.storage.note_add(text, _now_ms(), sender, room_id)
-        await bot._send_text(room_id, f"已新增 Note #{note_id}")
-        return
-
-    await bot._send_text(
-        room_id, "用法: !note <文字> | !note list [n] | !note search <keyword>"
-    )
+    note_id = await bot.storage.note_add(inv.rest(0), _now_ms(), inv.sender, room_id)
+    await bot._send_text(room_id, f"已新增 Note #{note_id}")
@@ -0,0 +1,141 @@
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger("matrix-bot.commands")
+
+ACL_ADMIN = "admin"
+# Non-admins may use it when ALLOW_TODO_PUBLIC is on (globally or for the room).
+ACL_PUBLIC = "public"
+ACL_ANYONE = "anyone"
+ACLS = (ACL_ADMIN, ACL_PUBLIC, ACL_ANYONE)
+
+# Upper bounds in ms; the last bucket catches everything slower.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(frozen=True)
+class Invocation:
+    room_id: str
+    sender: str
+    body: str
+    args: List[str]
+
+    def rest(self, skip: int = 0) -> str:
+        # Raw text after the command token and `skip` arguments, whitespace kept.
+        parts = self.body.split(maxsplit=skip + 1)
+        return parts[skip + 1] if len(parts) > skip + 1 else ""
+
+
+Handler = Callable[..., Awaitable[None]]
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+@dataclass
+class CommandStats:
+    calls: int = 0
+    errors: int = 0
+    denied: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th call; max_ms for the overflow bucket.
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+@dataclass(frozen=True)
+class Command:
+    name: str
+    handler: Handler
+    acl: str
+    usage: str
+    min_args: int
+
+
+class CommandRegistry:
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._commands: Dict[str, Command] = {}
+        self._stats: Dict[str, CommandStats] = {}
+
+    def command(
+        self, name: str, *, acl: str = ACL_PUBLIC, usage: str = "", min_args: int = 0
+    ) -> Callable[[Handler], Handler]:
+        if acl not in ACLS:
+            raise ValueError(f"invalid acl: {acl}")
+
+        def register(handler: Handler) -> Handler:
+            token = name if name.startswith("!") else f"!{name}"
+            if token in self._commands:
+                raise ValueError(f"command already registered: {token}")
+            self._commands[token] = Command(token, handler, acl, usage, min_args)
+            self._stats[token] = CommandStats()
+            return handler
+
+        return register
+
+    def get(self, token: str) -> Optional[Command]:
+        return self._commands.get(token)
+
+    def names(self) -> List[str]:
+        return sorted(self._commands)
+
+    def stats(self) -> Dict[str, CommandStats]:
+        return dict(self._stats)
+
+    def _allowed(self, bot, cmd: Command, room_id: str, sender: str) -> bool:
+        if cmd.acl == ACL_ANYONE or bot._is_admin(sender, room_id):
+            return True
+        return cmd.acl == ACL_PUBLIC and bot._allow_public(room_id)
+
+    async def dispatch(self, bot, room_id: str, sender: str, body: str) -> bool:
+        if not body.startswith("!"):
+            return False
+        tokens = body.split()
+        cmd = self._commands.get(tokens[0])
+        if cmd is None:
+            return False
+        stats = self._stats[cmd.name]
+        if not self._allowed(bot, cmd, room_id, sender):
+            stats.denied += 1
+            return True
+
+        inv = Invocation(room_id=room_id, sender=sender, body=body, args=tokens[1:])
+        started = self._clock()
+        try:
+            if len(inv.args) < cmd.min_args:
+                await bot._send_text(room_id, cmd.usage)
+            else:
+                await cmd.handler(bot, inv)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.observe((self._clock() - started) * 1000)
+        return True
+
+
+registry = CommandRegistry()
+command = registry.command
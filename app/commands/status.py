@@ -1,16 +1,44 @@
+import asyncio
 import time
 
-import psutil
+from app.commands.registry import ACL_ADMIN, ACL_ANYONE, Invocation, command, format_ms
+from app.health import HealthSnapshot
 
 
-async def handle_status(bot, room_id: str) -> None:
-    cpu = psutil.cpu_percent(interval=1)
+def _format_health(health: HealthSnapshot) -> str:
+    latency = f"{format_ms(health.latency_ms)} ms, " if health.latency_ms is not None else ""
+    return (
+        f"{health.status} ({latency}最近 {health.samples} 次成功率 "
+        f"{health.success_rate:.0%}, {health.age_sec:.0f} 秒前)"
+    )
+
+
+@command("ping", acl=ACL_ANYONE)
+async def handle_ping(bot, inv: Invocation) -> None:
+    await bot._send_text(inv.room_id, "pong")
+
+
+@command("status", acl=ACL_ADMIN)
+async def handle_status(bot, inv: Invocation) -> None:
+    import psutil
+
+    # The 1 s CPU sample runs in a thread, alongside the (usually cached) health probe.
+    cpu, health = await asyncio.gather(
+        asyncio.to_thread(psutil.cpu_percent, interval=1), bot.health.current()
+    )
     mem = psutil.virtual_memory().percent
     disk = psutil.disk_usage("/").percent
     load1, load5, load15 = psutil.getloadavg()
     uptime = time.time() - psutil.boot_time()
-    health = await bot._health_check()
     last_sync = bot._format_ts(bot.last_sync_ms) if bot.last_sync_ms else "unknown"
+    caches = [
+        ("bot.db", bot.storage.cache.stats()),
+        ("reminders.db", bot.reminder_service.repository.cache.stats()),
+    ]
+    cache_lines = "".join(
+        f"\nCache {name}: hit {st['hits']} / miss {st['misses']} / evict {st['evictions']} ({st['entries']} entries)"
+        for name, st in caches
+    )
     msg = (
         "狀態資訊:\n"
         f"CPU: {cpu:.1f}%\n"
@@ -18,7 +46,10 @@ async def handle_status(bot, room_id: str) -> None:
         f"Disk: {disk:.1f}%\n"
         f"Loadavg: {load1:.2f} {load5:.2f} {load15:.2f}\n"
         f"Uptime: {uptime/3600:.1f} hours\n"
-        f"Matrix health: {health}\n"
+        f"Matrix health: {_format_health(health)}\n"
+        f"/versions latency: p50 {format_ms(health.p50_ms)} / p95 {format_ms(health.p95_ms)} / "
+        f"p99 {format_ms(health.p99_ms)} ms\n"
         f"Last sync: {last_sync}"
+        f"{cache_lines}"
     )
-    await bot._send_text(room_id, msg)
+    await bot._send_text(inv.room_id, msg)
@@ -1,46 +1,68 @@
 import time
+from typing import Optional
+
+from app.commands.registry import ACL_PUBLIC, Invocation, command
+from app.pagination import pop_after
+
+USAGE = "用法: !todo add|list|done|del ..."
 
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-async def handle_todo(bot, room_id: str, sender: str, body: str) -> None:
-    if not bot.cfg.allow_todo_public and not bot._is_admin(sender):
-        return
-    parts = body.split(maxsplit=2)
-    if len(parts) < 2:
-        await bot._send_text(room_id, "用法: !todo add|list|done|del ...")
-        return
+def _list_status(flags) -> Optional[str]:
+    status = None
+    for flag in flags:
+        if flag == "--open":
+            status = "open"
+        elif flag == "--done":
+            status = "done"
+        else:
+            raise ValueError(f"unknown flag {flag}")
+    return status
 
-    action = parts[1]
-    if action == "add" and len(parts) >= 3:
-        todo_id = await bot.storage.todo_add(parts[2], _now_ms())
+
+@command("todo", acl=ACL_PUBLIC, usage=USAGE, min_args=1)
+async def handle_todo(bot, inv: Invocation) -> None:
+    room_id = inv.room_id
+    action = inv.args[0]
+    arg = inv.args[1] if len(inv.args) >= 2 else None
+    if action == "add" and arg is not None:
+        todo_id = await bot.storage.todo_add(inv.rest(1), _now_ms())
         await bot._send_text(room_id, f"已新增 Todo #{todo_id}")
         return
     if action == "list":
-        items = await bot.storage.todo_list()
-        if not items:
-            await bot._send_text(room_id, "Todo 清單為空")
+        try:
+            after, flags = pop_after(inv.args[1:])
+            page = await bot.storage.todo_list(after=after, status=_list_status(flags))
+        except ValueError:
+            await bot._send_text(room_id, "用法: !todo list [--open|--done] [--after <token>]")
+            return
+        if not page.items:
+            await bot._send_text(room_id, "Todo 清單為空" if not after else "沒有更多 Todo")
             return
         lines = ["Todo 清單:"]
-        for tid, text, done in items:
+        for tid, text, done in page.items:
             mark = "✅" if done else "⬜"
             lines.append(f"{mark} #{tid} {text}")
+        if page.next_after:
+            next_cmd = " ".join(["!todo list", *flags, "--after", page.next_after])
+            lines.append(f"下一頁: {next_cmd}")
         await bot._send_text(room_id, "\n".join(lines))
         return
-    if action == "done" and len(parts) >= 3:
+    if action == "done" and arg is not None:
         try:
-            todo_id = int(parts[2])
+            todo_id = int(arg)
         except ValueError:
             await bot._send_text(room_id, "Todo id 必須是數字")
             return
         ok = await bot.storage.todo_done(todo_id, _now_ms())
         await bot._send_text(room_id, "完成" if ok else "找不到或已完成")
         return
-    if action == "del" and len(parts) >= 3:
+    if action == "del" and arg is not None:
         try:
-            todo_id = int(parts[2])
+            todo_id = int(arg)
         except ValueError:
             await bot._send_text(room_id, "Todo id 必須是數字")
             return
@@ -48,4 +70,4 @@ async def handle_todo(bot, room_id: str, sender: str, body: str) -> None:
         await bot._send_text(room_id, "已刪除" if ok else "找不到")
         return
 
-    await bot._send_text(room_id, "用法: !todo add|list|done|del ...")
+    await bot._send_text(room_id, USAGE)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, Optional
+
+
+logger = logging.getLogger("matrix-bot.compaction")
+
+if TYPE_CHECKING:
+    from app.reminders.repository import ReminderRepository
+    from app.storage import Storage
+
+
+class Compactor:
+    def __init__(
+        self,
+        *,
+        storage: "Storage",
+        repository: "ReminderRepository",
+        retention_days: int,
+        batch_size: int = 500,
+        pause_sec: float = 0.05,
+    ):
+        self.storage = storage
+        self.repository = repository
+        self.retention_days = retention_days
+        self.batch_size = max(1, batch_size)
+        self.pause_sec = pause_sec
+        self.last_run: Optional[Dict] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.retention_days > 0
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+
+    async def report(self) -> Dict[str, Dict[str, int]]:
+        cutoff = self._cutoff()
+        return {
+            "todo": await self.storage.todo_archive_stats(int(cutoff.timestamp() * 1000)),
+            "reminders": await self.repository.archive_stats(cutoff.isoformat()),
+        }
+
+    async def run_once(self) -> Dict[str, int]:
+        async with self._lock:
+            started = time.monotonic()
+            cutoff = self._cutoff()
+            cutoff_ms = int(cutoff.timestamp() * 1000)
+            moved = {"todo": 0, "reminders": 0}
+            # Small transactions with a pause in between keep the writer lock
+            # short so commands and reminder dispatch are not stalled.
+            while True:
+                n = await self.storage.archive_done_todos(
+                    cutoff_ms, int(time.time() * 1000), self.batch_size
+                )
+                moved["todo"] += n
+                if n < self.batch_size:
+                    break
+                await asyncio.sleep(self.pause_sec)
+            while True:
+                n = await self.repository.archive_finished(
+                    cutoff.isoformat(),
+                    datetime.now(timezone.utc).isoformat(),
+                    self.batch_size,
+                )
+                moved["reminders"] += n
+                if n < self.batch_size:
+                    break
+                await asyncio.sleep(self.pause_sec)
+            self.last_run = {
+                "at_ms": int(time.time() * 1000),
+                "elapsed_ms": int((time.monotonic() - started) * 1000),
+                **moved,
+            }
+            if moved["todo"] or moved["reminders"]:
+                logger.info("Compaction archived todo=%d reminders=%d", moved["todo"], moved["reminders"])
+            return moved
+
+    async def run_loop(self, interval_sec: int) -> None:
+        while True:
+            await asyncio.sleep(interval_sec)
+            if not self.enabled:
+                continue
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Compaction loop error")
@@ -1,7 +1,7 @@
+import json
 import os
 from dataclasses import dataclass
-from typing import List, Optional
-import yaml
+from typing import Any, Dict, List, Optional
 
 
 def _split_csv(value: Optional[str]) -> List[str]:
@@ -34,12 +34,61 @@ class Config:
     timezone: str
     data_path: str
     poll_interval_seconds: int
+    reminder_lookahead_seconds: int
+    reminder_batch_size: int
+    reminder_concurrency: int
+    reminder_lease_seconds: int
+    reminder_worker_id: Optional[str]
+    reminder_coalesce_window_sec: int
+    reminder_digest_max_chars: int
+    reminder_max_attempts: int
+    reminder_retry_max_seconds: int
+    import_max_bytes: int
+    command_workers: int
+    command_queue_max: int
+    send_rate: float
+    send_burst: int
+    send_room_rate: float
+    send_room_burst: int
+    send_concurrency: int
+    health_interval_sec: int
+    health_ttl_sec: int
+    sync_profile: str
+    sync_timeline_limit: int
+    db_synchronous: str
+    db_group_commit_ms: int
+    db_group_commit_max: int
+    cache_max_entries: int
+    cache_ttl_sec: float
+    db_maintenance_interval_sec: int
+    db_maintenance_quiet_sec: int
+    retention_days: int
+    compaction_batch_size: int
+    compaction_interval_sec: int
+    room_overrides: Dict[str, Any]
+    config_watch_interval_sec: int
+    reminder_mode: str
+    reminder_ipc_socket: Optional[str]
+
+
+def _parse_room_overrides(value: Any) -> Dict[str, Any]:
+    # A mapping in config.yaml, or a JSON object in the environment.
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, dict):
+        raise ValueError("ROOM_OVERRIDES must be a mapping of room_id to settings")
+    return value
 
 
 def load_config() -> Config:
     yaml_path = os.getenv("CONFIG_YAML", "").strip()
     data = {}
     if yaml_path and os.path.exists(yaml_path):
+        # PyYAML is only imported when a config file is actually used.
+        import yaml
+
         with open(yaml_path, "r", encoding="utf-8") as f:
             data = yaml.safe_load(f) or {}
 
@@ -74,4 +123,39 @@ def load_config() -> Config:
         timezone=get("TIMEZONE", "Asia/Taipei"),
         data_path=get("DATA_PATH", "./data"),
         poll_interval_seconds=int(get("POLL_INTERVAL_SECONDS", 20)),
+        reminder_lookahead_seconds=int(get("REMINDER_LOOKAHEAD_SECONDS", 3600)),
+        reminder_batch_size=int(get("REMINDER_BATCH_SIZE", 50)),
+        reminder_concurrency=int(get("REMINDER_CONCURRENCY", 8)),
+        reminder_lease_seconds=int(get("REMINDER_LEASE_SECONDS", 60)),
+        reminder_worker_id=get("REMINDER_WORKER_ID"),
+        reminder_coalesce_window_sec=int(get("REMINDER_COALESCE_WINDOW_SEC", 0)),
+        reminder_digest_max_chars=int(get("REMINDER_DIGEST_MAX_CHARS", 4000)),
+        reminder_max_attempts=int(get("REMINDER_MAX_ATTEMPTS", 5)),
+        reminder_retry_max_seconds=int(get("REMINDER_RETRY_MAX_SECONDS", 3600)),
+        import_max_bytes=int(get("IMPORT_MAX_BYTES", 20 * 1024 * 1024)),
+        command_workers=int(get("COMMAND_WORKERS", 4)),
+        command_queue_max=int(get("COMMAND_QUEUE_MAX", 50)),
+        send_rate=float(get("SEND_RATE", 10)),
+        send_burst=int(get("SEND_BURST", 20)),
+        send_room_rate=float(get("SEND_ROOM_RATE", 2)),
+        send_room_burst=int(get("SEND_ROOM_BURST", 5)),
+        send_concurrency=int(get("SEND_CONCURRENCY", 4)),
+        health_interval_sec=int(get("HEALTH_INTERVAL_SEC", 30)),
+        health_ttl_sec=int(get("HEALTH_TTL_SEC", 60)),
+        sync_profile=str(get("SYNC_PROFILE", "lean")).lower(),
+        sync_timeline_limit=int(get("SYNC_TIMELINE_LIMIT", 20)),
+        db_synchronous=str(get("DB_SYNCHRONOUS", "NORMAL")).upper(),
+        db_group_commit_ms=int(get("DB_GROUP_COMMIT_MS", 0)),
+        db_group_commit_max=int(get("DB_GROUP_COMMIT_MAX", 64)),
+        cache_max_entries=int(get("CACHE_MAX_ENTRIES", 256)),
+        cache_ttl_sec=float(get("CACHE_TTL_SEC", 0)),
+        db_maintenance_interval_sec=int(get("DB_MAINTENANCE_INTERVAL_SEC", 3600)),
+        db_maintenance_quiet_sec=int(get("DB_MAINTENANCE_QUIET_SEC", 60)),
+        retention_days=int(get("RETENTION_DAYS", 30)),
+        compaction_batch_size=int(get("COMPACTION_BATCH_SIZE", 500)),
+        compaction_interval_sec=int(get("COMPACTION_INTERVAL_SEC", 3600)),
+        room_overrides=_parse_room_overrides(get("ROOM_OVERRIDES")),
+        config_watch_interval_sec=int(get("CONFIG_WATCH_INTERVAL_SEC", 5)),
+        reminder_mode=str(get("REMINDER_MODE", "inline")).lower(),
+        reminder_ipc_socket=get("REMINDER_IPC_SOCKET"),
     )
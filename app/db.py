@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+import aiosqlite
+
+
+logger = logging.getLogger("matrix-bot.db")
+
+DEFAULT_READERS = 2
+DEFAULT_CACHED_STATEMENTS = 128
+BUSY_TIMEOUT_MS = 5000
+ANALYSIS_LIMIT = 1000
+DEFAULT_VACUUM_PAGES = 500
+DEFAULT_GROUP_COMMIT_MAX_ITEMS = 64
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class Database:
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        readers: int = DEFAULT_READERS,
+        row_factory=None,
+        cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+        synchronous: str = "NORMAL",
+        group_commit_window_ms: int = 0,
+        group_commit_max_items: int = DEFAULT_GROUP_COMMIT_MAX_ITEMS,
+    ):
+        self.db_path = db_path
+        self.reader_count = max(1, readers)
+        self.row_factory = row_factory
+        self.cached_statements = cached_statements
+        self.synchronous = synchronous.upper()
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"invalid synchronous mode: {synchronous}")
+        self.group_commit_window_ms = group_commit_window_ms
+        self.group_commit_max_items = max(1, group_commit_max_items)
+        self.commit_count = 0
+        self.last_write_at = time.monotonic()
+        self._pending: List[Tuple[WriteOp, asyncio.Future]] = []
+        self._batch_full = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self, *, query_only: bool = False) -> aiosqlite.Connection:
+        # isolation_level=None: transactions are issued explicitly by write().
+        conn = await aiosqlite.connect(
+            self.db_path,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+        )
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        await conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if query_only:
+            await conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    async def open(self) -> None:
+        if self._writer is not None:
+            return
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+            writer = await self._connect()
+            cur = await writer.execute("PRAGMA journal_mode = WAL")
+            mode = (await cur.fetchone())[0]
+            if str(mode).lower() != "wal":
+                logger.warning("WAL not available for %s (journal_mode=%s)", self.db_path, mode)
+            for _ in range(self.reader_count):
+                reader = await self._connect(query_only=True)
+                self._readers.append(reader)
+                self._idle_readers.put_nowait(reader)
+            self._writer = writer
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._batch_full.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        async with self._open_lock:
+            writer, self._writer = self._writer, None
+            readers, self._readers = self._readers, []
+            self._idle_readers = asyncio.Queue()
+            for conn in readers:
+                await conn.close()
+            if writer is not None:
+                await writer.close()
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self.open()
+        conn = await self._idle_readers.get()
+        try:
+            yield conn
+        finally:
+            if conn in self._readers:
+                self._idle_readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self.open()
+        async with self._write_lock:
+            conn = self._writer
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.execute("ROLLBACK")
+                raise
+            await conn.execute("COMMIT")
+            self.commit_count += 1
+            self.last_write_at = time.monotonic()
+
+    @asynccontextmanager
+    async def autocommit(self) -> AsyncIterator[aiosqlite.Connection]:
+        # Writer access outside a transaction, for VACUUM and other statements
+        # SQLite refuses to run inside one.
+        await self.open()
+        async with self._write_lock:
+            yield self._writer
+
+    async def ensure_incremental_vacuum(self) -> None:
+        async with self.autocommit() as conn:
+            cur = await conn.execute("PRAGMA auto_vacuum")
+            if (await cur.fetchone())[0] == 2:
+                return
+            logger.info("Enabling incremental auto_vacuum on %s", self.db_path)
+            await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.execute("VACUUM")
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_write_at
+
+    async def run_maintenance(self, vacuum_pages: int = DEFAULT_VACUUM_PAGES) -> None:
+        async with self.autocommit() as conn:
+            await conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            await conn.execute("ANALYZE")
+            await conn.execute("PRAGMA optimize")
+            cur = await conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+            await cur.fetchall()
+            await conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        logger.info("DB maintenance done for %s", self.db_path)
+
+    async def submit(self, op: WriteOp) -> Any:
+        if self.group_commit_window_ms <= 0:
+            async with self.write() as conn:
+                return await op(conn)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, future))
+        if len(self._pending) >= self.group_commit_max_items:
+            self._batch_full.set()
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._run_group_commit())
+        return await future
+
+    async def _run_group_commit(self) -> None:
+        try:
+            if len(self._pending) < self.group_commit_max_items:
+                try:
+                    await asyncio.wait_for(
+                        self._batch_full.wait(), self.group_commit_window_ms / 1000
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            while self._pending:
+                batch = self._pending[: self.group_commit_max_items]
+                self._pending = self._pending[self.group_commit_max_items :]
+                await self._commit_batch(batch)
+        finally:
+            self._batch_full.clear()
+            self._flush_task = None
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOp, asyncio.Future]]) -> None:
+        # Each op runs in its own savepoint so one caller's error does not
+        # discard the other writes sharing the commit.
+        outcomes: List[Tuple[bool, Any]] = []
+        try:
+            async with self.write() as conn:
+                for op, _ in batch:
+                    await conn.execute("SAVEPOINT group_item")
+                    try:
+                        result = await op(conn)
+                    except Exception as exc:
+                        await conn.execute("ROLLBACK TO group_item")
+                        await conn.execute("RELEASE group_item")
+                        outcomes.append((False, exc))
+                        continue
+                    await conn.execute("RELEASE group_item")
+                    outcomes.append((True, result))
+        except Exception as exc:
+            logger.exception("Group commit failed for %d writes", len(batch))
+            outcomes = [(False, exc)] * len(batch)
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
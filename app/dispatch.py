@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger("matrix-bot.dispatch")
+
+DEFAULT_WORKERS = 4
+DEFAULT_ROOM_QUEUE_MAX = 50
+
+Job = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class RoomQueueStats:
+    enqueued: int = 0
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    peak_depth: int = 0
+    max_wait_ms: float = 0.0
+
+
+class RoomDispatcher:
+    # Jobs run on a fixed pool of worker tasks. Each room has its own bounded
+    # queue and is handed to at most one worker at a time, so jobs within a
+    # room keep their order while different rooms run in parallel. A worker
+    # runs one job and then puts the room back at the end of the ready queue,
+    # which keeps a busy room from starving the others.
+    def __init__(
+        self,
+        *,
+        workers: int = DEFAULT_WORKERS,
+        room_queue_max: int = DEFAULT_ROOM_QUEUE_MAX,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.worker_count = max(1, workers)
+        self.room_queue_max = max(1, room_queue_max)
+        self._clock = clock
+        self._queues: Dict[str, Deque[Tuple[float, Job]]] = {}
+        self._stats: Dict[str, RoomQueueStats] = {}
+        # Rooms waiting in _ready or held by a worker.
+        self._scheduled: Set[str] = set()
+        self._ready: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._run_worker(i)) for i in range(self.worker_count)
+        ]
+
+    async def close(self) -> None:
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def submit(self, room_id: str, job: Job) -> bool:
+        # Never blocks the caller (the sync loop). When the room queue is full
+        # the oldest waiting job is dropped; returns False in that case.
+        queue = self._queues.setdefault(room_id, deque())
+        stats = self._stats.setdefault(room_id, RoomQueueStats())
+        accepted = True
+        if len(queue) >= self.room_queue_max:
+            queue.popleft()
+            stats.dropped += 1
+            accepted = False
+            logger.warning("Room queue full for %s, dropped oldest job", room_id)
+        queue.append((self._clock(), job))
+        stats.enqueued += 1
+        stats.peak_depth = max(stats.peak_depth, len(queue))
+        if room_id not in self._scheduled:
+            self._scheduled.add(room_id)
+            self._ready.put_nowait(room_id)
+        return accepted
+
+    async def join(self) -> None:
+        await self._ready.join()
+
+    def depth(self, room_id: Optional[str] = None) -> int:
+        if room_id is not None:
+            return len(self._queues.get(room_id, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> Dict[str, Tuple[int, RoomQueueStats]]:
+        return {room: (self.depth(room), st) for room, st in self._stats.items()}
+
+    async def _run_worker(self, index: int) -> None:
+        while True:
+            room_id = await self._ready.get()
+            try:
+                await self._run_one(room_id)
+            finally:
+                if self._queues.get(room_id):
+                    self._ready.put_nowait(room_id)
+                else:
+                    self._queues.pop(room_id, None)
+                    self._scheduled.discard(room_id)
+                self._ready.task_done()
+
+    async def _run_one(self, room_id: str) -> None:
+        queue = self._queues.get(room_id)
+        if not queue:
+            return
+        enqueued_at, job = queue.popleft()
+        stats = self._stats[room_id]
+        stats.max_wait_ms = max(stats.max_wait_ms, (self._clock() - enqueued_at) * 1000)
+        try:
+            await job()
+        except Exception:
+            stats.errors += 1
+            logger.exception("Job failed in room %s", room_id)
+        finally:
+            stats.processed += 1
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional, Tuple
+
+import aiohttp
+
+
+logger = logging.getLogger("matrix-bot.health")
+
+DEFAULT_INTERVAL_SEC = 30
+DEFAULT_TTL_SEC = 60
+DEFAULT_WINDOW = 60
+DEFAULT_TIMEOUT_SEC = 5
+
+
+@dataclass(frozen=True)
+class HealthSnapshot:
+    status: str
+    latency_ms: Optional[float]
+    age_sec: float
+    successes: int
+    samples: int
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.samples if self.samples else 0.0
+
+
+def _percentile(sorted_values, q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class HealthProber:
+    # Probes the homeserver's /versions in the background and keeps the last
+    # `window` results, so !status can answer from memory. A result older
+    # than ttl_sec is refreshed on demand; concurrent callers share one probe.
+    def __init__(
+        self,
+        homeserver_url: str,
+        *,
+        session: Optional[aiohttp.ClientSession] = None,
+        interval_sec: float = DEFAULT_INTERVAL_SEC,
+        ttl_sec: float = DEFAULT_TTL_SEC,
+        window: int = DEFAULT_WINDOW,
+        timeout_sec: float = DEFAULT_TIMEOUT_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.url = homeserver_url.rstrip("/") + "/_matrix/client/versions"
+        self.session = session
+        self.interval_sec = interval_sec
+        self.ttl_sec = ttl_sec
+        self.timeout_sec = timeout_sec
+        self._clock = clock
+        # (ok, latency_ms) per probe, oldest first.
+        self._samples: Deque[Tuple[bool, float]] = deque(maxlen=max(1, window))
+        self._last_status = "UNKNOWN"
+        self._last_latency_ms: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._probe_lock = asyncio.Lock()
+
+    async def probe(self) -> str:
+        started = self._clock()
+        try:
+            async with self.session.get(
+                self.url, timeout=aiohttp.ClientTimeout(total=self.timeout_sec)
+            ) as resp:
+                await resp.read()
+                status = "OK" if resp.status == 200 else f"HTTP {resp.status}"
+        except Exception as exc:
+            logger.warning("Health probe failed: %s", exc)
+            status = "FAILED"
+        latency_ms = (self._clock() - started) * 1000
+        ok = status == "OK"
+        self._samples.append((ok, latency_ms))
+        self._last_status = status
+        self._last_latency_ms = latency_ms if ok else None
+        self._last_at = self._clock()
+        return status
+
+    def _is_fresh(self) -> bool:
+        return self._last_at is not None and self._clock() - self._last_at <= self.ttl_sec
+
+    async def current(self) -> HealthSnapshot:
+        if not self._is_fresh():
+            async with self._probe_lock:
+                if not self._is_fresh():
+                    await self.probe()
+        return self.snapshot()
+
+    def snapshot(self) -> HealthSnapshot:
+        latencies = sorted(ms for ok, ms in self._samples if ok)
+        return HealthSnapshot(
+            status=self._last_status,
+            latency_ms=self._last_latency_ms,
+            age_sec=0.0 if self._last_at is None else self._clock() - self._last_at,
+            successes=len(latencies),
+            samples=len(self._samples),
+            p50_ms=_percentile(latencies, 0.5),
+            p95_ms=_percentile(latencies, 0.95),
+            p99_ms=_percentile(latencies, 0.99),
+        )
+
+    async def run_loop(self) -> None:
+        while True:
+            try:
+                async with self._probe_lock:
+                    await self.probe()
+            except Exception:
+                logger.exception("Health prober error")
+            await asyncio.sleep(self.interval_sec)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+
+logger = logging.getLogger("matrix-bot.media")
+
+CHUNK_BYTES = 64 * 1024
+MAX_RATE_LIMITED = 5
+# Used when a 429 carries no retry_after_ms.
+DEFAULT_RETRY_AFTER_MS = 5000
+
+
+class MediaTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"media exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class MediaDownloadError(Exception):
+    pass
+
+
+async def _retry_after_ms(resp: aiohttp.ClientResponse) -> int:
+    try:
+        body = await resp.json(content_type=None)
+        return int(body.get("retry_after_ms") or DEFAULT_RETRY_AFTER_MS)
+    except (ValueError, TypeError, AttributeError, aiohttp.ClientError):
+        return DEFAULT_RETRY_AFTER_MS
+
+
+async def _save(resp: aiohttp.ClientResponse, path: str, max_bytes: int) -> int:
+    if resp.status != 200:
+        raise MediaDownloadError(f"HTTP {resp.status}")
+    if resp.content_length is not None and resp.content_length > max_bytes:
+        raise MediaTooLarge(max_bytes)
+    written = 0
+    with open(path, "wb") as f:
+        async for chunk in resp.content.iter_chunked(CHUNK_BYTES):
+            written += len(chunk)
+            if written > max_bytes:
+                raise MediaTooLarge(max_bytes)
+            f.write(chunk)
+    return written
+
+
+async def download_to_file(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: str,
+    *,
+    max_bytes: int,
+    headers: Optional[Dict[str, str]] = None,
+    max_rate_limited: int = MAX_RATE_LIMITED,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> int:
+    # Streams to disk and stops at max_bytes whatever size the uploader
+    # declared; Content-Length is only used to refuse early. A 429 is
+    # retried after retry_after_ms, as nio does for its own requests.
+    attempts = 0
+    while True:
+        async with session.get(url, headers=headers) as resp:
+            if resp.status != 429 or attempts >= max_rate_limited:
+                return await _save(resp, path, max_bytes)
+            retry_after_ms = await _retry_after_ms(resp)
+        attempts += 1
+        logger.warning("Media download rate limited, retry after %d ms", retry_after_ms)
+        await sleep(retry_after_ms / 1000)
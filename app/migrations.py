@@ -0,0 +1,54 @@
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Sequence
+
+import aiosqlite
+
+from app.db import Database
+
+
+logger = logging.getLogger("matrix-bot.migrations")
+
+MigrationStep = Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: MigrationStep
+
+
+def sql(*statements: str) -> MigrationStep:
+    async def apply(conn: aiosqlite.Connection) -> None:
+        for statement in statements:
+            await conn.execute(statement)
+
+    return apply
+
+
+async def get_user_version(conn: aiosqlite.Connection) -> int:
+    cur = await conn.execute("PRAGMA user_version")
+    return (await cur.fetchone())[0]
+
+
+async def migrate(db: Database, migrations: Sequence[Migration]) -> int:
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)) or (versions and versions[0] < 1):
+        raise ValueError("migration versions must be unique, ascending and start at 1")
+
+    for migration in migrations:
+        # Each step re-reads user_version inside its own write transaction, so
+        # two processes starting together apply every step exactly once.
+        async with db.write() as conn:
+            if await get_user_version(conn) >= migration.version:
+                continue
+            logger.info(
+                "Applying migration %s #%d %s", db.db_path, migration.version, migration.name
+            )
+            await migration.apply(conn)
+            await conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+
+    await db.ensure_incremental_vacuum()
+    async with db.read() as conn:
+        return await get_user_version(conn)
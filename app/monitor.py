@@ -1,7 +1,7 @@
+import os
 import time
 from dataclasses import dataclass
 from typing import Dict, Optional, Tuple
-import psutil
 
 
 @dataclass
@@ -22,6 +22,10 @@ class Monitor:
         self.last_alert: Dict[str, float] = {}
         self.cpu_high_count = 0
 
+    def update_config(self, cfg: MonitorConfig) -> None:
+        # Alert cooldowns and the CPU streak carry over to the new thresholds.
+        self.cfg = cfg
+
     def _cooldown_ok(self, key: str) -> bool:
         last = self.last_alert.get(key, 0)
         return (time.time() - last) >= (self.cfg.alert_cooldown_min * 60)
@@ -30,6 +34,9 @@ class Monitor:
         self.last_alert[key] = time.time()
 
     def collect(self) -> Dict[str, float]:
+        # Imported on first use to keep it off the startup path.
+        import psutil
+
         cpu = psutil.cpu_percent(interval=1)
         mem = psutil.virtual_memory().percent
         disk = psutil.disk_usage("/").percent
@@ -76,7 +83,7 @@ class Monitor:
             self.last_alert.pop("disk", None)
 
         load1 = metrics["load1"]
-        cores = psutil.cpu_count(logical=True) or 1
+        cores = os.cpu_count() or 1
         load_threshold = (
             self.cfg.loadavg_threshold * cores
             if self.cfg.loadavg_auto_per_core
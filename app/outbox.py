@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from nio import AsyncClient, AsyncClientConfig, ErrorResponse
+
+
+logger = logging.getLogger("matrix-bot.outbox")
+
+PRIORITY_ALERT = 0
+PRIORITY_REPLY = 1
+PRIORITY_REMINDER = 2
+PRIORITIES = (PRIORITY_ALERT, PRIORITY_REPLY, PRIORITY_REMINDER)
+
+LIMIT_EXCEEDED = "M_LIMIT_EXCEEDED"
+# Used when a 429 carries no retry_after_ms.
+DEFAULT_RETRY_AFTER_MS = 5000
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_ROOM_RATE = 2.0
+DEFAULT_ROOM_BURST = 5
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+
+
+class SendError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        # Seconds until one token is available; 0 means take() would succeed.
+        self._refill(now)
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+@dataclass
+class _Message:
+    seq: int
+    room_id: str
+    content: Dict
+    priority: int
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class OutboxStats:
+    sent: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    by_priority: List[int] = field(default_factory=lambda: [0] * len(PRIORITIES))
+
+
+def send_client(homeserver_url: str, user_id: str) -> AsyncClient:
+    # A send-only client for the outbox. nio's own 429 retry is off so a
+    # rate limit reaches the outbox, which pauses every send; clients used
+    # for sync, login, joins and downloads keep nio's retry. It shares the
+    # main session: copy access_token/device_id in after login.
+    return AsyncClient(
+        homeserver_url,
+        user_id,
+        config=AsyncClientConfig(encryption_enabled=False, max_limit_exceeded=0),
+    )
+
+
+class Outbox:
+    # Every outgoing m.room.message goes through one scheduler. It picks the
+    # oldest message of the most urgent class whose room is free, so alerts
+    # overtake queued reminders while each room still sees its messages in
+    # order (one send in flight per room). Sends are paced by a global and a
+    # per-room token bucket; a 429 pauses all sends for retry_after_ms, since
+    # homeserver limits apply to the whole account.
+    def __init__(
+        self,
+        client,
+        *,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        room_rate: float = DEFAULT_ROOM_RATE,
+        room_burst: int = DEFAULT_ROOM_BURST,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.room_rate = room_rate
+        self.room_burst = room_burst
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self._clock = clock
+        self._global = TokenBucket(rate, burst, clock())
+        self._rooms: Dict[str, TokenBucket] = {}
+        self._queues: Dict[int, Deque[_Message]] = {p: deque() for p in PRIORITIES}
+        self._busy_rooms: Set[str] = set()
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self.stats = OutboxStats()
+
+    def depth(self) -> Dict[int, int]:
+        return {p: len(q) for p, q in self._queues.items()}
+
+    async def send(self, room_id: str, content: Dict, *, priority: int = PRIORITY_REPLY) -> str:
+        # Resolves with the event id once the homeserver accepted the message.
+        if priority not in self._queues:
+            raise ValueError(f"invalid priority: {priority}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(
+            _Message(next(self._seq), room_id, content, priority, future)
+        )
+        self._wakeup.set()
+        return await future
+
+    async def send_text(self, room_id: str, body: str, *, priority: int = PRIORITY_REPLY) -> str:
+        return await self.send(room_id, {"msgtype": "m.text", "body": body}, priority=priority)
+
+    async def close(self) -> None:
+        tasks = list(self._inflight)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self._queues.values():
+            while queue:
+                msg = queue.popleft()
+                if not msg.future.done():
+                    msg.future.set_exception(SendError("outbox closed"))
+
+    def _room_bucket(self, room_id: str, now: float) -> TokenBucket:
+        bucket = self._rooms.get(room_id)
+        if bucket is None:
+            bucket = self._rooms[room_id] = TokenBucket(self.room_rate, self.room_burst, now)
+        return bucket
+
+    def _next_ready(self, now: float) -> Tuple[Optional[_Message], Optional[float]]:
+        # Returns the message to send now, or how long to wait before the
+        # next one could be sent (None: nothing is waiting on time).
+        if len(self._inflight) >= self.concurrency:
+            return None, None
+        if now < self._paused_until:
+            return None, self._paused_until - now
+        global_wait = self._global.wait_time(now)
+        wait: Optional[float] = None
+        blocked: Set[str] = set(self._busy_rooms)
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            for msg in queue:
+                if msg.room_id in blocked:
+                    continue
+                # Later messages for this room must not overtake this one.
+                blocked.add(msg.room_id)
+                room_wait = max(global_wait, self._room_bucket(msg.room_id, now).wait_time(now))
+                if room_wait > 0:
+                    wait = room_wait if wait is None else min(wait, room_wait)
+                    continue
+                queue.remove(msg)
+                return msg, None
+        return None, wait
+
+    async def _run(self) -> None:
+        while True:
+            now = self._clock()
+            msg, wait = self._next_ready(now)
+            if msg is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._global.take(now)
+            self._room_bucket(msg.room_id, now).take(now)
+            self._busy_rooms.add(msg.room_id)
+            task = asyncio.create_task(self._deliver(msg))
+            self._inflight.add(task)
+
+    async def _deliver(self, msg: _Message) -> None:
+        try:
+            if msg.future.done():
+                # The caller gave up (cancelled) while the message was queued.
+                return
+            resp = await self.client.room_send(
+                room_id=msg.room_id, message_type="m.room.message", content=msg.content
+            )
+            if isinstance(resp, ErrorResponse):
+                if resp.status_code == LIMIT_EXCEEDED and msg.attempts < self.max_retries:
+                    retry_after_ms = resp.retry_after_ms or DEFAULT_RETRY_AFTER_MS
+                    self.stats.rate_limited += 1
+                    self._paused_until = max(
+                        self._paused_until, self._clock() + retry_after_ms / 1000
+                    )
+                    logger.warning(
+                        "Rate limited sending to %s, retry after %d ms", msg.room_id, retry_after_ms
+                    )
+                    msg.attempts += 1
+                    # Back to the head of its class so room order is kept.
+                    self._queues[msg.priority].appendleft(msg)
+                    return
+                raise SendError(str(resp))
+            self.stats.sent += 1
+            self.stats.by_priority[msg.priority] += 1
+            if not msg.future.done():
+                msg.future.set_result(getattr(resp, "event_id", ""))
+        except asyncio.CancelledError:
+            if not msg.future.done():
+                msg.future.set_exception(SendError("outbox closed"))
+            raise
+        except Exception as exc:
+            self.stats.failed += 1
+            if not msg.future.done():
+                msg.future.set_exception(exc)
+        finally:
+            # Freed before the wakeup so the scheduler sees the open slot.
+            self._inflight.discard(asyncio.current_task())
+            self._busy_rooms.discard(msg.room_id)
+            self._wakeup.set()
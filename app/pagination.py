@@ -0,0 +1,59 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_after: Optional[str] = None
+    offset: int = 0
+
+
+def encode_cursor(key: Sequence[Any], offset: int) -> str:
+    raw = json.dumps([list(key), offset], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[List[Any], int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key, offset = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("invalid cursor") from None
+    if not isinstance(key, list) or not isinstance(offset, int) or offset < 0:
+        raise ValueError("invalid cursor")
+    return key, offset
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE) -> int:
+    if limit is None or limit <= 0:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def build_page(rows: Sequence[Any], limit: int, offset: int, key_of) -> Page:
+    items = list(rows[:limit])
+    next_after = None
+    if len(rows) > limit and items:
+        next_after = encode_cursor(key_of(items[-1]), offset + len(items))
+    return Page(items=items, next_after=next_after, offset=offset)
+
+
+def pop_after(tokens: Sequence[str]) -> Tuple[Optional[str], List[str]]:
+    rest: List[str] = []
+    after = None
+    it = iter(tokens)
+    for token in it:
+        if token == "--after":
+            after = next(it, None)
+            if after is None:
+                raise ValueError("missing cursor")
+            continue
+        rest.append(token)
+    return after, rest
@@ -0,0 +1,73 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+from app.config import Config, _split_csv
+
+
+@dataclass(frozen=True)
+class RoomOverride:
+    # None keeps the global setting.
+    allow_todo_public: Optional[bool] = None
+    admin_users: FrozenSet[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class Policy:
+    # Compiled from a Config and never mutated: a reload builds a new Policy
+    # and swaps the reference, so a handler sees either the old or the new
+    # rules, never a mix.
+    allowed_rooms: FrozenSet[str]
+    admin_users: FrozenSet[str]
+    allow_todo_public: bool
+    room_overrides: Mapping[str, RoomOverride] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+
+    def room_allowed(self, room_id: str) -> bool:
+        return room_id in self.allowed_rooms
+
+    def is_admin(self, user_id: str, room_id: Optional[str] = None) -> bool:
+        if user_id in self.admin_users:
+            return True
+        override = self.room_overrides.get(room_id) if room_id else None
+        return override is not None and user_id in override.admin_users
+
+    def allow_public(self, room_id: Optional[str] = None) -> bool:
+        override = self.room_overrides.get(room_id) if room_id else None
+        if override is not None and override.allow_todo_public is not None:
+            return override.allow_todo_public
+        return self.allow_todo_public
+
+
+def _as_bool(value: Any) -> bool:
+    return str(value).lower() in ("1", "true", "yes", "y")
+
+
+def _compile_override(room_id: str, raw: Any) -> RoomOverride:
+    if not isinstance(raw, dict):
+        raise ValueError(f"ROOM_OVERRIDES[{room_id}] must be a mapping")
+    unknown = set(raw) - {"ALLOW_TODO_PUBLIC", "ADMIN_USERS"}
+    if unknown:
+        raise ValueError(f"ROOM_OVERRIDES[{room_id}] has unknown keys: {', '.join(sorted(unknown))}")
+    public = raw.get("ALLOW_TODO_PUBLIC")
+    admins = raw.get("ADMIN_USERS", "")
+    if isinstance(admins, (list, tuple)):
+        admins = ",".join(admins)
+    return RoomOverride(
+        allow_todo_public=None if public is None else _as_bool(public),
+        admin_users=frozenset(_split_csv(admins)),
+    )
+
+
+def compile_policy(cfg: Config) -> Policy:
+    overrides: Dict[str, RoomOverride] = {
+        room_id: _compile_override(room_id, raw)
+        for room_id, raw in (cfg.room_overrides or {}).items()
+    }
+    return Policy(
+        allowed_rooms=frozenset(cfg.allowed_rooms),
+        admin_users=frozenset(cfg.admin_users),
+        allow_todo_public=cfg.allow_todo_public,
+        room_overrides=MappingProxyType(overrides),
+    )
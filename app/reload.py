@@ -0,0 +1,158 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import signal
+from typing import Awaitable, Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import Config, load_config
+from app.policy import Policy, compile_policy
+
+
+logger = logging.getLogger("matrix-bot.config")
+
+# Settings applied to the running bot on reload. Everything else (paths,
+# credentials, DB and worker pool sizing, sync profile) needs a restart.
+HOT_FIELDS = frozenset(
+    {
+        "allowed_rooms",
+        "admin_users",
+        "allow_todo_public",
+        "room_overrides",
+        "alert_room_id",
+        "monitor_interval_sec",
+        "alert_cooldown_min",
+        "cpu_threshold",
+        "cpu_consecutive",
+        "ram_threshold",
+        "disk_threshold",
+        "loadavg_threshold",
+        "loadavg_auto_per_core",
+        "timezone",
+        "poll_interval_seconds",
+        "reminder_lookahead_seconds",
+        "reminder_batch_size",
+        "reminder_concurrency",
+        "reminder_lease_seconds",
+        "reminder_coalesce_window_sec",
+        "reminder_digest_max_chars",
+        "reminder_max_attempts",
+        "reminder_retry_max_seconds",
+        "import_max_bytes",
+        "health_interval_sec",
+        "health_ttl_sec",
+        "sync_timeline_limit",
+        "retention_days",
+        "db_maintenance_interval_sec",
+        "db_maintenance_quiet_sec",
+    }
+)
+
+DEFAULT_WATCH_INTERVAL_SEC = 5
+
+Apply = Callable[[Config, Policy, List[str]], Awaitable[None]]
+
+
+def changed_fields(old: Config, new: Config) -> List[str]:
+    return [
+        f.name
+        for f in dataclasses.fields(Config)
+        if getattr(old, f.name) != getattr(new, f.name)
+    ]
+
+
+def merge_hot(old: Config, new: Config) -> Tuple[Config, List[str], List[str]]:
+    # Returns the config to run with, the applied fields and the ignored ones.
+    changed = changed_fields(old, new)
+    hot = [name for name in changed if name in HOT_FIELDS]
+    cold = [name for name in changed if name not in HOT_FIELDS]
+    merged = dataclasses.replace(old, **{name: getattr(new, name) for name in hot})
+    return merged, hot, cold
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ConfigReloader:
+    # Reloads on SIGHUP and when CONFIG_YAML's mtime changes. A config that
+    # fails to load or compile is logged and the running one is kept.
+    def __init__(
+        self,
+        current: Config,
+        apply: Apply,
+        *,
+        path: Optional[str] = None,
+        interval_sec: float = DEFAULT_WATCH_INTERVAL_SEC,
+        loader: Callable[[], Config] = load_config,
+    ):
+        self.current = current
+        self.apply = apply
+        self.path = path if path is not None else os.getenv("CONFIG_YAML", "").strip()
+        self.interval_sec = interval_sec
+        self.loader = loader
+        self.reloads = 0
+        self._mtime = _mtime(self.path) if self.path else None
+        self._requested = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def request(self) -> None:
+        self._requested.set()
+
+    def install_signal_handler(self) -> None:
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.request)
+        except (NotImplementedError, AttributeError, RuntimeError):
+            logger.info("SIGHUP reload not supported on this platform")
+
+    async def reload(self) -> bool:
+        async with self._lock:
+            try:
+                new = await asyncio.to_thread(self.loader)
+                merged, hot, cold = merge_hot(self.current, new)
+                policy = compile_policy(merged)
+                ZoneInfo(merged.timezone)
+            except Exception:
+                logger.exception("Config reload failed; keeping the current config")
+                return False
+            if cold:
+                logger.warning("Config changes need a restart to take effect: %s", ", ".join(cold))
+            if not hot:
+                logger.info("Config reloaded, nothing to apply")
+                return True
+            try:
+                await self.apply(merged, policy, hot)
+            except Exception:
+                logger.exception("Applying reloaded config failed; keeping the current config")
+                return False
+            self.current = merged
+            self.reloads += 1
+            logger.info("Config reloaded: %s", ", ".join(hot))
+            return True
+
+    async def run(self) -> None:
+        watch = bool(self.path) and self.interval_sec > 0
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._requested.wait(), self.interval_sec if watch else None
+                )
+            except asyncio.TimeoutError:
+                pass
+            requested = self._requested.is_set()
+            self._requested.clear()
+            if watch:
+                mtime = _mtime(self.path)
+                if mtime != self._mtime:
+                    self._mtime = mtime
+                    requested = True
+            if requested:
+                try:
+                    await self.reload()
+                except Exception:
+                    # Never let one bad reload stop later SIGHUPs and edits.
+                    logger.exception("Config reload crashed")
@@ -1,8 +1,16 @@
+import os
 import re
-from datetime import datetime
-from zoneinfo import ZoneInfo
+import tempfile
+import time
+from typing import Any, Dict
 
-from app.reminders.time_utils import DATETIME_FORMAT, DEFAULT_TZ, format_utc_iso_to_local
+from app.commands.registry import ACL_PUBLIC, Invocation, command
+from app.media import MediaTooLarge
+from app.pagination import pop_after
+from app.reminders.repository import MAX_CANCEL_IDS
+from app.reminders.recurrence import describe_rule, parse_rule
+from app.reminders.service import ReminderInputError
+from app.reminders.time_utils import DATETIME_FORMAT, DEFAULT_TZ, format_ms_to_local
 
 
 USAGE = (
@@ -12,91 +20,151 @@ USAGE = (
     "!remind add MM-DD HH <內容>（預設今年，分=00）\n"
     "!remind add HH <內容>（今天）\n"
     "!remind add HH:MM <內容>（今天）\n"
-    "!remind list\n"
-    "!remind cancel <id>\n"
+    "!remind add +30m|+2h|+1d <內容>（相對時間）\n"
+    "!remind add tomorrow HH[:MM] <內容>（明天，也可用 today/今天/明天）\n"
+    "重複：加上 --repeat daily|weekly[:MO,WE]|monthly|every:<N>h [--until YYYY-MM-DD] [--count N]\n"
+    "!remind list [--after <token>]\n"
+    "!remind cancel <id>[,<id>|<id>-<id>...]\n"
     "!remind import\\n"
-    "due_local,text,room_id(optional)"
+    "due_local,text,room_id(optional)\n"
+    "!remind import（不帶內容）後 5 分鐘內上傳 .csv 檔"
 )
 
+IMPORT_ATTACHMENT_WINDOW_SEC = 300
+MAX_REPORTED_IMPORT_ERRORS = 10
 
-def _normalize_today_due_local(time_token: str, tz_name: str) -> str:
-    hour, minute = _parse_hour_minute(time_token)
 
-    today = datetime.now(ZoneInfo(tz_name)).strftime("%Y-%m-%d")
-    return f"{today} {hour:02d}:{minute:02d}"
+def _format_import_result(result: Dict[str, Any]) -> str:
+    aborted = result.get("aborted")
+    if aborted:
+        lines = [
+            f"匯入中止：{aborted}；已匯入 {result['ok']} 筆，失敗 {result['failed']} 筆"
+        ]
+    else:
+        lines = [f"匯入完成：成功 {result['ok']} 筆，失敗 {result['failed']} 筆"]
+    errors = result.get("errors") or []
+    for err in errors[:MAX_REPORTED_IMPORT_ERRORS]:
+        where = f"第 {err['line']} 行" if err["line"] is not None else "批次"
+        lines.append(f"- {where}：{err['reason']}")
+    hidden = result["failed"] - min(len(errors), MAX_REPORTED_IMPORT_ERRORS)
+    if hidden > 0:
+        lines.append(f"…另有 {hidden} 筆錯誤未列出")
+    return "\n".join(lines)
 
 
-def _parse_hour_minute(time_token: str) -> tuple[int, int]:
-    if re.fullmatch(r"\d{1,2}", time_token):
-        hour = int(time_token)
-        minute = 0
-    elif re.fullmatch(r"\d{1,2}:\d{2}", time_token):
-        hour_str, minute_str = time_token.split(":")
-        hour = int(hour_str)
-        minute = int(minute_str)
-    else:
-        raise ValueError("invalid time token")
+async def handle_remind_attachment(
+    bot, room_id: str, sender: str, filename: str, mxc_url: str, size: int
+) -> None:
+    deadline = bot.pending_imports.pop((room_id, sender), None)
+    if deadline is None or deadline < time.monotonic():
+        return
+    if not filename.lower().endswith(".csv"):
+        await bot._send_text(room_id, "只接受 .csv 檔案")
+        return
+    too_large = f"檔案過大（上限 {bot.cfg.import_max_bytes} bytes）"
+    if size and size > bot.cfg.import_max_bytes:
+        await bot._send_text(room_id, too_large)
+        return
 
-    if hour < 0 or hour > 23 or minute < 0 or minute > 59:
-        raise ValueError("invalid time range")
-    return hour, minute
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "import.csv")
+        # The declared size is only a hint; the download itself is capped.
+        try:
+            downloaded = await bot._download_to(mxc_url, path, bot.cfg.import_max_bytes)
+        except MediaTooLarge:
+            await bot._send_text(room_id, too_large)
+            return
+        if not downloaded:
+            await bot._send_text(room_id, "下載 CSV 檔失敗")
+            return
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            result = await bot.reminder_service.import_csv_stream(
+                user_id=sender,
+                default_room_id=room_id,
+                lines=f,
+                tz_name=bot.cfg.timezone or DEFAULT_TZ,
+            )
+    await bot._send_text(room_id, _format_import_result(result))
 
 
-def _normalize_yearless_due_local(date_token: str, time_token: str, tz_name: str) -> str:
-    if not re.fullmatch(r"\d{1,2}-\d{1,2}", date_token):
-        raise ValueError("invalid date token")
+def _parse_id_list(spec: str) -> list:
+    ids = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        if re.fullmatch(r"\d+", part):
+            ids.add(int(part))
+            continue
+        match = re.fullmatch(r"(\d+)-(\d+)", part)
+        if not match:
+            raise ValueError(f"invalid id: {part}")
+        start, end = int(match.group(1)), int(match.group(2))
+        if start > end or end - start >= MAX_CANCEL_IDS:
+            raise ValueError(f"invalid range: {part}")
+        ids.update(range(start, end + 1))
+        if len(ids) > MAX_CANCEL_IDS:
+            raise ValueError("too many ids")
+    if not ids or 0 in ids:
+        raise ValueError("invalid ids")
+    return sorted(ids)
 
-    month_str, day_str = date_token.split("-")
-    month = int(month_str)
-    day = int(day_str)
-    hour, minute = _parse_hour_minute(time_token)
-    if month < 1 or month > 12:
-        raise ValueError("invalid month")
-    if day < 1 or day > 31:
-        raise ValueError("invalid day")
 
-    year = datetime.now(ZoneInfo(tz_name)).year
-    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}"
+REPEAT_FLAGS = ("--repeat", "--until", "--count")
 
 
-async def handle_remind(bot, room_id: str, sender: str, body: str) -> None:
-    if not bot.cfg.allow_todo_public and not bot._is_admin(sender):
-        return
+def _pop_repeat_flags(tokens: list) -> tuple:
+    rest = []
+    flags: Dict[str, str] = {}
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in REPEAT_FLAGS:
+            if i + 1 >= len(tokens):
+                raise ReminderInputError(f"{tokens[i]} 缺少參數")
+            flags[tokens[i]] = tokens[i + 1]
+            i += 2
+            continue
+        rest.append(tokens[i])
+        i += 1
+    if ("--until" in flags or "--count" in flags) and "--repeat" not in flags:
+        raise ReminderInputError("--until/--count 需搭配 --repeat")
+    count = flags.get("--count")
+    if count is None:
+        return rest, flags.get("--repeat"), flags.get("--until"), None
+    try:
+        repeat_count = int(count)
+    except ValueError:
+        repeat_count = 0
+    if repeat_count < 1:
+        raise ReminderInputError(f"--count 必須是正整數：{count}")
+    return rest, flags.get("--repeat"), flags.get("--until"), repeat_count
 
-    parts = body.split(maxsplit=2)
-    if len(parts) < 2:
-        await bot._send_text(room_id, USAGE)
-        return
 
-    action = parts[1]
+def _describe_repeat(repeat_rule) -> str:
+    if not repeat_rule:
+        return ""
+    try:
+        return f"（{describe_rule(parse_rule(repeat_rule))}）"
+    except ValueError:
+        return ""
+
+
+@command("remind", acl=ACL_PUBLIC, usage=USAGE, min_args=1)
+async def handle_remind(bot, inv: Invocation) -> None:
+    room_id, sender = inv.room_id, inv.sender
+    action = inv.args[0]
     default_tz = bot.cfg.timezone or DEFAULT_TZ
 
     if action == "add":
-        payload = body[len("!remind add") :].strip()
+        payload = inv.rest(1)
         if not payload:
             await bot._send_text(
                 room_id,
-                f"格式錯誤，可用 {DATETIME_FORMAT}、MM-DD HH:MM、HH 或 HH:MM",
+                f"格式錯誤，可用 {DATETIME_FORMAT}、MM-DD HH:MM、HH、HH:MM、+30m 或 tomorrow 9",
             )
             return
         try:
-            tokens = payload.split()
-            if len(tokens) < 2:
-                await bot._send_text(room_id, "提醒內容不可為空")
-                return
-
-            if re.fullmatch(r"\d{4}-\d{2}-\d{2}", tokens[0]) and len(tokens) >= 3:
-                due_local = f"{tokens[0]} {tokens[1]}"
-                text = " ".join(tokens[2:]).strip()
-            elif re.fullmatch(r"\d{1,2}-\d{1,2}", tokens[0]) and len(tokens) >= 3:
-                due_local = _normalize_yearless_due_local(
-                    tokens[0], tokens[1], default_tz
-                )
-                text = " ".join(tokens[2:]).strip()
-            else:
-                due_local = _normalize_today_due_local(tokens[0], default_tz)
-                text = " ".join(tokens[1:]).strip()
-
+            tokens, repeat, repeat_until, repeat_count = _pop_repeat_flags(payload.split())
+            due_at_ms, text = bot.reminder_service.parse_due(" ".join(tokens), default_tz)
             if not text:
                 await bot._send_text(room_id, "提醒內容不可為空")
                 return
@@ -104,10 +172,16 @@ async def handle_remind(bot, room_id: str, sender: str, body: str) -> None:
                 user_id=sender,
                 room_id=room_id,
                 text=text,
-                due_local=due_local,
+                due_at_ms=due_at_ms,
                 tz_name=default_tz,
+                repeat=repeat,
+                repeat_until=repeat_until,
+                repeat_count=repeat_count,
             )
-            await bot._send_text(room_id, "已新增提醒")
+            await bot._send_text(room_id, "已新增提醒" + (f"（重複：{repeat}）" if repeat else ""))
+            return
+        except ReminderInputError as exc:
+            await bot._send_text(room_id, f"提醒設定失敗：{exc}")
             return
         except ValueError:
             await bot._send_text(
@@ -118,49 +192,69 @@ async def handle_remind(bot, room_id: str, sender: str, body: str) -> None:
         except Exception:
             await bot._send_text(
                 room_id,
-                f"格式錯誤，可用 {DATETIME_FORMAT}、MM-DD HH:MM、HH 或 HH:MM",
+                f"格式錯誤，可用 {DATETIME_FORMAT}、MM-DD HH:MM、HH、HH:MM、+30m 或 tomorrow 9",
             )
             return
 
     if action == "list":
-        rows = await bot.reminder_service.list_reminders(user_id=sender)
-        if not rows:
+        try:
+            after, _ = pop_after(inv.args[1:])
+            page = await bot.reminder_service.list_reminders(user_id=sender, after=after)
+        except ValueError:
+            await bot._send_text(room_id, "用法: !remind list [--after <token>]")
+            return
+        if not page.items:
             await bot._send_text(room_id, "目前沒有待提醒事項")
             return
         lines = ["提醒清單:"]
-        for idx, row in enumerate(rows, start=1):
-            due_local = format_utc_iso_to_local(row["due_at_utc"], row["tz"])
-            lines.append(f"#{idx} {due_local} {row['tz']} {row['text']}")
+        for row in page.items:
+            due_local = format_ms_to_local(row["due_at_ms"], row["tz"])
+            repeat = _describe_repeat(row.get("repeat_rule"))
+            retrying = "（發送失敗，重試中）" if row["status"] == "retrying" else ""
+            lines.append(
+                f"#{row['user_seq']} {due_local} {row['tz']} {row['text']}{repeat}{retrying}"
+            )
+        if page.next_after:
+            lines.append(f"下一頁: !remind list --after {page.next_after}")
         await bot._send_text(room_id, "\n".join(lines))
         return
 
     if action == "cancel":
-        if len(parts) < 3:
-            await bot._send_text(room_id, "用法: !remind cancel <id>")
+        if len(inv.args) < 2:
+            await bot._send_text(room_id, "用法: !remind cancel <id>[,<id>|<id>-<id>...]")
             return
         try:
-            display_id = int(parts[2])
+            public_ids = _parse_id_list(inv.rest(1))
         except ValueError:
-            await bot._send_text(room_id, "提醒 id 必須是數字")
-            return
-        if display_id <= 0:
-            await bot._send_text(room_id, "提醒 id 必須從 1 開始")
+            await bot._send_text(
+                room_id,
+                f"提醒 id 格式錯誤，例如 3 或 3,5,7-9（一次最多 {MAX_CANCEL_IDS} 筆）",
+            )
             return
-        rows = await bot.reminder_service.list_reminders(user_id=sender)
-        if display_id > len(rows):
+        cancelled = await bot.reminder_service.cancel_reminders(
+            user_id=sender, public_ids=public_ids
+        )
+        if not cancelled:
             await bot._send_text(room_id, "找不到可取消的提醒")
             return
-        reminder_id = rows[display_id - 1]["id"]
-        ok = await bot.reminder_service.cancel_reminder(reminder_id=reminder_id, user_id=sender)
-        await bot._send_text(room_id, "已取消" if ok else "找不到可取消的提醒")
+        missing = sorted(set(public_ids) - set(cancelled))
+        msg = "已取消 " + ", ".join(f"#{i}" for i in cancelled)
+        if missing and len(public_ids) > 1:
+            msg += "\n找不到：" + ", ".join(f"#{i}" for i in missing[:20])
+            if len(missing) > 20:
+                msg += f" …（共 {len(missing)} 筆）"
+        await bot._send_text(room_id, msg)
         return
 
     if action == "import":
-        csv_text = body[len("!remind import") :].strip()
+        csv_text = inv.rest(1)
         if not csv_text:
+            bot.pending_imports[(room_id, sender)] = (
+                time.monotonic() + IMPORT_ATTACHMENT_WINDOW_SEC
+            )
             await bot._send_text(
                 room_id,
-                "請在同一則訊息貼上 CSV 內容，例如:\n"
+                "請在 5 分鐘內上傳 .csv 檔，或在同一則訊息貼上 CSV 內容，例如:\n"
                 "due_local,text,room_id\n"
                 "2026-02-20 09:00,繳月費,!abc:example.com\n"
                 "2026-02-20 12:30,開會\n",
@@ -172,10 +266,7 @@ async def handle_remind(bot, room_id: str, sender: str, body: str) -> None:
             csv_text=csv_text,
             tz_name=default_tz,
         )
-        await bot._send_text(
-            room_id,
-            f"匯入完成：成功 {result['ok']} 筆，失敗 {result['failed']} 筆",
-        )
+        await bot._send_text(room_id, _format_import_result(result))
         return
 
     await bot._send_text(room_id, USAGE)
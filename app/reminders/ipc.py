@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from app.reminders.scheduler import ReminderScheduler
+
+
+logger = logging.getLogger("matrix-bot.reminder.ipc")
+
+# Newline-delimited JSON over a Unix socket, main process -> reminder worker:
+#   {"op": "notify", "due": <epoch seconds>}  a reminder was added/rescheduled
+#   {"op": "reschedule"}                      reload the due window from the DB
+#   {"op": "reload"}                          re-read the config (SIGHUP)
+MAX_PENDING = 1000
+RECONNECT_MIN_SECONDS = 0.2
+RECONNECT_MAX_SECONDS = 5.0
+
+
+class ScheduleLink:
+    # Stands in for ReminderScheduler inside the main process when reminders
+    # are dispatched by the worker process: the service's notify() and
+    # reschedule() calls are forwarded over the socket instead.
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        # Set by ReminderService.apply_settings; the worker has its own values.
+        self.lookahead_seconds = None
+        self.retry_seconds = None
+        self.batch_size = None
+        self.sent = 0
+        self._queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=MAX_PENDING)
+        self._overflowed = False
+
+    def _put(self, message: dict) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A single reschedule after the backlog covers everything dropped.
+            self._overflowed = True
+
+    def notify(self, due_ts: float) -> None:
+        self._put({"op": "notify", "due": due_ts})
+
+    def reschedule(self) -> None:
+        self._put({"op": "reschedule"})
+
+    def request_reload(self) -> None:
+        self._put({"op": "reload"})
+
+    async def run(self) -> None:
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(RECONNECT_MAX_SECONDS, delay * 2)
+                continue
+            delay = RECONNECT_MIN_SECONDS
+            try:
+                # Changes may have been missed while disconnected.
+                await self._write(writer, {"op": "reschedule"})
+                while True:
+                    message = await self._queue.get()
+                    if self._overflowed and self._queue.empty():
+                        self._overflowed = False
+                        message = {"op": "reschedule"}
+                    await self._write(writer, message)
+            except (ConnectionError, OSError):
+                logger.warning("Reminder worker link lost, reconnecting")
+            finally:
+                writer.close()
+
+    async def _write(self, writer: asyncio.StreamWriter, message: dict) -> None:
+        writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await writer.drain()
+        self.sent += 1
+
+
+async def serve_schedule_changes(
+    socket_path: str,
+    scheduler: ReminderScheduler,
+    on_reload: Optional[Callable[[], None]] = None,
+) -> asyncio.AbstractServer:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    message = json.loads(line)
+                    op = message.get("op")
+                    if op == "notify":
+                        scheduler.notify(float(message["due"]))
+                    elif op == "reschedule":
+                        scheduler.reschedule()
+                    elif op == "reload" and on_reload is not None:
+                        on_reload()
+                    else:
+                        logger.warning("Ignoring unknown IPC op: %r", op)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    logger.warning("Ignoring malformed IPC message: %r", line[:200])
+        finally:
+            writer.close()
+
+    if os.path.exists(socket_path):
+        # Left behind by a previous worker that did not shut down cleanly.
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    os.chmod(socket_path, 0o600)
+    return server
@@ -0,0 +1,202 @@
+import calendar
+import re
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from app.reminders.time_utils import get_zone
+
+
+FREQUENCIES = ("HOURLY", "DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+WEEKDAY_LABELS = ("一", "二", "三", "四", "五", "六", "日")
+HOUR_MS = 3600 * 1000
+
+
+@dataclass(frozen=True)
+class RepeatRule:
+    freq: str
+    interval: int = 1
+    byday: Tuple[int, ...] = ()
+    bymonthday: int = 0
+    hour: int = 0
+    minute: int = 0
+    until: Optional[date] = None
+    count: Optional[int] = None
+
+    def serialize(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.freq == "WEEKLY":
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in self.byday))
+        if self.freq == "MONTHLY":
+            parts.append(f"BYMONTHDAY={self.bymonthday}")
+        if self.freq != "HOURLY":
+            parts.append(f"BYHOUR={self.hour};BYMINUTE={self.minute}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+
+def parse_rule(text: str) -> RepeatRule:
+    fields = {}
+    for part in text.split(";"):
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"invalid repeat rule: {text}")
+        fields[key.strip().upper()] = value.strip().upper()
+    freq = fields.get("FREQ", "")
+    if freq not in FREQUENCIES:
+        raise ValueError(f"invalid repeat frequency: {freq}")
+    byday = tuple(sorted({WEEKDAYS.index(d) for d in fields.get("BYDAY", "").split(",") if d}))
+    until = fields.get("UNTIL")
+    count = fields.get("COUNT")
+    rule = RepeatRule(
+        freq=freq,
+        interval=int(fields.get("INTERVAL", 1)),
+        byday=byday,
+        bymonthday=int(fields.get("BYMONTHDAY", 0)),
+        hour=int(fields.get("BYHOUR", 0)),
+        minute=int(fields.get("BYMINUTE", 0)),
+        until=datetime.strptime(until, "%Y%m%d").date() if until else None,
+        count=int(count) if count else None,
+    )
+    if rule.interval < 1 or (freq == "WEEKLY" and not rule.byday):
+        raise ValueError(f"invalid repeat rule: {text}")
+    return rule
+
+
+def build_rule(
+    spec: str,
+    first_due_ms: int,
+    tz_name: str,
+    *,
+    until: Optional[str] = None,
+    count: Optional[int] = None,
+) -> RepeatRule:
+    # The rule keeps the local wall time (and day of month) of the first due.
+    first = datetime.fromtimestamp(first_due_ms / 1000, tz=get_zone(tz_name))
+    spec = spec.strip().lower()
+    anchor = {"hour": first.hour, "minute": first.minute}
+    if spec == "daily":
+        rule = RepeatRule(freq="DAILY", **anchor)
+    elif spec == "weekly" or spec.startswith("weekly:"):
+        days = spec.partition(":")[2]
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(d.upper()) for d in days.split(",") if d}))
+        except ValueError:
+            raise ValueError(f"invalid weekday in: {spec}") from None
+        rule = RepeatRule(freq="WEEKLY", byday=byday or (first.weekday(),), **anchor)
+    elif spec == "monthly":
+        rule = RepeatRule(freq="MONTHLY", bymonthday=first.day, **anchor)
+    else:
+        match = re.fullmatch(r"every:(\d+)h", spec)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"invalid repeat spec: {spec}")
+        rule = RepeatRule(freq="HOURLY", interval=int(match.group(1)))
+    if until is not None:
+        rule = replace(rule, until=datetime.strptime(until, "%Y-%m-%d").date())
+    if count is not None:
+        if count < 1:
+            raise ValueError("repeat count must be positive")
+        rule = replace(rule, count=count)
+    return rule
+
+
+def _local_ms(day: date, rule: RepeatRule, tz_name: str) -> int:
+    # Wall-clock anchored: 09:00 stays 09:00 across DST changes. A time that
+    # falls in a spring-forward gap resolves to the shifted instant (fold=0).
+    local = datetime(
+        day.year, day.month, day.day, rule.hour, rule.minute, tzinfo=get_zone(tz_name)
+    )
+    return int(local.timestamp() * 1000)
+
+
+def _next_daily(rule: RepeatRule, prev: date, floor: date) -> date:
+    steps = max(1, -(-(floor - prev).days // rule.interval))
+    return prev + timedelta(days=steps * rule.interval)
+
+
+def _next_weekly(rule: RepeatRule, prev: date, floor: date) -> date:
+    week0 = prev - timedelta(days=prev.weekday())
+    day = max(floor, prev + timedelta(days=1))
+    # At most two matching weeks need to be inspected.
+    for _ in range(2):
+        week = (day - week0).days // 7
+        offset = -week % rule.interval
+        if offset:
+            day = week0 + timedelta(weeks=week + offset)
+        for wd in rule.byday:
+            if wd >= day.weekday():
+                return day + timedelta(days=wd - day.weekday())
+        day = day - timedelta(days=day.weekday()) + timedelta(weeks=1)
+    raise AssertionError("unreachable")
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def _next_monthly(rule: RepeatRule, prev: date, floor: date) -> date:
+    elapsed = (floor.year - prev.year) * 12 + floor.month - prev.month
+    steps = max(1, -(-elapsed // rule.interval))
+    year, month = _add_months(prev.year, prev.month, steps * rule.interval)
+    # Days past the end of a month (e.g. the 31st) fall on its last day.
+    day = min(rule.bymonthday, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+_CALENDAR_STEPS = {"DAILY": _next_daily, "WEEKLY": _next_weekly, "MONTHLY": _next_monthly}
+
+
+def next_occurrence(
+    rule: RepeatRule, prev_due_ms: int, tz_name: str, now_ms: int
+) -> Optional[Tuple[int, RepeatRule]]:
+    # Only the next instance is computed. Occurrences missed while the bot was
+    # offline are skipped arithmetically, so the cost does not depend on how
+    # long the series has run. None means the series has ended.
+    remaining = None
+    if rule.count is not None:
+        remaining = rule.count - 1
+        if remaining < 1:
+            return None
+
+    if rule.freq == "HOURLY":
+        step = rule.interval * HOUR_MS
+        due_ms = prev_due_ms + step * max(1, (now_ms - prev_due_ms) // step + 1)
+    else:
+        zone = get_zone(tz_name)
+        prev = datetime.fromtimestamp(prev_due_ms / 1000, tz=zone).date()
+        floor = datetime.fromtimestamp(now_ms / 1000, tz=zone).date()
+        advance = _CALENDAR_STEPS[rule.freq]
+        day = advance(rule, prev, max(floor, prev))
+        due_ms = _local_ms(day, rule, tz_name)
+        if due_ms <= now_ms:
+            day = advance(rule, day, day)
+            due_ms = _local_ms(day, rule, tz_name)
+
+    if rule.until is not None:
+        until_local = datetime.fromtimestamp(due_ms / 1000, tz=get_zone(tz_name)).date()
+        if until_local > rule.until:
+            return None
+    return due_ms, replace(rule, count=remaining)
+
+
+def describe_rule(rule: RepeatRule) -> str:
+    if rule.freq == "HOURLY":
+        text = f"每 {rule.interval} 小時"
+    elif rule.freq == "DAILY":
+        text = "每天" if rule.interval == 1 else f"每 {rule.interval} 天"
+    elif rule.freq == "WEEKLY":
+        text = "每週" + "、".join(WEEKDAY_LABELS[d] for d in rule.byday)
+    else:
+        text = f"每月 {rule.bymonthday} 日"
+    if rule.until is not None:
+        text += f"，至 {rule.until.isoformat()}"
+    if rule.count is not None:
+        text += f"，剩 {rule.count} 次"
+    return text
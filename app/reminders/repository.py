@@ -1,39 +1,258 @@
 import os
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import aiosqlite
 
+from app.cache import DEFAULT_MAX_ENTRIES, QueryCache
+from app.db import DEFAULT_GROUP_COMMIT_MAX_ITEMS, Database
+from app.migrations import Migration, migrate, sql
+from app.pagination import Page, build_page, clamp_limit, decode_cursor
+from app.reminders.time_utils import ms_to_utc_iso
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "create reminders",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                due_at_utc TEXT NOT NULL,
+                tz TEXT NOT NULL DEFAULT 'Asia/Taipei',
+                status TEXT NOT NULL DEFAULT 'pending',
+                repeat_rule TEXT,
+                created_at_utc TEXT NOT NULL,
+                sent_at_utc TEXT
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_status_due
+            ON reminders(status, due_at_utc);
+            """,
+        ),
+    ),
+    Migration(
+        2,
+        "partial index for claim_due",
+        sql(
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_pending_due
+            ON reminders(due_at_utc, id)
+            WHERE status = 'pending';
+            """,
+            "DROP INDEX IF EXISTS idx_reminders_status_due",
+        ),
+    ),
+    Migration(
+        3,
+        "reminders archive",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS reminders_archive (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                due_at_utc TEXT NOT NULL,
+                tz TEXT NOT NULL,
+                status TEXT NOT NULL,
+                repeat_rule TEXT,
+                created_at_utc TEXT NOT NULL,
+                sent_at_utc TEXT,
+                archived_at_utc TEXT NOT NULL
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_finished
+            ON reminders(id)
+            WHERE status IN ('done', 'cancelled');
+            """,
+        ),
+    ),
+    Migration(
+        4,
+        "integer due_at_ms",
+        sql(
+            "ALTER TABLE reminders ADD COLUMN due_at_ms INTEGER",
+            """
+            UPDATE reminders
+            SET due_at_ms = CAST(ROUND((julianday(due_at_utc) - 2440587.5) * 86400000) AS INTEGER)
+            """,
+            "ALTER TABLE reminders_archive ADD COLUMN due_at_ms INTEGER",
+            """
+            UPDATE reminders_archive
+            SET due_at_ms = CAST(ROUND((julianday(due_at_utc) - 2440587.5) * 86400000) AS INTEGER)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_pending_due_ms
+            ON reminders(due_at_ms, id)
+            WHERE status = 'pending';
+            """,
+            "DROP INDEX IF EXISTS idx_reminders_pending_due",
+        ),
+    ),
+    Migration(
+        5,
+        "claim leases",
+        sql(
+            "ALTER TABLE reminders ADD COLUMN lease_owner TEXT",
+            "ALTER TABLE reminders ADD COLUMN lease_until_ms INTEGER",
+            # Claims left behind by older versions have no owner: expire them now.
+            "UPDATE reminders SET lease_until_ms = 0 WHERE status = 'sending'",
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_sending_lease
+            ON reminders(lease_until_ms, id)
+            WHERE status = 'sending';
+            """,
+        ),
+    ),
+    Migration(
+        6,
+        "per-user public ids",
+        sql(
+            "ALTER TABLE reminders ADD COLUMN user_seq INTEGER",
+            "ALTER TABLE reminders_archive ADD COLUMN user_seq INTEGER",
+            """
+            UPDATE reminders
+            SET user_seq = (
+                SELECT seq FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS seq
+                    FROM reminders
+                ) numbered
+                WHERE numbered.id = reminders.id
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS reminder_seq (
+                user_id TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            """,
+            """
+            INSERT INTO reminder_seq (user_id, last_seq)
+            SELECT user_id, MAX(user_seq) FROM reminders GROUP BY user_id
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_reminders_user_seq
+            ON reminders(user_id, user_seq);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_user_status_due
+            ON reminders(user_id, status, due_at_ms, id);
+            """,
+        ),
+    ),
+    Migration(
+        7,
+        "send retries and dead letters",
+        sql(
+            "ALTER TABLE reminders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE reminders ADD COLUMN next_attempt_at_ms INTEGER",
+            "ALTER TABLE reminders ADD COLUMN last_error TEXT",
+            "ALTER TABLE reminders_archive ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE reminders_archive ADD COLUMN last_error TEXT",
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_retry
+            ON reminders(next_attempt_at_ms, id)
+            WHERE status = 'retrying';
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminders_failed
+            ON reminders(id)
+            WHERE status = 'failed';
+            """,
+        ),
+    ),
+    Migration(
+        8,
+        "cancelled_at_utc",
+        sql(
+            "ALTER TABLE reminders ADD COLUMN cancelled_at_utc TEXT",
+            "ALTER TABLE reminders_archive ADD COLUMN cancelled_at_utc TEXT",
+            # The real cancel time is unknown; count retention from now at the latest.
+            """
+            UPDATE reminders
+            SET cancelled_at_utc = MIN(due_at_utc, strftime('%Y-%m-%dT%H:%M:%S+00:00', 'now'))
+            WHERE status = 'cancelled'
+            """,
+        ),
+    ),
+]
+
+# Finished rows age from when they were sent or cancelled, not their due
+# time: a cancelled reminder may be due far in the future. A cancelled
+# recurring reminder also carries the sent_at_utc of its last occurrence,
+# so the cancel time wins for cancelled rows.
+FINISHED_AT = """
+    CASE WHEN status = 'cancelled'
+        THEN COALESCE(cancelled_at_utc, due_at_utc)
+        ELSE COALESCE(sent_at_utc, due_at_utc)
+    END"""
+
+ACTIVE_STATUSES = "('pending', 'sending', 'retrying')"
+MAX_ERROR_CHARS = 500
+
+MAX_CANCEL_IDS = 500
+
+DEFAULT_LEASE_MS = 60 * 1000
+
+
+async def _next_user_seq(db, user_id: str, count: int) -> int:
+    cur = await db.execute(
+        """
+        INSERT INTO reminder_seq (user_id, last_seq) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET last_seq = last_seq + excluded.last_seq
+        RETURNING last_seq
+        """,
+        (user_id, count),
+    )
+    last_seq = (await cur.fetchone())[0]
+    return last_seq - count + 1
+
+
+def _owner_clause(worker_id: Optional[str]) -> Tuple[str, Tuple[str, ...]]:
+    # A worker whose lease was taken over must not complete the row.
+    if worker_id is None:
+        return "", ()
+    return " AND lease_owner = ?", (worker_id,)
+
 
 class ReminderRepository:
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        synchronous: str = "NORMAL",
+        group_commit_window_ms: int = 0,
+        group_commit_max_items: int = DEFAULT_GROUP_COMMIT_MAX_ITEMS,
+        cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+        cache_ttl_sec: float = 0,
+    ):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = Database(
+            db_path,
+            row_factory=aiosqlite.Row,
+            synchronous=synchronous,
+            group_commit_window_ms=group_commit_window_ms,
+            group_commit_max_items=group_commit_max_items,
+        )
+        self.cache = QueryCache(cache_max_entries, ttl_sec=cache_ttl_sec)
 
     async def init(self) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS reminders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    room_id TEXT NOT NULL,
-                    text TEXT NOT NULL,
-                    due_at_utc TEXT NOT NULL,
-                    tz TEXT NOT NULL DEFAULT 'Asia/Taipei',
-                    status TEXT NOT NULL DEFAULT 'pending',
-                    repeat_rule TEXT,
-                    created_at_utc TEXT NOT NULL,
-                    sent_at_utc TEXT
-                );
-                """
-            )
-            await db.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_reminders_status_due
-                ON reminders(status, due_at_utc);
-                """
-            )
-            await db.commit()
+        await migrate(self.db, MIGRATIONS)
+
+    async def close(self) -> None:
+        await self.db.close()
+
+    def _invalidate_users(self, user_ids: Iterable[str]) -> None:
+        for user_id in set(user_ids):
+            self.cache.invalidate(user_id)
 
     async def add(
         self,
@@ -41,103 +260,472 @@ class ReminderRepository:
         user_id: str,
         room_id: str,
         text: str,
-        due_at_utc: str,
+        due_at_ms: int,
         tz: str,
         created_at_utc: str,
         repeat_rule: Optional[str] = None,
     ) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        # Returns the per-user user_seq, the id users see and cancel by;
+        # the row id stays internal.
+        due_at_utc = ms_to_utc_iso(due_at_ms)
+
+        async def insert(db) -> int:
+            user_seq = await _next_user_seq(db, user_id, 1)
             cur = await db.execute(
                 """
                 INSERT INTO reminders (
-                    user_id, room_id, text, due_at_utc, tz, status, repeat_rule, created_at_utc
-                ) VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+                    user_id, user_seq, room_id, text, due_at_utc, due_at_ms, tz, status,
+                    repeat_rule, created_at_utc
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
                 """,
-                (user_id, room_id, text, due_at_utc, tz, repeat_rule, created_at_utc),
+                (
+                    user_id,
+                    user_seq,
+                    room_id,
+                    text,
+                    due_at_utc,
+                    due_at_ms,
+                    tz,
+                    repeat_rule,
+                    created_at_utc,
+                ),
             )
-            await db.commit()
-            return cur.lastrowid
+            return user_seq
 
-    async def list_active_for_user(self, user_id: str) -> List[Dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cur = await db.execute(
+        user_seq = await self.db.submit(insert)
+        self.cache.invalidate(user_id)
+        return user_seq
+
+    async def add_many(
+        self,
+        *,
+        user_id: str,
+        tz: str,
+        created_at_utc: str,
+        items: Sequence[Tuple[str, str, int]],
+        repeat_rule: Optional[str] = None,
+    ) -> int:
+        if not items:
+            return 0
+        async with self.db.write() as db:
+            first_seq = await _next_user_seq(db, user_id, len(items))
+            await db.executemany(
                 """
-                SELECT id, room_id, text, due_at_utc, tz, status
+                INSERT INTO reminders (
+                    user_id, user_seq, room_id, text, due_at_utc, due_at_ms, tz, status,
+                    repeat_rule, created_at_utc
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
+                """,
+                [
+                    (
+                        user_id,
+                        first_seq + i,
+                        room_id,
+                        text,
+                        ms_to_utc_iso(due_at_ms),
+                        due_at_ms,
+                        tz,
+                        repeat_rule,
+                        created_at_utc,
+                    )
+                    for i, (room_id, text, due_at_ms) in enumerate(items)
+                ],
+            )
+        self.cache.invalidate(user_id)
+        return len(items)
+
+    async def list_active_for_user(
+        self,
+        user_id: str,
+        *,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> Page:
+        return await self.cache.get_or_load(
+            user_id,
+            ("active", limit, after),
+            lambda: self._load_active_page(user_id, limit, after),
+        )
+
+    async def _load_active_page(
+        self, user_id: str, limit: Optional[int], after: Optional[str]
+    ) -> Page:
+        limit = clamp_limit(limit)
+        last_due, last_id, offset = -1, 0, 0
+        if after:
+            (last_due, last_id), offset = decode_cursor(after)
+        async with self.db.read() as db:
+            cur = await db.execute(
+                f"""
+                SELECT id, user_seq, room_id, text, due_at_ms, tz, status, repeat_rule
                 FROM reminders
                 WHERE user_id = ?
-                  AND status IN ('pending', 'sending')
-                ORDER BY due_at_utc ASC, id ASC
+                  AND status IN {ACTIVE_STATUSES}
+                  AND (due_at_ms, id) > (?, ?)
+                ORDER BY due_at_ms ASC, id ASC
+                LIMIT ?
                 """,
-                (user_id,),
+                (user_id, last_due, last_id, limit + 1),
             )
-            rows = await cur.fetchall()
-            return [dict(row) for row in rows]
+            rows = [dict(row) for row in await cur.fetchall()]
+        return build_page(rows, limit, offset, lambda row: (row["due_at_ms"], row["id"]))
 
-    async def cancel(self, reminder_id: int, user_id: str) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
+    async def cancel(self, user_seq: int, user_id: str) -> bool:
+        return bool(await self.cancel_many(user_id, [user_seq]))
+
+    async def cancel_many(
+        self,
+        user_id: str,
+        user_seqs: Sequence[int],
+        cancelled_at_utc: Optional[str] = None,
+    ) -> List[int]:
+        # user_seq is the per-user id shown in `!remind list`; the lookup goes
+        # through the unique (user_id, user_seq) index in a single statement.
+        user_seqs = sorted(set(user_seqs))[:MAX_CANCEL_IDS]
+        if not user_seqs:
+            return []
+        cancelled_at_utc = cancelled_at_utc or datetime.now(timezone.utc).isoformat()
+        placeholders = ",".join("?" for _ in user_seqs)
+        async with self.db.write() as db:
             cur = await db.execute(
-                """
+                f"""
                 UPDATE reminders
-                SET status = 'cancelled'
-                WHERE id = ?
-                  AND user_id = ?
-                  AND status IN ('pending', 'sending')
+                SET status = 'cancelled',
+                    cancelled_at_utc = ?,
+                    lease_owner = NULL,
+                    lease_until_ms = NULL
+                WHERE user_id = ?
+                  AND user_seq IN ({placeholders})
+                  AND status IN {ACTIVE_STATUSES}
+                RETURNING user_seq
                 """,
-                (reminder_id, user_id),
+                (cancelled_at_utc, user_id, *user_seqs),
             )
-            await db.commit()
-            return cur.rowcount > 0
+            cancelled = sorted(row["user_seq"] for row in await cur.fetchall())
+        if cancelled:
+            self.cache.invalidate(user_id)
+        return cancelled
 
-    async def claim_due(self, now_utc: str, limit: int = 20) -> List[Dict]:
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            await db.execute("BEGIN IMMEDIATE")
+    async def claim_due(
+        self,
+        now_ms: int,
+        limit: int = 20,
+        *,
+        worker_id: str = "local",
+        lease_ms: int = DEFAULT_LEASE_MS,
+    ) -> List[Dict]:
+        # BEGIN IMMEDIATE serializes claims across processes sharing the file;
+        # `sending` rows whose lease expired belong to a dead worker and are
+        # claimed again. `retrying` rows become claimable at next_attempt_at_ms.
+        async with self.db.write() as db:
             cur = await db.execute(
                 """
-                SELECT id, user_id, room_id, text, due_at_utc, tz
-                FROM reminders
-                WHERE status = 'pending'
-                  AND due_at_utc <= ?
-                ORDER BY due_at_utc ASC, id ASC
+                SELECT * FROM (
+                    SELECT id, user_id, room_id, text, due_at_ms, tz, repeat_rule, attempts
+                    FROM reminders
+                    WHERE status = 'pending'
+                      AND due_at_ms <= ?
+                    ORDER BY due_at_ms ASC, id ASC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT id, user_id, room_id, text, due_at_ms, tz, repeat_rule, attempts
+                    FROM reminders
+                    WHERE status = 'sending'
+                      AND lease_until_ms <= ?
+                    ORDER BY lease_until_ms ASC, id ASC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT id, user_id, room_id, text, due_at_ms, tz, repeat_rule, attempts
+                    FROM reminders
+                    WHERE status = 'retrying'
+                      AND next_attempt_at_ms <= ?
+                    ORDER BY next_attempt_at_ms ASC, id ASC
+                    LIMIT ?
+                )
+                ORDER BY due_at_ms ASC, id ASC
                 LIMIT ?
                 """,
-                (now_utc, limit),
+                (now_ms, limit, now_ms, limit, now_ms, limit, limit),
             )
             rows = await cur.fetchall()
             reminder_ids = [row["id"] for row in rows]
             if reminder_ids:
                 placeholders = ",".join("?" for _ in reminder_ids)
                 await db.execute(
-                    f"UPDATE reminders SET status = 'sending' WHERE id IN ({placeholders})",
-                    reminder_ids,
+                    f"""
+                    UPDATE reminders
+                    SET status = 'sending',
+                        lease_owner = ?,
+                        lease_until_ms = ?
+                    WHERE id IN ({placeholders})
+                    """,
+                    (worker_id, now_ms + lease_ms, *reminder_ids),
                 )
-            await db.commit()
-            return [dict(row) for row in rows]
+        self._invalidate_users(row["user_id"] for row in rows)
+        return [dict(row) for row in rows]
 
-    async def mark_done(self, reminder_id: int, sent_at_utc: str) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
+    async def renew_leases(
+        self, reminder_ids: List[int], worker_id: str, lease_until_ms: int
+    ) -> List[int]:
+        if not reminder_ids:
+            return []
+        placeholders = ",".join("?" for _ in reminder_ids)
+        async with self.db.write() as db:
+            cur = await db.execute(
+                f"""
                 UPDATE reminders
-                SET status = 'done',
-                    sent_at_utc = ?
-                WHERE id = ?
+                SET lease_until_ms = ?
+                WHERE id IN ({placeholders})
                   AND status = 'sending'
+                  AND lease_owner = ?
+                RETURNING id
                 """,
-                (sent_at_utc, reminder_id),
+                (lease_until_ms, *reminder_ids, worker_id),
             )
-            await db.commit()
+            return [row["id"] for row in await cur.fetchall()]
 
-    async def mark_pending(self, reminder_id: int) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
+    async def next_due_times(self, until_ms: int, limit: int) -> List[int]:
+        # Lease expiries and retry times count as due times, so a surviving
+        # worker wakes up to reclaim a crashed worker's batch.
+        async with self.db.read() as db:
+            cur = await db.execute(
+                """
+                SELECT * FROM (
+                    SELECT due_at_ms
+                    FROM reminders
+                    WHERE status = 'pending'
+                      AND due_at_ms <= ?
+                    ORDER BY due_at_ms ASC, id ASC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT lease_until_ms
+                    FROM reminders
+                    WHERE status = 'sending'
+                      AND lease_until_ms <= ?
+                    ORDER BY lease_until_ms ASC, id ASC
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT next_attempt_at_ms
+                    FROM reminders
+                    WHERE status = 'retrying'
+                      AND next_attempt_at_ms <= ?
+                    ORDER BY next_attempt_at_ms ASC, id ASC
+                    LIMIT ?
+                )
+                ORDER BY 1
+                LIMIT ?
+                """,
+                (until_ms, limit, until_ms, limit, until_ms, limit, limit),
+            )
+            rows = await cur.fetchall()
+        return [row["due_at_ms"] for row in rows]
+
+    async def mark_done(self, reminder_id: int, sent_at_utc: str) -> None:
+        await self.mark_done_many([reminder_id], sent_at_utc)
+
+    async def mark_done_many(
+        self,
+        reminder_ids: List[int],
+        sent_at_utc: str,
+        reschedule: Sequence[Tuple[int, int, str]] = (),
+        *,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        # reschedule holds (id, next_due_at_ms, repeat_rule) for recurring
+        # reminders: the same row goes back to pending at its next occurrence.
+        if not reminder_ids and not reschedule:
+            return
+        owned, owner_args = _owner_clause(worker_id)
+        user_ids: List[str] = []
+        async with self.db.write() as db:
+            if reminder_ids:
+                placeholders = ",".join("?" for _ in reminder_ids)
+                cur = await db.execute(
+                    f"""
+                    UPDATE reminders
+                    SET status = 'done',
+                        sent_at_utc = ?,
+                        next_attempt_at_ms = NULL,
+                        lease_owner = NULL,
+                        lease_until_ms = NULL
+                    WHERE id IN ({placeholders})
+                      AND status = 'sending'{owned}
+                    RETURNING user_id
+                    """,
+                    (sent_at_utc, *reminder_ids, *owner_args),
+                )
+                user_ids.extend(row["user_id"] for row in await cur.fetchall())
+            for reminder_id, due_at_ms, repeat_rule in reschedule:
+                cur = await db.execute(
+                    f"""
+                    UPDATE reminders
+                    SET status = 'pending',
+                        due_at_ms = ?,
+                        due_at_utc = ?,
+                        repeat_rule = ?,
+                        sent_at_utc = ?,
+                        attempts = 0,
+                        next_attempt_at_ms = NULL,
+                        last_error = NULL,
+                        lease_owner = NULL,
+                        lease_until_ms = NULL
+                    WHERE id = ?
+                      AND status = 'sending'{owned}
+                    RETURNING user_id
+                    """,
+                    (
+                        due_at_ms,
+                        ms_to_utc_iso(due_at_ms),
+                        repeat_rule,
+                        sent_at_utc,
+                        reminder_id,
+                        *owner_args,
+                    ),
+                )
+                user_ids.extend(row["user_id"] for row in await cur.fetchall())
+        self._invalidate_users(user_ids)
+
+    async def record_failures(
+        self,
+        failures: Sequence[Tuple[int, Optional[int], str]],
+        *,
+        worker_id: Optional[str] = None,
+    ) -> None:
+        # failures holds (id, next_attempt_at_ms, error). A None retry time
+        # means the attempts are used up and the row is dead-lettered.
+        if not failures:
+            return
+        owned, owner_args = _owner_clause(worker_id)
+        user_ids: List[str] = []
+        async with self.db.write() as db:
+            for reminder_id, next_attempt_at_ms, error in failures:
+                cur = await db.execute(
+                    f"""
+                    UPDATE reminders
+                    SET status = CASE WHEN ? IS NULL THEN 'failed' ELSE 'retrying' END,
+                        attempts = attempts + 1,
+                        next_attempt_at_ms = ?,
+                        last_error = ?,
+                        lease_owner = NULL,
+                        lease_until_ms = NULL
+                    WHERE id = ?
+                      AND status = 'sending'{owned}
+                    RETURNING user_id
+                    """,
+                    (
+                        next_attempt_at_ms,
+                        next_attempt_at_ms,
+                        error[:MAX_ERROR_CHARS],
+                        reminder_id,
+                        *owner_args,
+                    ),
+                )
+                user_ids.extend(row["user_id"] for row in await cur.fetchall())
+        self._invalidate_users(user_ids)
+
+    async def list_failed(self, *, limit: Optional[int] = None, after: Optional[str] = None) -> Page:
+        limit = clamp_limit(limit)
+        last_id, offset = 0, 0
+        if after:
+            (last_id,), offset = decode_cursor(after)
+        async with self.db.read() as db:
+            cur = await db.execute(
                 """
+                SELECT id, user_id, user_seq, room_id, text, due_at_ms, tz, attempts, last_error
+                FROM reminders
+                WHERE status = 'failed'
+                  AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (last_id, limit + 1),
+            )
+            rows = [dict(row) for row in await cur.fetchall()]
+        return build_page(rows, limit, offset, lambda row: (row["id"],))
+
+    async def requeue_failed(self, reminder_ids: Optional[Sequence[int]] = None) -> int:
+        # None requeues every dead-lettered reminder.
+        where, args = "", ()
+        if reminder_ids is not None:
+            if not reminder_ids:
+                return 0
+            where = f" AND id IN ({','.join('?' for _ in reminder_ids)})"
+            args = tuple(reminder_ids)
+        async with self.db.write() as db:
+            cur = await db.execute(
+                f"""
                 UPDATE reminders
-                SET status = 'pending'
-                WHERE id = ?
-                  AND status = 'sending'
+                SET status = 'pending',
+                    attempts = 0,
+                    next_attempt_at_ms = NULL
+                WHERE status = 'failed'{where}
+                RETURNING user_id
+                """,
+                args,
+            )
+            rows = await cur.fetchall()
+        self._invalidate_users(row["user_id"] for row in rows)
+        return len(rows)
+
+    async def failed_count(self) -> int:
+        async with self.db.read() as db:
+            cur = await db.execute("SELECT COUNT(*) FROM reminders WHERE status = 'failed'")
+            return (await cur.fetchone())[0]
+
+    async def archive_finished(self, cutoff_utc: str, archived_at_utc: str, batch_size: int) -> int:
+        async with self.db.write() as db:
+            cur = await db.execute(
+                f"""
+                SELECT id FROM reminders
+                WHERE status IN ('done', 'cancelled')
+                  AND {FINISHED_AT} < ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (cutoff_utc, batch_size),
+            )
+            ids = [row["id"] for row in await cur.fetchall()]
+            if not ids:
+                return 0
+            placeholders = ",".join("?" for _ in ids)
+            await db.execute(
+                f"""
+                INSERT OR REPLACE INTO reminders_archive (
+                    id, user_id, user_seq, room_id, text, due_at_utc, due_at_ms, tz, status,
+                    repeat_rule, created_at_utc, sent_at_utc, cancelled_at_utc, attempts,
+                    last_error, archived_at_utc
+                )
+                SELECT id, user_id, user_seq, room_id, text, due_at_utc, due_at_ms, tz, status,
+                       repeat_rule, created_at_utc, sent_at_utc, cancelled_at_utc, attempts,
+                       last_error, ?
+                FROM reminders
+                WHERE id IN ({placeholders})
+                """,
+                (archived_at_utc, *ids),
+            )
+            await db.execute(f"DELETE FROM reminders WHERE id IN ({placeholders})", ids)
+            return len(ids)
+
+    async def archive_stats(self, cutoff_utc: str) -> Dict[str, int]:
+        async with self.db.read() as db:
+            cur = await db.execute(
+                f"""
+                SELECT
+                    (SELECT COUNT(*) FROM reminders),
+                    (SELECT COUNT(*) FROM reminders
+                     WHERE status IN ('done', 'cancelled')
+                       AND {FINISHED_AT} < ?),
+                    (SELECT COUNT(*) FROM reminders_archive)
                 """,
-                (reminder_id,),
+                (cutoff_utc,),
             )
-            await db.commit()
+            hot, eligible, archived = await cur.fetchone()
+        return {"hot": hot, "eligible": eligible, "archived": archived}
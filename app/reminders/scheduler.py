@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional
+
+
+logger = logging.getLogger("matrix-bot.reminder")
+
+DEFAULT_LOOKAHEAD_SECONDS = 3600
+DEFAULT_LOAD_LIMIT = 500
+# The DB is re-read at least this often even when nothing is due, so rows
+# written without a notify (another process, a lost IPC message) are not
+# left waiting for the end of the lookahead window.
+DEFAULT_RELOAD_MAX_SECONDS = 300
+
+Waiter = Callable[[asyncio.Event, float], Awaitable[None]]
+
+if TYPE_CHECKING:
+    from app.reminders.repository import ReminderRepository
+
+
+async def wait_event(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+        pass
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        *,
+        repository: "ReminderRepository",
+        lookahead_seconds: int = DEFAULT_LOOKAHEAD_SECONDS,
+        retry_seconds: float = 20,
+        batch_size: int = 20,
+        load_limit: int = DEFAULT_LOAD_LIMIT,
+        reload_max_seconds: float = DEFAULT_RELOAD_MAX_SECONDS,
+        clock: Callable[[], float] = time.time,
+        waiter: Waiter = wait_event,
+    ):
+        self.repository = repository
+        self.lookahead_seconds = lookahead_seconds
+        self.retry_seconds = retry_seconds
+        self.batch_size = batch_size
+        self.load_limit = load_limit
+        self.reload_max_seconds = reload_max_seconds
+        self.clock = clock
+        self.waiter = waiter
+        self.loads = 0
+        self._heap: List[float] = []
+        self._loaded_until = 0.0
+        self._reload_at = 0.0
+        self._reload = True
+        self._draining = False
+        # Notifies that arrive while _load() awaits the DB; merged afterwards
+        # since the read may predate the insert that triggered them.
+        self._loading = False
+        self._pending: List[float] = []
+        self._wake = asyncio.Event()
+
+    @property
+    def next_due(self) -> Optional[float]:
+        return self._heap[0] if self._heap else None
+
+    def notify(self, due_ts: float) -> None:
+        if self._loading:
+            self._pending.append(due_ts)
+        elif due_ts <= self._loaded_until:
+            heapq.heappush(self._heap, due_ts)
+        # Anything past the loaded window is picked up by the next load.
+        self._wake.set()
+
+    def reschedule(self) -> None:
+        self._reload = True
+        self._wake.set()
+
+    async def _load(self) -> None:
+        now = self.clock()
+        until = now + self.lookahead_seconds
+        self._loading = True
+        self._pending = []
+        try:
+            due_ms = await self.repository.next_due_times(int(until * 1000), self.load_limit)
+        finally:
+            self._loading = False
+        due_times = [ms / 1000 for ms in due_ms]
+        if len(due_times) >= self.load_limit:
+            # Window truncated: reload once we reach the last loaded time.
+            until = due_times[-1]
+        self._heap = due_times + [ts for ts in self._pending if ts <= until]
+        self._pending = []
+        heapq.heapify(self._heap)
+        self._loaded_until = until
+        self._reload_at = min(until, now + self.reload_max_seconds)
+        self._reload = False
+        self.loads += 1
+
+    async def run(self, dispatch: Callable[[], Awaitable[int]]) -> None:
+        while True:
+            try:
+                if self._reload or self.clock() >= self._reload_at:
+                    await self._load()
+                now = self.clock()
+                if self._draining or (self._heap and self._heap[0] <= now):
+                    while self._heap and self._heap[0] <= now:
+                        heapq.heappop(self._heap)
+                    claimed = await dispatch()
+                    # A full batch means more may be due: claim again right away.
+                    self._draining = claimed >= self.batch_size
+                    if claimed:
+                        # Failed sends go back to pending; look again shortly.
+                        self.notify(self.clock() + self.retry_seconds)
+                    continue
+                deadline = self._reload_at
+                if self._heap:
+                    deadline = min(deadline, self._heap[0])
+                await self.waiter(self._wake, deadline - now)
+                self._wake.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder scheduler error")
+                self._reload = True
+                await self.waiter(self._wake, self.retry_seconds)
+                self._wake.clear()
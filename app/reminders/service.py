@@ -2,24 +2,63 @@ import asyncio
 import csv
 import io
 import logging
+import os
+import random
+import socket
+import time
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
+from app.reminders.recurrence import build_rule, next_occurrence, parse_rule
+from app.reminders.scheduler import (
+    DEFAULT_LOOKAHEAD_SECONDS,
+    ReminderScheduler,
+    Waiter,
+    wait_event,
+)
 from app.reminders.time_utils import (
     DATETIME_FORMAT,
     DEFAULT_TZ,
-    format_utc_iso_to_local,
-    now_utc_iso,
-    parse_local_to_utc_iso,
+    format_ms_to_local,
+    parse_local_to_ms,
+    parse_time_expression,
 )
 
 
 logger = logging.getLogger("matrix-bot.reminder")
 
 if TYPE_CHECKING:
+    from app.pagination import Page
     from app.reminders.repository import ReminderRepository
 
 
+class ReminderInputError(ValueError):
+    # The message is meant for the user and is replied as is.
+    pass
+
+
+TIME_FORMAT_ERROR = (
+    f"時間格式錯誤，請使用 {DATETIME_FORMAT}、MM-DD HH:MM、HH、HH:MM、+30m 或 tomorrow 9"
+)
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_DIGEST_MAX_CHARS = 4000
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_MAX_SECONDS = 3600
+IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_ERRORS = 20
+
+
+def _record_import_error(result: Dict[str, Any], line_no: Optional[int], reason: str) -> None:
+    if line_no is not None:
+        result["failed"] += 1
+    if len(result["errors"]) < MAX_IMPORT_ERRORS:
+        result["errors"].append({"line": line_no, "reason": reason})
+
+
+def _digest_header(count: int) -> str:
+    return f"⏰ 提醒（{count} 則）："
+
+
 class ReminderService:
     def __init__(
         self,
@@ -27,50 +66,155 @@ class ReminderService:
         repository: "ReminderRepository",
         poll_interval_seconds: int = 20,
         default_tz: str = DEFAULT_TZ,
+        lookahead_seconds: int = DEFAULT_LOOKAHEAD_SECONDS,
+        dispatch_batch_size: int = 50,
+        dispatch_concurrency: int = 8,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        coalesce_window_seconds: float = 0,
+        digest_max_chars: int = DEFAULT_DIGEST_MAX_CHARS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_max_seconds: float = DEFAULT_RETRY_MAX_SECONDS,
+        jitter: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.time,
+        waiter: Waiter = wait_event,
+        scheduler: Optional[ReminderScheduler] = None,
     ):
         self.repository = repository
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.coalesce_window_ms = int(coalesce_window_seconds * 1000)
+        self.digest_max_chars = max(1, digest_max_chars)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_max_seconds = retry_max_seconds
+        self.jitter = jitter
         self.poll_interval_seconds = poll_interval_seconds
         self.default_tz = default_tz or DEFAULT_TZ
+        self.dispatch_batch_size = max(1, dispatch_batch_size)
+        self.dispatch_concurrency = max(1, dispatch_concurrency)
+        self.clock = clock
+        # With REMINDER_MODE=process the main process passes a ScheduleLink
+        # that forwards schedule changes to the worker process instead.
+        self.scheduler = scheduler or ReminderScheduler(
+            repository=repository,
+            lookahead_seconds=lookahead_seconds,
+            retry_seconds=poll_interval_seconds,
+            batch_size=self.dispatch_batch_size,
+            clock=clock,
+            waiter=waiter,
+        )
+
+    def apply_settings(
+        self,
+        *,
+        poll_interval_seconds: int,
+        default_tz: str,
+        lookahead_seconds: int,
+        dispatch_batch_size: int,
+        dispatch_concurrency: int,
+        lease_seconds: float,
+        coalesce_window_seconds: float,
+        digest_max_chars: int,
+        max_attempts: int,
+        retry_max_seconds: float,
+    ) -> None:
+        # Takes effect from the next dispatch; a batch already being sent
+        # finishes with the settings it started with.
+        self.poll_interval_seconds = poll_interval_seconds
+        self.default_tz = default_tz or DEFAULT_TZ
+        self.dispatch_batch_size = max(1, dispatch_batch_size)
+        self.dispatch_concurrency = max(1, dispatch_concurrency)
+        self.lease_seconds = lease_seconds
+        self.coalesce_window_ms = int(coalesce_window_seconds * 1000)
+        self.digest_max_chars = max(1, digest_max_chars)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_max_seconds = retry_max_seconds
+        self.scheduler.lookahead_seconds = lookahead_seconds
+        self.scheduler.retry_seconds = poll_interval_seconds
+        self.scheduler.batch_size = self.dispatch_batch_size
+        self.scheduler.reschedule()
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _now_utc_iso(self) -> str:
+        return datetime.fromtimestamp(self.clock(), tz=timezone.utc).isoformat()
 
     async def init(self) -> None:
         await self.repository.init()
 
+    async def close(self) -> None:
+        await self.repository.close()
+
     async def add_reminder(
         self,
         *,
         user_id: str,
         room_id: str,
         text: str,
-        due_local: str,
+        due_local: Optional[str] = None,
+        due_at_ms: Optional[int] = None,
         tz_name: Optional[str] = None,
+        repeat: Optional[str] = None,
+        repeat_until: Optional[str] = None,
+        repeat_count: Optional[int] = None,
     ) -> int:
         tz = tz_name or self.default_tz
-        try:
-            due_at_utc = parse_local_to_utc_iso(due_local, tz)
-        except ValueError:
-            raise ValueError(
-                f"時間格式錯誤，請使用 {DATETIME_FORMAT}、MM-DD HH:MM、HH 或 HH:MM"
-            ) from None
+        if due_at_ms is None:
+            try:
+                due_at_ms = parse_local_to_ms(due_local or "", tz)
+            except ValueError:
+                raise ReminderInputError(TIME_FORMAT_ERROR) from None
 
-        due_dt_utc = datetime.fromisoformat(due_at_utc)
-        now_dt_utc = datetime.now(timezone.utc)
-        if due_dt_utc <= now_dt_utc:
-            raise ValueError("提醒時間早於目前時間，請設定未來時間")
+        if due_at_ms <= self._now_ms():
+            raise ReminderInputError("提醒時間早於目前時間，請設定未來時間")
 
-        return await self.repository.add(
+        repeat_rule = None
+        if repeat:
+            try:
+                rule = build_rule(
+                    repeat, due_at_ms, tz, until=repeat_until, count=repeat_count
+                )
+            except ValueError:
+                raise ReminderInputError(
+                    "重複規則錯誤，可用 daily、weekly[:MO,WE]、monthly、every:<N>h"
+                ) from None
+            repeat_rule = rule.serialize()
+
+        user_seq = await self.repository.add(
             user_id=user_id,
             room_id=room_id,
             text=text.strip(),
-            due_at_utc=due_at_utc,
+            due_at_ms=due_at_ms,
             tz=tz,
-            created_at_utc=now_utc_iso(),
+            created_at_utc=self._now_utc_iso(),
+            repeat_rule=repeat_rule,
         )
+        self.scheduler.notify(due_at_ms / 1000)
+        return user_seq
+
+    def parse_due(self, expression: str, tz_name: Optional[str] = None) -> Tuple[int, str]:
+        try:
+            return parse_time_expression(expression, tz_name or self.default_tz, self._now_ms())
+        except ValueError:
+            raise ReminderInputError(TIME_FORMAT_ERROR) from None
 
-    async def list_reminders(self, *, user_id: str) -> List[Dict]:
-        return await self.repository.list_active_for_user(user_id)
+    async def list_reminders(
+        self,
+        *,
+        user_id: str,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> "Page":
+        return await self.repository.list_active_for_user(user_id, limit=limit, after=after)
 
-    async def cancel_reminder(self, *, reminder_id: int, user_id: str) -> bool:
-        return await self.repository.cancel(reminder_id, user_id)
+    async def cancel_reminders(self, *, user_id: str, public_ids: List[int]) -> List[int]:
+        cancelled = await self.repository.cancel_many(
+            user_id, public_ids, cancelled_at_utc=self._now_utc_iso()
+        )
+        if cancelled:
+            self.scheduler.reschedule()
+        return cancelled
 
     async def import_csv_text(
         self,
@@ -79,61 +223,271 @@ class ReminderService:
         default_room_id: str,
         csv_text: str,
         tz_name: Optional[str] = None,
-    ) -> Dict[str, int]:
+    ) -> Dict[str, Any]:
+        return await self.import_csv_stream(
+            user_id=user_id,
+            default_room_id=default_room_id,
+            lines=io.StringIO(csv_text),
+            tz_name=tz_name,
+        )
+
+    async def import_csv_stream(
+        self,
+        *,
+        user_id: str,
+        default_room_id: str,
+        lines: Iterable[str],
+        tz_name: Optional[str] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+    ) -> Dict[str, Any]:
         tz = tz_name or self.default_tz
-        reader = csv.reader(io.StringIO(csv_text))
-        rows = [row for row in reader if row and any(cell.strip() for cell in row)]
-        if not rows:
-            return {"ok": 0, "failed": 0}
-
-        start_idx = 0
-        first = ",".join(rows[0]).lower().replace(" ", "")
-        if first.startswith("due_local,text"):
-            start_idx = 1
-
-        ok = 0
-        failed = 0
-        for row in rows[start_idx:]:
-            parts = [p.strip() for p in row]
-            if len(parts) < 2:
-                failed += 1
+        now_ms = self._now_ms()
+        created_at_utc = self._now_utc_iso()
+        result: Dict[str, Any] = {"ok": 0, "failed": 0, "errors": []}
+        due_cache: Dict[str, int] = {}
+        batch: List[Tuple[str, str, int]] = []
+        header_checked = False
+
+        reader = csv.reader(lines)
+        try:
+            for row in reader:
+                if not row or not any(cell.strip() for cell in row):
+                    continue
+                if not header_checked:
+                    header_checked = True
+                    if ",".join(row).lower().replace(" ", "").startswith("due_local,text"):
+                        continue
+                try:
+                    batch.append(
+                        self._parse_import_row(row, default_room_id, tz, now_ms, due_cache)
+                    )
+                except ValueError as exc:
+                    _record_import_error(result, reader.line_num, str(exc))
+                if len(batch) >= chunk_size:
+                    await self._flush_import(batch, user_id, tz, created_at_utc, result)
+                    batch = []
+                    # Let other tasks run between chunks of a large file.
+                    await asyncio.sleep(0)
+        except UnicodeDecodeError:
+            # Earlier chunks are already committed; keep them and stop here.
+            result["aborted"] = f"第 {reader.line_num + 1} 行附近不是 UTF-8 編碼"
+        except csv.Error as exc:
+            result["aborted"] = f"第 {reader.line_num} 行 CSV 格式錯誤（{exc}）"
+        if batch:
+            await self._flush_import(batch, user_id, tz, created_at_utc, result)
+
+        if result["ok"]:
+            self.scheduler.reschedule()
+        return result
+
+    def _parse_import_row(
+        self,
+        row: List[str],
+        default_room_id: str,
+        tz: str,
+        now_ms: int,
+        due_cache: Dict[str, int],
+    ) -> Tuple[str, str, int]:
+        parts = [p.strip() for p in row]
+        if len(parts) < 2:
+            raise ValueError("欄位不足")
+        due_local, text = parts[0], parts[1]
+        room_id = parts[2] if len(parts) >= 3 and parts[2] else default_room_id
+        if not text:
+            raise ValueError("提醒內容不可為空")
+        due_at_ms = due_cache.get(due_local)
+        if due_at_ms is None:
+            try:
+                due_at_ms = parse_local_to_ms(due_local, tz)
+            except ValueError:
+                raise ValueError(f"時間格式錯誤：{due_local}") from None
+            due_cache[due_local] = due_at_ms
+        if due_at_ms <= now_ms:
+            raise ValueError(f"時間早於目前時間：{due_local}")
+        return room_id, text, due_at_ms
+
+    async def _flush_import(
+        self,
+        batch: List[Tuple[str, str, int]],
+        user_id: str,
+        tz: str,
+        created_at_utc: str,
+        result: Dict[str, Any],
+    ) -> None:
+        try:
+            await self.repository.add_many(
+                user_id=user_id, tz=tz, created_at_utc=created_at_utc, items=batch
+            )
+        except Exception:
+            logger.exception("Reminder import chunk failed (%d rows)", len(batch))
+            result["failed"] += len(batch)
+            _record_import_error(result, None, f"寫入失敗 {len(batch)} 筆")
+            return
+        result["ok"] += len(batch)
+
+    def _plan_completion(
+        self, items: List[Dict], sent_ids: Set[int]
+    ) -> Tuple[List[int], List[Tuple[int, int, str]]]:
+        now_ms = self._now_ms()
+        done_ids: List[int] = []
+        reschedule: List[Tuple[int, int, str]] = []
+        for item in items:
+            if item["id"] not in sent_ids:
                 continue
-            due_local = parts[0]
-            text = parts[1]
-            room_id = parts[2] if len(parts) >= 3 and parts[2] else default_room_id
-            if not text:
-                failed += 1
+            nxt = None
+            if item.get("repeat_rule"):
+                try:
+                    rule = parse_rule(item["repeat_rule"])
+                    nxt = next_occurrence(rule, item["due_at_ms"], item["tz"], now_ms)
+                except ValueError:
+                    logger.warning(
+                        "Invalid repeat_rule id=%s: %s", item["id"], item["repeat_rule"]
+                    )
+            if nxt is None:
+                done_ids.append(item["id"])
+            else:
+                reschedule.append((item["id"], nxt[0], nxt[1].serialize()))
+        return done_ids, reschedule
+
+    def _next_attempt_ms(self, attempts: int, now_ms: int) -> Optional[int]:
+        # attempts counts the failure being recorded. Exponential backoff from
+        # POLL_INTERVAL_SECONDS, capped, with the upper half jittered so rows
+        # that failed together do not retry together.
+        if attempts >= self.max_attempts:
+            return None
+        delay = min(self.retry_max_seconds, self.poll_interval_seconds * 2 ** (attempts - 1))
+        delay = delay / 2 + delay / 2 * self.jitter()
+        return now_ms + int(delay * 1000)
+
+    def _format_single(self, item: Dict) -> str:
+        due_local = format_ms_to_local(item["due_at_ms"], item["tz"])
+        return f"⏰ 提醒：{item['text']}（原訂時間：{due_local} {item['tz']}）"
+
+    def _build_messages(self, items: List[Dict]) -> List[Tuple[List[Dict], str]]:
+        # items belong to one room and are in due order. Without coalescing
+        # every reminder is its own message.
+        if self.coalesce_window_ms <= 0:
+            return [([item], self._format_single(item)) for item in items]
+
+        # size counts the lines with their newlines; the header for the
+        # grown group is added when checking the cap.
+        groups: List[List[Tuple[Dict, str]]] = []
+        size = 0
+        for item in items:
+            due_local = format_ms_to_local(item["due_at_ms"], item["tz"])
+            line = f"- {due_local} {item['tz']} {item['text']}"
+            group = groups[-1] if groups else None
+            if (
+                group is None
+                or item["due_at_ms"] - group[0][0]["due_at_ms"] > self.coalesce_window_ms
+                or len(_digest_header(len(group) + 1)) + size + len(line) + 1
+                > self.digest_max_chars
+            ):
+                group = []
+                groups.append(group)
+                size = 0
+            group.append((item, line))
+            size += len(line) + 1
+
+        messages = []
+        for group in groups:
+            batch = [item for item, _ in group]
+            if len(group) == 1:
+                messages.append((batch, self._format_single(batch[0])))
                 continue
-            try:
-                await self.add_reminder(
-                    user_id=user_id,
-                    room_id=room_id,
-                    text=text,
-                    due_local=due_local,
-                    tz_name=tz,
-                )
-                ok += 1
-            except Exception:
-                failed += 1
-        return {"ok": ok, "failed": failed}
+            lines = [_digest_header(len(group))] + [line for _, line in group]
+            messages.append((batch, "\n".join(lines)))
+        return messages
+
+    async def list_failed(self, *, after: Optional[str] = None) -> "Page":
+        return await self.repository.list_failed(after=after)
+
+    async def requeue_failed(self, reminder_ids: Optional[List[int]] = None) -> int:
+        count = await self.repository.requeue_failed(reminder_ids)
+        if count:
+            self.scheduler.reschedule()
+        return count
 
     async def run_loop(self, send_text_callable) -> None:
-        while True:
-            try:
-                await self.dispatch_due(send_text_callable)
-            except Exception:
-                logger.exception("Reminder loop error")
-            await asyncio.sleep(self.poll_interval_seconds)
+        await self.scheduler.run(lambda: self.dispatch_due(send_text_callable))
+
+    async def dispatch_due(self, send_text_callable) -> int:
+        lease_ms = int(self.lease_seconds * 1000)
+        due_items = await self.repository.claim_due(
+            self._now_ms(),
+            limit=self.dispatch_batch_size,
+            worker_id=self.worker_id,
+            lease_ms=lease_ms,
+        )
+        if not due_items:
+            return 0
 
-    async def dispatch_due(self, send_text_callable) -> None:
-        due_items = await self.repository.claim_due(now_utc_iso(), limit=20)
+        by_room: Dict[str, List[Dict]] = {}
         for item in due_items:
-            reminder_id = item["id"]
-            try:
-                due_local = format_utc_iso_to_local(item["due_at_utc"], item["tz"])
-                msg = f"⏰ 提醒：{item['text']}（原訂時間：{due_local} {item['tz']}）"
-                await send_text_callable(item["room_id"], msg)
-                await self.repository.mark_done(reminder_id, now_utc_iso())
-            except Exception:
-                logger.exception("Reminder send failed id=%s", reminder_id)
-                await self.repository.mark_pending(reminder_id)
+            by_room.setdefault(item["room_id"], []).append(item)
+
+        semaphore = asyncio.Semaphore(self.dispatch_concurrency)
+        sent_ids: List[int] = []
+        failures: List[Tuple[Dict, str]] = []
+        outstanding = {item["id"] for item in due_items}
+        lost: Set[int] = set()
+
+        async def send_room(items: List[Dict]) -> None:
+            # Rooms are sent concurrently; reminders within a room stay in due order.
+            for batch, msg in self._build_messages(items):
+                async with semaphore:
+                    ids = [item["id"] for item in batch]
+                    if lost.intersection(ids):
+                        live = [item for item in batch if item["id"] not in lost]
+                        outstanding.difference_update(ids)
+                        if not live:
+                            continue
+                        batch, msg = live, self._build_messages(live)[0][1]
+                        ids = [item["id"] for item in live]
+                    try:
+                        await send_text_callable(batch[0]["room_id"], msg)
+                        # A digest is one message: all its rows succeed together.
+                        sent_ids.extend(ids)
+                    except Exception as exc:
+                        logger.exception("Reminder send failed ids=%s", ids)
+                        error = f"{type(exc).__name__}: {exc}"
+                        failures.extend((item, error) for item in batch)
+                    finally:
+                        outstanding.difference_update(ids)
+
+        async def renew() -> None:
+            # Keep the claim alive during slow sends so no other worker takes it.
+            while outstanding:
+                await asyncio.sleep(self.lease_seconds / 3)
+                ids = sorted(outstanding)
+                kept = await self.repository.renew_leases(
+                    ids, self.worker_id, self._now_ms() + lease_ms
+                )
+                if len(kept) < len(ids):
+                    lost.update(set(ids) - set(kept))
+                    logger.warning("Lost reminder leases: %s", sorted(set(ids) - set(kept)))
+
+        renewer = asyncio.create_task(renew())
+        try:
+            await asyncio.gather(*(send_room(items) for items in by_room.values()))
+        finally:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+        done_ids, reschedule = self._plan_completion(due_items, set(sent_ids))
+        await self.repository.mark_done_many(
+            done_ids, self._now_utc_iso(), reschedule, worker_id=self.worker_id
+        )
+        now_ms = self._now_ms()
+        retries = [
+            (item["id"], self._next_attempt_ms(item["attempts"] + 1, now_ms), error)
+            for item, error in failures
+        ]
+        await self.repository.record_failures(retries, worker_id=self.worker_id)
+        for _, due_at_ms, _ in reschedule:
+            self.scheduler.notify(due_at_ms / 1000)
+        for reminder_id, next_attempt_ms, _ in retries:
+            if next_attempt_ms is None:
+                logger.warning("Reminder id=%s failed permanently", reminder_id)
+            else:
+                self.scheduler.notify(next_attempt_ms / 1000)
+        return len(due_items)
@@ -1,24 +1,112 @@
-from datetime import datetime, timezone
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Tuple
 from zoneinfo import ZoneInfo
 
 
 DEFAULT_TZ = "Asia/Taipei"
 DATETIME_FORMAT = "%Y-%m-%d %H:%M"
 
+_TIME = r"(?P<{0}h>\d{{1,2}})(?::(?P<{0}m>\d{{1,2}}))?"
+# One pass over the leading time expression of `!remind add`; the rest of
+# the text is the reminder body.
+TIME_EXPRESSION = re.compile(
+    r"\s*(?:"
+    r"(?P<y>\d{4})-(?P<mo>\d{1,2})-(?P<d>\d{1,2})\s+" + _TIME.format("a")
+    + r"|(?P<ymo>\d{1,2})-(?P<yd>\d{1,2})\s+" + _TIME.format("b")
+    + r"|\+(?P<rel>\d{1,5})(?P<unit>[mhd])"
+    + r"|(?P<day>today|tomorrow|今天|明天)\s*" + _TIME.format("c")
+    + r"|" + _TIME.format("t")
+    + r")(?=\s|$)\s*(?P<text>.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+LOCAL_DATETIME = re.compile(
+    r"\s*(\d{4})-(\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{1,2})\s*"
+)
+RELATIVE_UNITS_MS = {"m": 60 * 1000, "h": 3600 * 1000}
+
+
+@lru_cache(maxsize=64)
+def get_zone(tz_name: str) -> ZoneInfo:
+    return ZoneInfo(tz_name)
+
+
+@lru_cache(maxsize=4096)
+def local_to_ms(tz_name: str, year: int, month: int, day: int, hour: int, minute: int) -> int:
+    # Cached per wall-clock minute: offsets (including DST transitions at odd
+    # minutes) stay exact, while CSV imports and repeated times hit the cache.
+    # Same fold=0 resolution as datetime.replace(tzinfo=...).
+    local = datetime(year, month, day, hour, minute, tzinfo=get_zone(tz_name))
+    return int(local.timestamp()) * 1000
+
+
+def _local_today(now_ms: int, tz_name: str) -> date:
+    return datetime.fromtimestamp(now_ms / 1000, tz=get_zone(tz_name)).date()
+
+
+def parse_time_expression(text: str, tz_name: str, now_ms: int) -> Tuple[int, str]:
+    match = TIME_EXPRESSION.match(text)
+    if match is None:
+        raise ValueError("invalid time expression")
+    g = match.group
+    rest = g("text").strip()
+    if g("rel"):
+        amount, unit = int(g("rel")), g("unit").lower()
+        if unit in RELATIVE_UNITS_MS:
+            return now_ms + amount * RELATIVE_UNITS_MS[unit], rest
+        # Days keep the wall-clock time across DST changes.
+        local = datetime.fromtimestamp(now_ms / 1000, tz=get_zone(tz_name))
+        target = local.replace(tzinfo=None) + timedelta(days=amount)
+        return int(target.replace(tzinfo=get_zone(tz_name)).timestamp() * 1000), rest
+
+    for prefix in "abct":
+        if g(prefix + "h") is not None:
+            hour = int(g(prefix + "h"))
+            minute = int(g(prefix + "m") or 0)
+            break
+    if g("y"):
+        year, month, day = int(g("y")), int(g("mo")), int(g("d"))
+    elif g("ymo"):
+        year, month, day = _local_today(now_ms, tz_name).year, int(g("ymo")), int(g("yd"))
+    else:
+        today = _local_today(now_ms, tz_name)
+        if g("day") and g("day").lower() in ("tomorrow", "明天"):
+            today += timedelta(days=1)
+        year, month, day = today.year, today.month, today.day
+    return local_to_ms(tz_name, year, month, day, hour, minute), rest
+
 
 def now_utc_iso() -> str:
     return datetime.now(tz=timezone.utc).isoformat()
 
 
-def parse_local_to_utc_iso(local_dt_str: str, tz_name: str = DEFAULT_TZ) -> str:
-    dt_local = datetime.strptime(local_dt_str.strip(), DATETIME_FORMAT)
-    dt_local = dt_local.replace(tzinfo=ZoneInfo(tz_name))
-    return dt_local.astimezone(timezone.utc).isoformat()
+def ms_to_utc_iso(epoch_ms: int) -> str:
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).isoformat()
 
 
-def format_utc_iso_to_local(utc_iso: str, tz_name: str = DEFAULT_TZ) -> str:
+def utc_iso_to_ms(utc_iso: str) -> int:
     dt_utc = datetime.fromisoformat(utc_iso)
     if dt_utc.tzinfo is None:
         dt_utc = dt_utc.replace(tzinfo=timezone.utc)
-    dt_local = dt_utc.astimezone(ZoneInfo(tz_name))
+    return round(dt_utc.timestamp() * 1000)
+
+
+def parse_local_to_utc_iso(local_dt_str: str, tz_name: str = DEFAULT_TZ) -> str:
+    return ms_to_utc_iso(parse_local_to_ms(local_dt_str, tz_name))
+
+
+def parse_local_to_ms(local_dt_str: str, tz_name: str = DEFAULT_TZ) -> int:
+    match = LOCAL_DATETIME.fullmatch(local_dt_str)
+    if match is None:
+        raise ValueError(f"time data {local_dt_str!r} does not match format {DATETIME_FORMAT!r}")
+    return local_to_ms(tz_name, *map(int, match.groups()))
+
+
+def format_utc_iso_to_local(utc_iso: str, tz_name: str = DEFAULT_TZ) -> str:
+    return format_ms_to_local(utc_iso_to_ms(utc_iso), tz_name)
+
+
+def format_ms_to_local(epoch_ms: int, tz_name: str = DEFAULT_TZ) -> str:
+    dt_local = datetime.fromtimestamp(epoch_ms / 1000, tz=get_zone(tz_name))
     return dt_local.strftime(DATETIME_FORMAT)
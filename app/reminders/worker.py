@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+from typing import Dict, Optional
+
+from app.config import Config, load_config
+from app.outbox import PRIORITY_REMINDER, Outbox, send_client
+from app.reload import ConfigReloader
+from app.reminders.ipc import serve_schedule_changes
+from app.reminders.repository import ReminderRepository
+from app.reminders.service import ReminderService
+
+
+logger = logging.getLogger("matrix-bot.reminder.worker")
+
+REMINDER_MODES = ("inline", "process")
+AUTH_FILE = "auth.json"
+RESTART_MIN_SECONDS = 1.0
+RESTART_MAX_SECONDS = 60.0
+
+
+def db_options(cfg: Config) -> Dict:
+    return dict(
+        synchronous=cfg.db_synchronous,
+        group_commit_window_ms=cfg.db_group_commit_ms,
+        group_commit_max_items=cfg.db_group_commit_max,
+        cache_max_entries=cfg.cache_max_entries,
+        cache_ttl_sec=cfg.cache_ttl_sec,
+    )
+
+
+def reminder_settings(cfg: Config) -> Dict:
+    # The settings ReminderService.apply_settings() accepts on a reload.
+    return dict(
+        poll_interval_seconds=cfg.poll_interval_seconds,
+        default_tz=cfg.timezone,
+        lookahead_seconds=cfg.reminder_lookahead_seconds,
+        dispatch_batch_size=cfg.reminder_batch_size,
+        dispatch_concurrency=cfg.reminder_concurrency,
+        lease_seconds=cfg.reminder_lease_seconds,
+        coalesce_window_seconds=cfg.reminder_coalesce_window_sec,
+        digest_max_chars=cfg.reminder_digest_max_chars,
+        max_attempts=cfg.reminder_max_attempts,
+        retry_max_seconds=cfg.reminder_retry_max_seconds,
+    )
+
+
+def build_reminder_service(cfg: Config, **kwargs) -> ReminderService:
+    options = db_options(cfg)
+    if cfg.reminder_mode == "process":
+        # The worker marks reminders sent in its own process, which the main
+        # process's list cache would never hear about.
+        options["cache_max_entries"] = 0
+    return ReminderService(
+        repository=ReminderRepository(
+            os.path.join(cfg.data_path, "reminders.db"), **options
+        ),
+        worker_id=cfg.reminder_worker_id,
+        **reminder_settings(cfg),
+        **kwargs,
+    )
+
+
+def ipc_socket_path(cfg: Config) -> str:
+    return cfg.reminder_ipc_socket or os.path.join(cfg.data_path, "reminders.sock")
+
+
+def _load_token(cfg: Config) -> Dict[str, str]:
+    # Same session as the main process: an explicit token, or the one the
+    # main process stored after a password login.
+    if cfg.bot_access_token:
+        return {"access_token": cfg.bot_access_token, "device_id": cfg.bot_device_id or ""}
+    try:
+        with open(os.path.join(cfg.store_path, AUTH_FILE), "r", encoding="utf-8") as f:
+            auth = json.load(f)
+    except (OSError, ValueError):
+        auth = {}
+    if not auth.get("access_token"):
+        raise RuntimeError("No access token: set BOT_ACCESS_TOKEN or start the main bot first")
+    return {"access_token": auth["access_token"], "device_id": auth.get("device_id", "")}
+
+
+class ReminderWorker:
+    # Dispatches reminders in its own process and event loop. It sends with
+    # its own client on the main process's access token and never syncs;
+    # schedule changes arrive from the main process over the Unix socket.
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self.service = build_reminder_service(cfg)
+        # Only ever used by the outbox, so nio's 429 retry stays off.
+        self.client = send_client(cfg.homeserver_url, cfg.bot_user_id)
+        self.client.user_agent = f"matrix-bot reminders ({cfg.bot_user_id})"
+        self.outbox = Outbox(
+            self.client,
+            rate=cfg.send_rate,
+            burst=cfg.send_burst,
+            room_rate=cfg.send_room_rate,
+            room_burst=cfg.send_room_burst,
+            concurrency=cfg.send_concurrency,
+        )
+        self.reloader = ConfigReloader(
+            cfg, self._apply_config, interval_sec=cfg.config_watch_interval_sec
+        )
+
+    async def _apply_config(self, cfg: Config, policy, changed) -> None:
+        self.cfg = cfg
+        self.service.apply_settings(**reminder_settings(cfg))
+
+    async def _send(self, room_id: str, message: str) -> None:
+        await self.outbox.send_text(room_id, message, priority=PRIORITY_REMINDER)
+
+    async def run(self) -> None:
+        token = _load_token(self.cfg)
+        # No restore_login(): the worker has no store and only sends.
+        self.client.user_id = self.cfg.bot_user_id
+        self.client.device_id = token["device_id"]
+        self.client.access_token = token["access_token"]
+        await self.service.init()
+        socket_path = ipc_socket_path(self.cfg)
+        server = await serve_schedule_changes(
+            socket_path, self.service.scheduler, on_reload=self.reloader.request
+        )
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        self.reloader.install_signal_handler()
+        tasks = [
+            asyncio.create_task(self.service.run_loop(self._send)),
+            asyncio.create_task(self.reloader.run()),
+        ]
+        logger.info("Reminder worker started (pid %d, socket %s)", os.getpid(), socket_path)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.outbox.close()
+            await self.service.close()
+            await self.client.close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            logger.info("Reminder worker stopped")
+
+
+class ReminderProcess:
+    # Runs `python -m app.reminders.worker` as a child of the bot and
+    # restarts it with backoff if it exits.
+    def __init__(self):
+        self.restarts = 0
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self._proc is not None else None
+
+    async def run(self) -> None:
+        delay = RESTART_MIN_SECONDS
+        while True:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            self._proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "app.reminders.worker"
+            )
+            code = await self._proc.wait()
+            if loop.time() - started > RESTART_MAX_SECONDS:
+                delay = RESTART_MIN_SECONDS
+            logger.error("Reminder worker exited with %s, restarting in %.0fs", code, delay)
+            self.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(RESTART_MAX_SECONDS, delay * 2)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        proc = self._proc
+        if proc is None or proc.returncode is not None:
+            return
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+
+
+async def main() -> None:
+    await ReminderWorker(load_config()).run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    logging.getLogger("nio").setLevel(logging.WARNING)
+    asyncio.run(main())
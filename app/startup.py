@@ -0,0 +1,70 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+
+logger = logging.getLogger("matrix-bot.startup")
+
+T = TypeVar("T")
+
+
+def _process_created_at() -> Optional[float]:
+    # psutil is imported only here, after startup has finished.
+    try:
+        import psutil
+
+        return psutil.Process(os.getpid()).create_time()
+    except Exception:
+        return None
+
+
+class StartupReport:
+    # Phases may overlap; each is logged with its offset from the start of
+    # main() so the critical path is visible. "boot" is the time before
+    # main(): interpreter start and module imports.
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self.started = clock()
+        self.started_wall = time.time()
+        self.phases: List[Tuple[str, float, float]] = []
+        self.boot_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+
+    def now(self) -> float:
+        return self._clock()
+
+    def record(self, name: str, begin: float) -> None:
+        end = self._clock()
+        self.phases.append((name, (begin - self.started) * 1000, (end - begin) * 1000))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        begin = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, begin)
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.phase(name):
+            return await awaitable
+
+    def format(self) -> str:
+        parts = []
+        if self.boot_ms is not None:
+            parts.append(f"boot {self.boot_ms:.0f}ms")
+        for name, offset_ms, elapsed_ms in self.phases:
+            parts.append(f"{name} {elapsed_ms:.0f}ms@+{offset_ms:.0f}")
+        total = "-" if self.ready_ms is None else f"{self.ready_ms:.0f}ms"
+        return f"Startup ready in {total}: " + ", ".join(parts)
+
+    def finish(self, process_created_at: Optional[float] = None) -> None:
+        if self.ready_ms is not None:
+            return
+        self.ready_ms = (self._clock() - self.started) * 1000
+        created = process_created_at if process_created_at is not None else _process_created_at()
+        if created is not None:
+            self.boot_ms = max(0.0, (self.started_wall - created) * 1000)
+        logger.info(self.format())
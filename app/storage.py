@@ -1,91 +1,339 @@
+import logging
 import os
-import aiosqlite
-from typing import List, Optional, Tuple
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from app.cache import DEFAULT_MAX_ENTRIES, QueryCache
+from app.db import DEFAULT_GROUP_COMMIT_MAX_ITEMS, Database
+from app.migrations import Migration, migrate, sql
+from app.pagination import Page, build_page, clamp_limit, decode_cursor
+
+
+logger = logging.getLogger("matrix-bot.storage")
+
+# The trigram tokenizer matches substrings (so CJK text without spaces works),
+# but only for terms of at least three characters.
+FTS_MIN_TERM_LEN = 3
+SNIPPET_TOKENS = 32
+_SEARCH_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _parse_search_terms(query: str) -> List[Tuple[str, bool, bool]]:
+    terms = []
+    for match in _SEARCH_TOKEN_RE.finditer(query):
+        phrase, word = match.groups()
+        if phrase is not None:
+            if phrase.strip():
+                terms.append((phrase.strip(), True, False))
+            continue
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append((word, False, prefix))
+    return terms
+
+
+def _fts_query(terms: List[Tuple[str, bool, bool]]) -> Optional[str]:
+    if not terms or any(len(text) < FTS_MIN_TERM_LEN for text, _, _ in terms):
+        return None
+    parts = []
+    for text, _, prefix in terms:
+        quoted = '"' + text.replace('"', '""') + '"'
+        parts.append(quoted + "*" if prefix else quoted)
+    return " ".join(parts)
+
+
+async def _create_note_fts(db) -> None:
+    try:
+        await db.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(
+                text,
+                content='note',
+                content_rowid='id',
+                tokenize='trigram'
+            );
+            """
+        )
+    except sqlite3.OperationalError:
+        logger.warning("SQLite FTS5 trigram unavailable, note search uses LIKE")
+        return
+    await db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+            INSERT INTO note_fts (rowid, text) VALUES (new.id, new.text);
+        END;
+        """
+    )
+    await db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+            INSERT INTO note_fts (note_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END;
+        """
+    )
+    await db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF text ON note BEGIN
+            INSERT INTO note_fts (note_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO note_fts (rowid, text) VALUES (new.id, new.text);
+        END;
+        """
+    )
+    # Backfill whatever was written before the index existed.
+    await db.execute("INSERT INTO note_fts (note_fts) VALUES ('rebuild')")
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "create todo and note",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS todo (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                done_at INTEGER
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS note (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                sender TEXT NOT NULL,
+                room_id TEXT NOT NULL
+            );
+            """,
+        ),
+    ),
+    Migration(2, "note full-text index", _create_note_fts),
+    Migration(
+        3,
+        "listing indexes",
+        sql(
+            "CREATE INDEX IF NOT EXISTS idx_todo_done_id ON todo(done, id)",
+            "CREATE INDEX IF NOT EXISTS idx_note_room_id ON note(room_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_note_sender_id ON note(sender, id)",
+        ),
+    ),
+    Migration(
+        4,
+        "todo archive",
+        sql(
+            """
+            CREATE TABLE IF NOT EXISTS todo_archive (
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                done INTEGER NOT NULL,
+                done_at INTEGER,
+                archived_at INTEGER NOT NULL
+            );
+            """,
+        ),
+    ),
+]
 
 
 class Storage:
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        synchronous: str = "NORMAL",
+        group_commit_window_ms: int = 0,
+        group_commit_max_items: int = DEFAULT_GROUP_COMMIT_MAX_ITEMS,
+        cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+        cache_ttl_sec: float = 0,
+    ):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = Database(
+            db_path,
+            synchronous=synchronous,
+            group_commit_window_ms=group_commit_window_ms,
+            group_commit_max_items=group_commit_max_items,
+        )
+        self.fts_enabled = False
+        self.cache = QueryCache(cache_max_entries, ttl_sec=cache_ttl_sec)
 
     async def init(self) -> None:
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS todo (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    text TEXT NOT NULL,
-                    created_at INTEGER NOT NULL,
-                    done INTEGER NOT NULL DEFAULT 0,
-                    done_at INTEGER
-                );
-                """
-            )
-            await db.execute(
-                """
-                CREATE TABLE IF NOT EXISTS note (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    text TEXT NOT NULL,
-                    created_at INTEGER NOT NULL,
-                    sender TEXT NOT NULL,
-                    room_id TEXT NOT NULL
-                );
-                """
+        await migrate(self.db, MIGRATIONS)
+        async with self.db.read() as db:
+            cur = await db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='note_fts'"
             )
-            await db.commit()
+            self.fts_enabled = await cur.fetchone() is not None
+
+    async def close(self) -> None:
+        await self.db.close()
 
     async def todo_add(self, text: str, created_at: int) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async def insert(db) -> int:
             cur = await db.execute(
                 "INSERT INTO todo (text, created_at, done) VALUES (?, ?, 0)",
                 (text, created_at),
             )
-            await db.commit()
             return cur.lastrowid
 
-    async def todo_list(self) -> List[Tuple[int, str, int]]:
-        async with aiosqlite.connect(self.db_path) as db:
+        todo_id = await self.db.submit(insert)
+        self.cache.invalidate("todo")
+        return todo_id
+
+    async def todo_list(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> Page:
+        return await self.cache.get_or_load(
+            "todo",
+            (limit, after, status),
+            lambda: self._load_todo_page(limit, after, status),
+        )
+
+    async def _load_todo_page(
+        self, limit: Optional[int], after: Optional[str], status: Optional[str]
+    ) -> Page:
+        limit = clamp_limit(limit)
+        last_id, offset = 0, 0
+        if after:
+            (last_id,), offset = decode_cursor(after)
+        where = ["id > ?"]
+        if status == "open":
+            where.append("done = 0")
+        elif status == "done":
+            where.append("done = 1")
+        async with self.db.read() as db:
             cur = await db.execute(
-                "SELECT id, text, done FROM todo ORDER BY id ASC"
+                f"SELECT id, text, done FROM todo WHERE {' AND '.join(where)} ORDER BY id ASC LIMIT ?",
+                (last_id, limit + 1),
             )
-            return await cur.fetchall()
+            rows = await cur.fetchall()
+        return build_page(rows, limit, offset, lambda row: (row[0],))
 
     async def todo_done(self, todo_id: int, done_at: int) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.db.write() as db:
             cur = await db.execute(
                 "UPDATE todo SET done=1, done_at=? WHERE id=? AND done=0",
                 (done_at, todo_id),
             )
-            await db.commit()
-            return cur.rowcount > 0
+            changed = cur.rowcount > 0
+        if changed:
+            self.cache.invalidate("todo")
+        return changed
 
     async def todo_del(self, todo_id: int) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.db.write() as db:
             cur = await db.execute("DELETE FROM todo WHERE id=?", (todo_id,))
-            await db.commit()
-            return cur.rowcount > 0
+            changed = cur.rowcount > 0
+        if changed:
+            self.cache.invalidate("todo")
+        return changed
+
+    async def archive_done_todos(self, cutoff_ms: int, archived_at: int, batch_size: int) -> int:
+        async with self.db.write() as db:
+            cur = await db.execute(
+                "SELECT id FROM todo WHERE done = 1 AND done_at < ? ORDER BY id LIMIT ?",
+                (cutoff_ms, batch_size),
+            )
+            ids = [row[0] for row in await cur.fetchall()]
+            if not ids:
+                return 0
+            placeholders = ",".join("?" for _ in ids)
+            await db.execute(
+                f"""
+                INSERT OR REPLACE INTO todo_archive (id, text, created_at, done, done_at, archived_at)
+                SELECT id, text, created_at, done, done_at, ? FROM todo WHERE id IN ({placeholders})
+                """,
+                (archived_at, *ids),
+            )
+            await db.execute(f"DELETE FROM todo WHERE id IN ({placeholders})", ids)
+        self.cache.invalidate("todo")
+        return len(ids)
+
+    async def todo_archive_stats(self, cutoff_ms: int) -> Dict[str, int]:
+        async with self.db.read() as db:
+            cur = await db.execute(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM todo),
+                    (SELECT COUNT(*) FROM todo WHERE done = 1 AND done_at < ?),
+                    (SELECT COUNT(*) FROM todo_archive)
+                """,
+                (cutoff_ms,),
+            )
+            hot, eligible, archived = await cur.fetchone()
+        return {"hot": hot, "eligible": eligible, "archived": archived}
 
     async def note_add(self, text: str, created_at: int, sender: str, room_id: str) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
+        async def insert(db) -> int:
             cur = await db.execute(
                 "INSERT INTO note (text, created_at, sender, room_id) VALUES (?, ?, ?, ?)",
                 (text, created_at, sender, room_id),
             )
-            await db.commit()
             return cur.lastrowid
 
-    async def note_list(self, limit: int = 10) -> List[Tuple[int, str, int, str, str]]:
-        async with aiosqlite.connect(self.db_path) as db:
-            cur = await db.execute(
-                "SELECT id, text, created_at, sender, room_id FROM note ORDER BY id DESC LIMIT ?",
-                (limit,),
-            )
-            return await cur.fetchall()
+        note_id = await self.db.submit(insert)
+        self.cache.invalidate("note")
+        return note_id
+
+    async def note_list(self, limit: int = 10, after: Optional[str] = None) -> Page:
+        return await self.cache.get_or_load(
+            "note", (limit, after), lambda: self._load_note_page(limit, after)
+        )
+
+    async def _load_note_page(self, limit: int, after: Optional[str]) -> Page:
+        limit = clamp_limit(limit, default=10)
+        before_id, offset = None, 0
+        if after:
+            (before_id,), offset = decode_cursor(after)
+        async with self.db.read() as db:
+            if before_id is None:
+                cur = await db.execute(
+                    "SELECT id, text, created_at, sender, room_id FROM note ORDER BY id DESC LIMIT ?",
+                    (limit + 1,),
+                )
+            else:
+                cur = await db.execute(
+                    "SELECT id, text, created_at, sender, room_id FROM note WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before_id, limit + 1),
+                )
+            rows = await cur.fetchall()
+        return build_page(rows, limit, offset, lambda row: (row[0],))
 
-    async def note_search(self, keyword: str, limit: int = 20) -> List[Tuple[int, str, int, str, str]]:
-        async with aiosqlite.connect(self.db_path) as db:
+    async def note_search(
+        self, query: str, limit: int = 20
+    ) -> List[Tuple[int, str, int, str, str, str]]:
+        terms = _parse_search_terms(query)
+        if not terms:
+            return []
+        match = _fts_query(terms) if self.fts_enabled else None
+        async with self.db.read() as db:
+            if match is not None:
+                cur = await db.execute(
+                    """
+                    SELECT note.id, note.text, note.created_at, note.sender, note.room_id,
+                           snippet(note_fts, 0, '【', '】', '…', ?)
+                    FROM note_fts
+                    JOIN note ON note.id = note_fts.rowid
+                    WHERE note_fts MATCH ?
+                    ORDER BY note_fts.rank
+                    LIMIT ?
+                    """,
+                    (SNIPPET_TOKENS, match, limit),
+                )
+                return await cur.fetchall()
+            # Terms too short for the trigram index fall back to a LIKE scan.
+            where = " AND ".join("text LIKE ?" for _ in terms)
+            params = [f"%{text}%" for text, _, _ in terms]
             cur = await db.execute(
-                "SELECT id, text, created_at, sender, room_id FROM note WHERE text LIKE ? ORDER BY id DESC LIMIT ?",
-                (f"%{keyword}%", limit),
+                f"SELECT id, text, created_at, sender, room_id, text FROM note WHERE {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit),
             )
             return await cur.fetchall()
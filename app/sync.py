@@ -0,0 +1,73 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger("matrix-bot.sync")
+
+SYNC_PROFILES = ("lean", "full")
+DEFAULT_TIMELINE_LIMIT = 20
+
+# Only what the handlers and nio's room objects need: messages (text and
+# files), membership for invites and lazy-loaded senders, and the
+# encryption flag checked by _handle_message.
+TIMELINE_TYPES = ["m.room.message", "m.room.encryption"]
+STATE_TYPES = ["m.room.member", "m.room.encryption"]
+NOTHING = {"not_types": ["*"]}
+
+
+def build_sync_filter(
+    allowed_rooms: List[str], *, timeline_limit: int = DEFAULT_TIMELINE_LIMIT
+) -> Dict:
+    # Keys match the keyword arguments of AsyncClient.upload_filter().
+    room = {
+        "timeline": {
+            "types": TIMELINE_TYPES,
+            "limit": timeline_limit,
+            "lazy_load_members": True,
+        },
+        "state": {"types": STATE_TYPES, "lazy_load_members": True},
+        "ephemeral": NOTHING,
+        "account_data": NOTHING,
+    }
+    if allowed_rooms:
+        room["rooms"] = sorted(allowed_rooms)
+    return {"presence": NOTHING, "account_data": NOTHING, "room": room}
+
+
+def filter_digest(sync_filter: Dict) -> str:
+    canonical = json.dumps(sync_filter, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SyncTokenStore:
+    # Last next_batch, so a restart can resume instead of doing an initial sync.
+    def __init__(self, path: str):
+        self.path = path
+        self._last: Optional[str] = None
+
+    def load(self) -> Optional[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                token = f.read().strip()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning("Cannot read sync token from %s", self.path)
+            return None
+        self._last = token or None
+        return self._last
+
+    def save(self, token: str) -> None:
+        if not token or token == self._last:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(token)
+            os.replace(tmp_path, self.path)
+            self._last = token
+        except OSError:
+            logger.exception("Cannot write sync token to %s", self.path)
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from app.storage import Storage
+
+
+WORDS = ["開會", "預算", "報告", "deploy", "server", "繳費", "提醒", "週末", "backup", "review"]
+
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+
+
+async def _time_query(storage: Storage, query: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await storage.note_search(query)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+async def _time_like(storage: Storage, keyword: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        async with storage.db.read() as db:
+            cur = await db.execute(
+                "SELECT id, text, created_at, sender, room_id FROM note WHERE text LIKE ? ORDER BY id DESC LIMIT 20",
+                (f"%{keyword}%",),
+            )
+            await cur.fetchall()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+async def run(sizes, repeat: int) -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        storage = Storage(os.path.join(tmpdir, "bot.db"))
+        await storage.init()
+        total = 0
+        print(f"{'rows':>8} {'fts ms':>10} {'like ms':>10}")
+        for size in sizes:
+            async with storage.db.write() as db:
+                await db.executemany(
+                    "INSERT INTO note (text, created_at, sender, room_id) VALUES (?, 0, '@a:x', '!r:x')",
+                    [(_random_text(rng),) for _ in range(size - total)],
+                )
+            total = size
+            # A rare term: the cost that matters is finding few matches in many rows.
+            await storage.note_add("年度稽核清單", 0, "@a:x", "!r:x")
+            fts_ms = await _time_query(storage, "稽核清單", repeat)
+            like_ms = await _time_like(storage, "稽核清單", repeat)
+            print(f"{size:>8} {fts_ms:>10.2f} {like_ms:>10.2f}")
+        await storage.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Note search latency vs table size")
+    parser.add_argument("--sizes", default="1000,10000,100000,300000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run([int(s) for s in args.sizes.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.reminders.repository import ReminderRepository
+from app.reminders.time_utils import format_ms_to_local, ms_to_utc_iso
+
+
+START_MS = 1_900_000_000_000
+USERS = 1000
+
+
+def _legacy_format(utc_iso: str, tz_name: str) -> str:
+    dt_utc = datetime.fromisoformat(utc_iso)
+    if dt_utc.tzinfo is None:
+        dt_utc = dt_utc.replace(tzinfo=timezone.utc)
+    return dt_utc.astimezone(ZoneInfo(tz_name)).strftime("%Y-%m-%d %H:%M")
+
+
+def _rows(n: int):
+    rng = random.Random(0)
+    for i in range(n):
+        due_ms = START_MS + rng.randrange(0, 365 * 24 * 3600) * 1000
+        yield (f"@u{i % USERS}:x", "!r:x", f"reminder {i}", ms_to_utc_iso(due_ms), due_ms)
+
+
+def _populate(db_path: str, n: int) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        """
+        INSERT INTO reminders (user_id, room_id, text, due_at_utc, due_at_ms, tz, status, created_at_utc)
+        VALUES (?, ?, ?, ?, ?, 'Asia/Taipei', 'pending', '2030-01-01T00:00:00+00:00')
+        """,
+        _rows(n),
+    )
+    # The text-column index the pre-migration schema used for claim_due.
+    conn.execute(
+        "CREATE INDEX idx_legacy_pending_due ON reminders(due_at_utc, id) WHERE status = 'pending'"
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _legacy_claim(repo: ReminderRepository, now_utc: str, limit: int):
+    async with repo.db.write() as db:
+        cur = await db.execute(
+            """
+            SELECT id, user_id, room_id, text, due_at_utc, tz FROM reminders
+            WHERE status = 'pending' AND due_at_utc <= ?
+            ORDER BY due_at_utc ASC, id ASC LIMIT ?
+            """,
+            (now_utc, limit),
+        )
+        rows = await cur.fetchall()
+        ids = [row["id"] for row in rows]
+        placeholders = ",".join("?" for _ in ids)
+        await db.execute(f"UPDATE reminders SET status = 'sending' WHERE id IN ({placeholders})", ids)
+    return [_legacy_format(row["due_at_utc"], row["tz"]) for row in rows]
+
+
+async def _legacy_list(repo: ReminderRepository, user_id: str):
+    async with repo.db.read() as db:
+        cur = await db.execute(
+            """
+            SELECT id, room_id, text, due_at_utc, tz, status FROM reminders
+            WHERE user_id = ? AND status IN ('pending', 'sending')
+            ORDER BY due_at_utc ASC, id ASC LIMIT 21
+            """,
+            (user_id,),
+        )
+        rows = await cur.fetchall()
+    return [_legacy_format(row["due_at_utc"], row["tz"]) for row in rows]
+
+
+async def _new_claim(repo: ReminderRepository, now_ms: int, limit: int):
+    rows = await repo.claim_due(now_ms, limit=limit)
+    return [format_ms_to_local(row["due_at_ms"], row["tz"]) for row in rows]
+
+
+async def _new_list(repo: ReminderRepository, user_id: str):
+    page = await repo.list_active_for_user(user_id, limit=20)
+    return [format_ms_to_local(row["due_at_ms"], row["tz"]) for row in page.items]
+
+
+async def _measure(label: str, repeat: int, op) -> None:
+    started = time.perf_counter()
+    for i in range(repeat):
+        await op(i)
+    per_op = (time.perf_counter() - started) / repeat * 1000
+    print(f"{label:<28} {per_op:>8.3f} ms/op")
+
+
+async def run(rows: int, repeat: int, batch: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo = ReminderRepository(os.path.join(tmpdir, "reminders.db"), cache_max_entries=0)
+        await repo.init()
+        await repo.close()
+        started = time.perf_counter()
+        _populate(repo.db_path, rows)
+        print(f"populated {rows} rows in {time.perf_counter() - started:.1f}s")
+
+        now_ms = START_MS + 365 * 24 * 3600 * 1000
+        await _measure("claim_due text", repeat, lambda i: _legacy_claim(repo, ms_to_utc_iso(now_ms), batch))
+        await _measure("claim_due due_at_ms", repeat, lambda i: _new_claim(repo, now_ms, batch))
+        await _measure("list text", repeat, lambda i: _legacy_list(repo, f"@u{i % USERS}:x"))
+        await _measure("list due_at_ms", repeat, lambda i: _new_list(repo, f"@u{i % USERS}:x"))
+        await repo.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="claim_due/list on TEXT vs integer due times")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat, args.batch))
+
+
+if __name__ == "__main__":
+    main()
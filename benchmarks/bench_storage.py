@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import aiosqlite
+
+from app.storage import Storage
+
+
+async def _legacy_todo_add(db_path: str, text: str, created_at: int) -> int:
+    async with aiosqlite.connect(db_path) as db:
+        cur = await db.execute(
+            "INSERT INTO todo (text, created_at, done) VALUES (?, ?, 0)",
+            (text, created_at),
+        )
+        await db.commit()
+        return cur.lastrowid
+
+
+async def _legacy_note_list(db_path: str, limit: int = 10):
+    async with aiosqlite.connect(db_path) as db:
+        cur = await db.execute(
+            "SELECT id, text, created_at, sender, room_id FROM note ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        return await cur.fetchall()
+
+
+async def _measure(label: str, ops: int, op) -> float:
+    started = time.perf_counter()
+    for i in range(ops):
+        await op(i)
+    elapsed = time.perf_counter() - started
+    rate = ops / elapsed
+    print(f"{label:<32} {ops:>6} ops  {rate:>10.0f} ops/sec")
+    return rate
+
+
+async def run(ops: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # The shared-connection numbers must not include cache hits: the
+        # legacy path has no cache, so the cached read is reported apart.
+        storage = Storage(os.path.join(tmpdir, "bot.db"), cache_max_entries=0)
+        await storage.init()
+        await storage.close()
+        db_path = storage.db_path
+
+        before_add = await _measure(
+            "before: todo_add (connect/op)", ops, lambda i: _legacy_todo_add(db_path, f"t{i}", i)
+        )
+        before_list = await _measure(
+            "before: note_list (connect/op)", ops, lambda i: _legacy_note_list(db_path)
+        )
+        after_add = await _measure(
+            "after:  todo_add (shared)", ops, lambda i: storage.todo_add(f"t{i}", i)
+        )
+        after_list = await _measure(
+            "after:  note_list (shared)", ops, lambda i: storage.note_list()
+        )
+        await storage.close()
+
+        cached = Storage(db_path)
+        await cached.init()
+        await _measure("after:  note_list (cached)", ops, lambda i: cached.note_list())
+        await cached.close()
+
+    print(f"todo_add speedup:  x{after_add / before_add:.1f}")
+    print(f"note_list speedup: x{after_list / before_list:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Storage ops/sec before/after shared connections")
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.ops))
+
+
+if __name__ == "__main__":
+    main()
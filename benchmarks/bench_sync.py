@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import json
+import os
+
+import aiohttp
+
+from app.config import _split_csv
+from app.sync import build_sync_filter
+
+
+async def _sync(session, base_url: str, token: str, params: dict):
+    # Returns (bytes on the wire, decoded JSON bytes, next_batch).
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+    async with session.get(
+        base_url + "/_matrix/client/v3/sync", params=params, headers=headers
+    ) as resp:
+        resp.raise_for_status()
+        body = await resp.read()
+        wire = int(resp.headers.get("Content-Length") or len(body))
+    return wire, len(body), json.loads(body).get("next_batch")
+
+
+async def _run(args) -> None:
+    base_url = args.homeserver.rstrip("/")
+    rooms = _split_csv(args.rooms)
+    profiles = {
+        "full (before)": ({"full_state": "true"}, {}),
+        "lean (after)": (
+            {"filter": json.dumps(build_sync_filter(rooms, timeline_limit=0))},
+            {"filter": json.dumps(build_sync_filter(rooms))},
+        ),
+    }
+    async with aiohttp.ClientSession() as session:
+        for label, (first_params, next_params) in profiles.items():
+            wire, size, since = await _sync(
+                session, base_url, args.token, {"timeout": "0", **first_params}
+            )
+            print(f"{label:<14} first sync     {wire:>10} B wire {size:>10} B json")
+            total_wire = total_size = 0
+            for _ in range(args.syncs):
+                wire, size, since = await _sync(
+                    session,
+                    base_url,
+                    args.token,
+                    {"timeout": str(args.timeout_ms), "since": since, **next_params},
+                )
+                total_wire += wire
+                total_size += size
+            print(
+                f"{label:<14} per next sync {total_wire / args.syncs:>10.0f} B wire "
+                f"{total_size / args.syncs:>10.0f} B json"
+            )
+
+
+def main() -> None:
+    # Needs a reachable homeserver; compares the old unfiltered full_state
+    # sync with the lean profile for the same account.
+    parser = argparse.ArgumentParser(description="Bytes per /sync, full vs lean profile")
+    parser.add_argument("--homeserver", default=os.getenv("HOMESERVER_URL", ""))
+    parser.add_argument("--token", default=os.getenv("BOT_ACCESS_TOKEN", ""))
+    parser.add_argument("--rooms", default=os.getenv("ALLOWED_ROOMS", ""))
+    parser.add_argument("--syncs", type=int, default=5)
+    parser.add_argument("--timeout-ms", type=int, default=1000)
+    args = parser.parse_args()
+    if not args.homeserver or not args.token:
+        parser.error("--homeserver and --token (or HOMESERVER_URL / BOT_ACCESS_TOKEN) are required")
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
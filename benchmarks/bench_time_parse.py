@@ -0,0 +1,77 @@
+import argparse
+import random
+import re
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.reminders.time_utils import format_ms_to_local, parse_local_to_ms, parse_time_expression
+
+
+TZ = "Asia/Taipei"
+
+
+def _legacy_parse(payload: str, tz_name: str) -> int:
+    # Per-call regexes, datetime.now(ZoneInfo(...)) and strptime, as before.
+    tokens = payload.split()
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", tokens[0]) and len(tokens) >= 3:
+        due_local = f"{tokens[0]} {tokens[1]}"
+    elif re.fullmatch(r"\d{1,2}-\d{1,2}", tokens[0]) and len(tokens) >= 3:
+        month, day = tokens[0].split("-")
+        hour, _, minute = tokens[1].partition(":")
+        year = datetime.now(ZoneInfo(tz_name)).year
+        due_local = f"{year:04d}-{int(month):02d}-{int(day):02d} {int(hour):02d}:{int(minute or 0):02d}"
+    else:
+        if re.fullmatch(r"\d{1,2}", tokens[0]):
+            hour, minute = int(tokens[0]), 0
+        elif re.fullmatch(r"\d{1,2}:\d{2}", tokens[0]):
+            hour, minute = (int(x) for x in tokens[0].split(":"))
+        today = datetime.now(ZoneInfo(tz_name)).strftime("%Y-%m-%d")
+        due_local = f"{today} {hour:02d}:{minute:02d}"
+    dt_local = datetime.strptime(due_local, "%Y-%m-%d %H:%M").replace(tzinfo=ZoneInfo(tz_name))
+    return round(dt_local.timestamp() * 1000)
+
+
+def _legacy_format(epoch_ms: int, tz_name: str) -> str:
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=ZoneInfo(tz_name)).strftime("%Y-%m-%d %H:%M")
+
+
+def _measure(label: str, fn, inputs) -> None:
+    started = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {elapsed / len(inputs) * 1e6:>8.2f} us/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reminder time parsing micro-benchmark")
+    parser.add_argument("--ops", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    payloads = [
+        rng.choice(
+            [
+                f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d} 開會",
+                f"{rng.randint(1, 12)}-{rng.randint(1, 28)} {rng.randint(0, 23)} 繳費",
+                f"{rng.randint(0, 23)}:{rng.randint(0, 59):02d} 提醒",
+                f"{rng.randint(0, 23)} 提醒",
+            ]
+        )
+        for _ in range(args.ops)
+    ]
+    csv_times = [f"2026-02-{rng.randint(1, 28):02d} {rng.randint(8, 18):02d}:00" for _ in range(args.ops)]
+    now_ms = int(time.time() * 1000)
+    epochs = [now_ms + rng.randint(0, 365 * 86400) * 1000 for _ in range(args.ops)]
+
+    _measure("legacy add parse", lambda p: _legacy_parse(p, TZ), payloads)
+    _measure("parse_time_expression", lambda p: parse_time_expression(p, TZ, now_ms), payloads)
+    _measure("strptime csv time", lambda t: _legacy_parse(t + " x", TZ), csv_times)
+    _measure("parse_local_to_ms", lambda t: parse_local_to_ms(t, TZ), csv_times)
+    _measure("legacy format", lambda e: _legacy_format(e, TZ), epochs)
+    _measure("format_ms_to_local", lambda e: format_ms_to_local(e, TZ), epochs)
+
+
+if __name__ == "__main__":
+    main()
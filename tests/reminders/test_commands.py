@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from app.commands.registry import Invocation
+
+try:
+    from app.reminders.commands import handle_remind
+    from app.reminders.repository import ReminderRepository
+    from app.reminders.service import TIME_FORMAT_ERROR, ReminderService
+except ModuleNotFoundError:
+    ReminderRepository = None
+
+
+class _FakeBot:
+    def __init__(self, service):
+        self.cfg = SimpleNamespace(timezone="Asia/Taipei")
+        self.reminder_service = service
+        self.sent = []
+
+    async def _send_text(self, room_id: str, message: str) -> None:
+        self.sent.append(message)
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class RemindAddErrorsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.service = ReminderService(
+            repository=ReminderRepository(f"{self.tmpdir.name}/reminders.db"),
+            default_tz="Asia/Taipei",
+        )
+        await self.service.init()
+        self.bot = _FakeBot(self.service)
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def _add(self, payload: str) -> str:
+        body = f"!remind add {payload}"
+        await handle_remind(
+            self.bot, Invocation("!r:x", "@alice:x", body, body.split()[1:])
+        )
+        return self.bot.sent[-1]
+
+    async def test_specific_errors_are_replied_as_is(self) -> None:
+        self.assertEqual(
+            await self._add("2000-01-01 09:00 過去"),
+            "提醒設定失敗：提醒時間早於目前時間，請設定未來時間",
+        )
+        self.assertEqual(await self._add("someday 開會"), f"提醒設定失敗：{TIME_FORMAT_ERROR}")
+        self.assertIn("重複規則錯誤", await self._add("+1h 開會 --repeat yearly"))
+        self.assertEqual(
+            await self._add("+1h 開會 --count 3"),
+            "提醒設定失敗：--until/--count 需搭配 --repeat",
+        )
+
+    async def test_bad_count_names_the_flag(self) -> None:
+        for count in ("abc", "0", "-2"):
+            self.assertEqual(
+                await self._add(f"+1h 開會 --repeat daily --count {count}"),
+                f"提醒設定失敗：--count 必須是正整數：{count}",
+            )
+        self.assertEqual(await self._add("+1h 開會 --repeat daily --count 2"), "已新增提醒（重複：daily）")
+
+
+if __name__ == "__main__":
+    unittest.main()
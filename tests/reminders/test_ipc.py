@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from app.reminders.ipc import ScheduleLink, serve_schedule_changes
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.calls = []
+        self.changed = asyncio.Event()
+
+    def notify(self, due_ts: float) -> None:
+        self.calls.append(("notify", due_ts))
+        self.changed.set()
+
+    def reschedule(self) -> None:
+        self.calls.append(("reschedule",))
+        self.changed.set()
+
+
+class ScheduleIpcTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "reminders.sock")
+        self.scheduler = FakeScheduler()
+        self.reloads = 0
+
+        def on_reload() -> None:
+            self.reloads += 1
+            self.scheduler.changed.set()
+
+        self.server = await serve_schedule_changes(
+            self.socket_path, self.scheduler, on_reload=on_reload
+        )
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.tmp.cleanup()
+
+    async def _wait_for(self, count: int) -> None:
+        while len(self.scheduler.calls) + self.reloads < count:
+            self.scheduler.changed.clear()
+            await asyncio.wait_for(self.scheduler.changed.wait(), 2)
+
+    async def test_link_forwards_changes_after_connect_reschedule(self):
+        link = ScheduleLink(self.socket_path)
+        link.notify(1700000000.5)
+        link.reschedule()
+        link.request_reload()
+        task = asyncio.create_task(link.run())
+        try:
+            await self._wait_for(4)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(
+            self.scheduler.calls,
+            [("reschedule",), ("notify", 1700000000.5), ("reschedule",)],
+        )
+        self.assertEqual(self.reloads, 1)
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+    async def test_malformed_lines_are_ignored(self):
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        writer.write(b"not json\n")
+        writer.write(b'{"op": "notify"}\n')
+        writer.write(b'{"op": "bogus"}\n')
+        writer.write(b"[1, 2]\n")
+        writer.write(b'{"op": "notify", "due": 12.0}\n')
+        await writer.drain()
+        await self._wait_for(1)
+        writer.close()
+        self.assertEqual(self.scheduler.calls, [("notify", 12.0)])
+
+    async def test_overflow_collapses_into_one_reschedule(self):
+        link = ScheduleLink(self.socket_path)
+        for i in range(2000):
+            link.notify(float(i))
+        task = asyncio.create_task(link.run())
+        try:
+            await self._wait_for(1001)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(self.scheduler.calls[0], ("reschedule",))
+        self.assertEqual(self.scheduler.calls[-1], ("reschedule",))
+        self.assertEqual(len(self.scheduler.calls), 1001)
+
+
+if __name__ == "__main__":
+    unittest.main()
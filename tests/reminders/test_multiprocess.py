@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+try:
+    from app.reminders.repository import ReminderRepository
+    from app.reminders.service import ReminderService
+except ModuleNotFoundError:
+    ReminderRepository = None
+
+REMINDER_COUNT = 300
+
+
+async def _open_count(repo) -> int:
+    async with repo.db.read() as db:
+        cur = await db.execute(
+            "SELECT COUNT(*) FROM reminders WHERE status IN ('pending', 'sending')"
+        )
+        return (await cur.fetchone())[0]
+
+
+def _worker(db_path: str, worker_id: str, out_path: str) -> None:
+    async def main() -> None:
+        repo = ReminderRepository(db_path)
+        service = ReminderService(
+            repository=repo, dispatch_batch_size=7, worker_id=worker_id, lease_seconds=0.3
+        )
+        await service.init()
+        with open(out_path, "w", encoding="utf-8") as out:
+
+            async def send(room_id: str, msg: str) -> None:
+                await asyncio.sleep(0.001)
+                out.write(msg.split("：", 1)[1].split("（", 1)[0] + "\n")
+                out.flush()
+
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                if not await service.dispatch_due(send) and not await _open_count(repo):
+                    break
+                await asyncio.sleep(0.01)
+        await service.close()
+
+    asyncio.run(main())
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class MultiProcessDispatchTest(unittest.IsolatedAsyncioTestCase):
+    async def test_workers_deliver_each_reminder_exactly_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "reminders.db")
+            repo = ReminderRepository(db_path)
+            await repo.init()
+            now_ms = int(time.time() * 1000)
+            await repo.add_many(
+                user_id="@alice:example.com",
+                tz="Asia/Taipei",
+                created_at_utc="2026-02-19T00:00:00+00:00",
+                items=[(f"!r{i % 5}", f"r{i}", now_ms - 1000 + i) for i in range(REMINDER_COUNT)],
+            )
+            # A worker that claims a batch and dies without sending it.
+            crashed = await repo.claim_due(now_ms, limit=20, worker_id="crashed", lease_ms=500)
+            self.assertEqual(len(crashed), 20)
+            await repo.close()
+
+            ctx = multiprocessing.get_context("spawn")
+            outputs = [os.path.join(tmpdir, f"worker{i}.txt") for i in range(3)]
+            procs = [
+                ctx.Process(target=_worker, args=(db_path, f"w{i}", out))
+                for i, out in enumerate(outputs)
+            ]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join(60)
+                self.assertEqual(proc.exitcode, 0)
+
+            delivered = []
+            for out in outputs:
+                with open(out, encoding="utf-8") as f:
+                    delivered.extend(line.strip() for line in f if line.strip())
+            self.assertEqual(len(delivered), REMINDER_COUNT)
+            self.assertEqual(sorted(delivered), sorted(f"r{i}" for i in range(REMINDER_COUNT)))
+            self.assertGreater(sum(1 for out in outputs if os.path.getsize(out)), 1)
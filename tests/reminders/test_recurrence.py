@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.reminders.recurrence import build_rule, next_occurrence, parse_rule
+
+
+NY = "America/New_York"
+
+
+def _ms(local: str, tz: str) -> int:
+    dt = datetime.strptime(local, "%Y-%m-%d %H:%M").replace(tzinfo=ZoneInfo(tz))
+    return int(dt.timestamp() * 1000)
+
+
+def _local(ms: int, tz: str) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=ZoneInfo(tz)).strftime("%Y-%m-%d %H:%M %a")
+
+
+class RecurrenceTest(unittest.TestCase):
+    def test_daily_keeps_wall_time_across_dst(self) -> None:
+        first = _ms("2026-03-07 09:00", NY)
+        rule = build_rule("daily", first, NY)
+        due, rule = next_occurrence(rule, first, NY, first)
+        self.assertEqual(_local(due, NY), "2026-03-08 09:00 Sun")
+        # Spring forward: only 23 hours elapse between the two occurrences.
+        self.assertEqual(due - first, 23 * 3600 * 1000)
+
+    def test_spring_forward_gap_does_not_drift(self) -> None:
+        first = _ms("2026-03-07 02:30", NY)
+        rule = build_rule("daily", first, NY)
+        due, rule = next_occurrence(rule, first, NY, first)
+        self.assertEqual(_local(due, NY), "2026-03-08 03:30 Sun")
+        due, rule = next_occurrence(rule, due, NY, due)
+        self.assertEqual(_local(due, NY), "2026-03-09 02:30 Mon")
+
+    def test_weekly_on_weekdays(self) -> None:
+        first = _ms("2026-01-05 08:00", NY)  # Monday
+        rule = build_rule("weekly:MO,WE,FR", first, NY)
+        seen = []
+        due = first
+        for _ in range(4):
+            due, rule = next_occurrence(rule, due, NY, due)
+            seen.append(_local(due, NY))
+        self.assertEqual(
+            seen,
+            [
+                "2026-01-07 08:00 Wed",
+                "2026-01-09 08:00 Fri",
+                "2026-01-12 08:00 Mon",
+                "2026-01-14 08:00 Wed",
+            ],
+        )
+
+    def test_monthly_clamps_to_month_end(self) -> None:
+        first = _ms("2026-01-31 10:00", "Asia/Taipei")
+        rule = build_rule("monthly", first, "Asia/Taipei")
+        due, rule = next_occurrence(rule, first, "Asia/Taipei", first)
+        self.assertEqual(_local(due, "Asia/Taipei"), "2026-02-28 10:00 Sat")
+        due, rule = next_occurrence(rule, due, "Asia/Taipei", due)
+        self.assertEqual(_local(due, "Asia/Taipei"), "2026-03-31 10:00 Tue")
+
+    def test_every_n_hours_is_elapsed_time(self) -> None:
+        first = _ms("2026-11-01 00:00", NY)
+        rule = build_rule("every:2h", first, NY)
+        due, _ = next_occurrence(rule, first, NY, first)
+        self.assertEqual(due - first, 2 * 3600 * 1000)
+
+    def test_skips_missed_occurrences_in_one_step(self) -> None:
+        first = _ms("2020-01-01 09:00", "Asia/Taipei")
+        rule = build_rule("daily", first, "Asia/Taipei")
+        now = _ms("2026-05-10 12:00", "Asia/Taipei")
+        due, _ = next_occurrence(rule, first, "Asia/Taipei", now)
+        self.assertEqual(_local(due, "Asia/Taipei"), "2026-05-11 09:00 Mon")
+
+        hourly = build_rule("every:6h", first, "Asia/Taipei")
+        due, _ = next_occurrence(hourly, first, "Asia/Taipei", now)
+        self.assertEqual(_local(due, "Asia/Taipei"), "2026-05-10 15:00 Sun")
+
+    def test_count_and_until_end_the_series(self) -> None:
+        first = _ms("2026-01-01 09:00", "Asia/Taipei")
+        rule = build_rule("daily", first, "Asia/Taipei", count=2)
+        due, rule = next_occurrence(rule, first, "Asia/Taipei", first)
+        self.assertEqual(rule.count, 1)
+        self.assertIsNone(next_occurrence(rule, due, "Asia/Taipei", due))
+
+        rule = build_rule("daily", first, "Asia/Taipei", until="2026-01-02")
+        due, rule = next_occurrence(rule, first, "Asia/Taipei", first)
+        self.assertIsNone(next_occurrence(rule, due, "Asia/Taipei", due))
+
+    def test_serialize_round_trip(self) -> None:
+        first = _ms("2026-01-05 08:15", NY)
+        rule = build_rule("weekly:fr,mo", first, NY, until="2026-06-30", count=5)
+        text = rule.serialize()
+        self.assertEqual(
+            text, "FREQ=WEEKLY;BYDAY=MO,FR;BYHOUR=8;BYMINUTE=15;UNTIL=20260630;COUNT=5"
+        )
+        self.assertEqual(parse_rule(text), rule)
+
+    def test_rejects_invalid_specs(self) -> None:
+        for spec in ("yearly", "weekly:XX", "every:0h", "every:h"):
+            with self.assertRaises(ValueError):
+                build_rule(spec, 0, "Asia/Taipei")
@@ -1,6 +1,9 @@
+import sqlite3
 import tempfile
 import unittest
 
+from app.reminders.time_utils import utc_iso_to_ms
+
 try:
     from app.reminders.repository import ReminderRepository
 except ModuleNotFoundError:
@@ -16,21 +19,173 @@ class ReminderRepositoryTest(unittest.IsolatedAsyncioTestCase):
         await self.repo.init()
 
     async def asyncTearDown(self) -> None:
+        await self.repo.close()
         self.tmpdir.cleanup()
 
     async def test_claim_changes_pending_to_sending_and_prevents_duplicate(self) -> None:
-        reminder_id = await self.repo.add(
+        await self.repo.add(
             user_id="@alice:example.com",
             room_id="!room:example.com",
             text="test reminder",
-            due_at_utc="2026-02-20T01:00:00+00:00",
+            due_at_ms=utc_iso_to_ms("2026-02-20T01:00:00+00:00"),
             tz="Asia/Taipei",
             created_at_utc="2026-02-19T00:00:00+00:00",
         )
 
-        first = await self.repo.claim_due("2026-02-20T01:00:00+00:00", limit=10)
-        second = await self.repo.claim_due("2026-02-20T01:00:00+00:00", limit=10)
+        first = await self.repo.claim_due(utc_iso_to_ms("2026-02-20T01:00:00+00:00"), limit=10)
+        second = await self.repo.claim_due(utc_iso_to_ms("2026-02-20T01:00:00+00:00"), limit=10)
 
         self.assertEqual(len(first), 1)
-        self.assertEqual(first[0]["id"], reminder_id)
+        self.assertEqual(first[0]["text"], "test reminder")
         self.assertEqual(second, [])
+
+    async def test_list_active_for_user_pages_by_due_time(self) -> None:
+        for hour in (5, 1, 3, 2, 4):
+            await self.repo.add(
+                user_id="@alice:example.com",
+                room_id="!room:example.com",
+                text=f"at {hour}",
+                due_at_ms=utc_iso_to_ms(f"2026-02-20T0{hour}:00:00+00:00"),
+                tz="Asia/Taipei",
+                created_at_utc="2026-02-19T00:00:00+00:00",
+            )
+
+        first = await self.repo.list_active_for_user("@alice:example.com", limit=2)
+        rest = await self.repo.list_active_for_user(
+            "@alice:example.com", limit=10, after=first.next_after
+        )
+
+        self.assertEqual([row["text"] for row in first.items], ["at 1", "at 2"])
+        self.assertEqual([row["text"] for row in rest.items], ["at 3", "at 4", "at 5"])
+        self.assertEqual(rest.offset, 2)
+        self.assertIsNone(rest.next_after)
+
+    async def test_expired_lease_is_reclaimed_and_old_owner_cannot_complete(self) -> None:
+        due = utc_iso_to_ms("2026-02-20T01:00:00+00:00")
+        await self.repo.add(
+            user_id="@alice:example.com",
+            room_id="!room:example.com",
+            text="test reminder",
+            due_at_ms=due,
+            tz="Asia/Taipei",
+            created_at_utc="2026-02-19T00:00:00+00:00",
+        )
+        first = await self.repo.claim_due(due, worker_id="a", lease_ms=1000)
+        reminder_id = first[0]["id"]
+        self.assertEqual(await self.repo.claim_due(due + 999, worker_id="b"), [])
+        self.assertEqual(await self.repo.next_due_times(due + 5000, 10), [due + 1000])
+
+        second = await self.repo.claim_due(due + 1000, worker_id="b", lease_ms=1000)
+        self.assertEqual([r["id"] for r in second], [reminder_id])
+
+        self.assertEqual(await self.repo.renew_leases([reminder_id], "a", due + 9000), [])
+        self.assertEqual(
+            await self.repo.renew_leases([reminder_id], "b", due + 9000), [reminder_id]
+        )
+        await self.repo.mark_done_many([reminder_id], "2026-02-20T01:00:01+00:00", worker_id="a")
+        self.assertEqual(await self.repo.claim_due(due + 5000, worker_id="c"), [])
+        await self.repo.mark_done_many([reminder_id], "2026-02-20T01:00:01+00:00", worker_id="b")
+        self.assertEqual(await self.repo.claim_due(due + 10000, worker_id="c"), [])
+
+    async def test_public_ids_are_per_user_and_cancel_many_is_single_statement(self) -> None:
+        base = utc_iso_to_ms("2026-02-20T01:00:00+00:00")
+        await self.repo.add_many(
+            user_id="@alice:example.com",
+            tz="Asia/Taipei",
+            created_at_utc="2026-02-19T00:00:00+00:00",
+            items=[("!room:example.com", f"a{i}", base + i) for i in range(10)],
+        )
+        await self.repo.add(
+            user_id="@bob:example.com",
+            room_id="!room:example.com",
+            text="b1",
+            due_at_ms=base,
+            tz="Asia/Taipei",
+            created_at_utc="2026-02-19T00:00:00+00:00",
+        )
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual([row["user_seq"] for row in page.items], list(range(1, 11)))
+
+        commits = self.repo.db.commit_count
+        cancelled = await self.repo.cancel_many("@alice:example.com", [3, 5, 7, 8, 9, 42])
+        self.assertEqual(cancelled, [3, 5, 7, 8, 9])
+        self.assertEqual(self.repo.db.commit_count - commits, 1)
+        self.assertEqual(await self.repo.cancel_many("@alice:example.com", [3]), [])
+
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual([row["user_seq"] for row in page.items], [1, 2, 4, 6, 10])
+        self.assertTrue(await self.repo.cancel(user_seq=1, user_id="@bob:example.com"))
+        bob = await self.repo.list_active_for_user("@bob:example.com")
+        self.assertEqual(bob.items, [])
+
+    async def test_listing_cache_is_invalidated_by_mark_done(self) -> None:
+        await self.repo.add(
+            user_id="@alice:example.com",
+            room_id="!room:example.com",
+            text="cached",
+            due_at_ms=utc_iso_to_ms("2026-02-20T01:00:00+00:00"),
+            tz="Asia/Taipei",
+            created_at_utc="2026-02-19T00:00:00+00:00",
+        )
+        first = await self.repo.list_active_for_user("@alice:example.com")
+        again = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertIs(first, again)
+        self.assertEqual(self.repo.cache.hits, 1)
+
+        claimed = await self.repo.claim_due(utc_iso_to_ms("2026-02-20T01:00:00+00:00"))
+        await self.repo.mark_done(claimed[0]["id"], "2026-02-20T01:00:01+00:00")
+
+        after = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(after.items, [])
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class DueAtMsMigrationTest(unittest.IsolatedAsyncioTestCase):
+    async def test_backfills_integer_due_times_from_text(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = f"{tmpdir}/reminders.db"
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                """
+                CREATE TABLE reminders (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    room_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    due_at_utc TEXT NOT NULL,
+                    tz TEXT NOT NULL DEFAULT 'Asia/Taipei',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    repeat_rule TEXT,
+                    created_at_utc TEXT NOT NULL,
+                    sent_at_utc TEXT
+                )
+                """
+            )
+            due_texts = ["2026-02-20T01:00:00+00:00", "2026-02-20T01:00:00.250000+00:00"]
+            for due in due_texts:
+                conn.execute(
+                    "INSERT INTO reminders (user_id, room_id, text, due_at_utc, created_at_utc) "
+                    "VALUES ('@a:x', '!r:x', 't', ?, '2026-01-01T00:00:00+00:00')",
+                    (due,),
+                )
+            conn.commit()
+            conn.close()
+
+            repo = ReminderRepository(db_path)
+            await repo.init()
+            claimed = await repo.claim_due(utc_iso_to_ms(due_texts[1]), limit=10)
+            new_seq = await repo.add(
+                user_id="@a:x",
+                room_id="!r:x",
+                text="t",
+                due_at_ms=utc_iso_to_ms("2026-03-01T00:00:00+00:00"),
+                tz="Asia/Taipei",
+                created_at_utc="2026-02-19T00:00:00+00:00",
+            )
+            page = await repo.list_active_for_user("@a:x")
+            await repo.close()
+
+        self.assertEqual([row["due_at_ms"] for row in claimed], [utc_iso_to_ms(d) for d in due_texts])
+        # Existing rows are numbered per user and new ones continue the sequence.
+        self.assertEqual([r["user_seq"] for r in page.items], [1, 2, 3])
+        self.assertEqual(new_seq, 3)
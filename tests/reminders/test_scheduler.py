@@ -0,0 +1,194 @@
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+try:
+    from app.reminders.repository import ReminderRepository
+except ModuleNotFoundError:
+    ReminderRepository = None
+from app.reminders.service import ReminderService
+
+
+TZ = "Asia/Taipei"
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+        self.deadline = None
+        self._blocked = asyncio.Event()
+        self._advanced = asyncio.Event()
+
+    def time(self) -> float:
+        return self.now
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> None:
+        self.deadline = self.now + max(0.0, timeout)
+        self._advanced.clear()
+        self._blocked.set()
+        woken = asyncio.ensure_future(event.wait())
+        advanced = asyncio.ensure_future(self._advanced.wait())
+        try:
+            await asyncio.wait({woken, advanced}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            woken.cancel()
+            advanced.cancel()
+            self._blocked.clear()
+            self.deadline = None
+
+    async def blocked(self) -> None:
+        # Re-check after waking: the scheduler may have been woken again meanwhile.
+        while not self._blocked.is_set():
+            await asyncio.wait_for(self._blocked.wait(), timeout=2)
+
+    async def advance_to_deadline(self) -> None:
+        await self.blocked()
+        self.now = self.deadline
+        self._advanced.set()
+        while self._blocked.is_set():
+            await asyncio.sleep(0)
+
+    async def deadline_becomes(self, expected: float) -> None:
+        for _ in range(200):
+            if self._blocked.is_set() and self.deadline == expected:
+                return
+            await asyncio.sleep(0.005)
+        raise AssertionError(f"scheduler deadline {self.deadline} != {expected}")
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class ReminderSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.start = datetime(2030, 1, 1, 8, 0, tzinfo=ZoneInfo(TZ)).timestamp()
+        self.clock = FakeClock(self.start)
+        self.service = ReminderService(
+            repository=self.repo,
+            poll_interval_seconds=20,
+            default_tz=TZ,
+            lookahead_seconds=3600,
+            clock=self.clock.time,
+            waiter=self.clock.wait,
+        )
+        await self.service.init()
+        self.lags = []
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def _send(self, room_id: str, message: str) -> None:
+        due = datetime.strptime(message.split("原訂時間：")[1][:16], "%Y-%m-%d %H:%M")
+        due_ts = due.replace(tzinfo=ZoneInfo(TZ)).timestamp()
+        self.lags.append(self.clock.time() - due_ts)
+
+    async def _add(self, minutes_after_start: int) -> None:
+        due = datetime.fromtimestamp(self.start + minutes_after_start * 60, ZoneInfo(TZ))
+        await self.service.add_reminder(
+            user_id="@alice:example.com",
+            room_id="!room:example.com",
+            text=f"+{minutes_after_start}m",
+            due_local=due.strftime("%Y-%m-%d %H:%M"),
+            tz_name=TZ,
+        )
+
+    async def _run_until_sent(self, count: int) -> None:
+        for _ in range(50):
+            if len(self.lags) >= count:
+                return
+            await self.clock.advance_to_deadline()
+        self.fail(f"only {len(self.lags)} of {count} reminders sent")
+
+    async def test_fires_exactly_at_due_time(self) -> None:
+        await self._add(1)
+        await self._add(2)
+        await self._add(2)
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            await self._run_until_sent(3)
+        finally:
+            task.cancel()
+        # Due-to-sent lag under the fake clock; fixed polling would show up to 20 s here.
+        self.assertEqual(self.lags, [0.0, 0.0, 0.0])
+
+    async def test_full_batch_claims_again_immediately(self) -> None:
+        self.service.dispatch_batch_size = 2
+        self.service.scheduler.batch_size = 2
+        for _ in range(5):
+            await self._add(1)
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            await self._run_until_sent(5)
+        finally:
+            task.cancel()
+        self.assertEqual(self.lags, [0.0] * 5)
+
+    async def test_add_wakes_sleeping_scheduler(self) -> None:
+        await self._add(50)
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            await self.clock.deadline_becomes(self.start + 300)
+            await self._add(4)
+            await self.clock.deadline_becomes(self.start + 4 * 60)
+            await self._run_until_sent(2)
+        finally:
+            task.cancel()
+        self.assertEqual(self.lags, [0.0, 0.0])
+
+    async def test_idle_scheduler_only_loads_once_per_reload_interval(self) -> None:
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            for _ in range(3):
+                await self.clock.advance_to_deadline()
+            await self.clock.blocked()
+        finally:
+            task.cancel()
+        self.assertEqual(self.clock.now, self.start + 3 * 300)
+        self.assertEqual(self.service.scheduler.loads, 4)
+
+    async def test_row_added_without_notify_is_found_by_next_reload(self) -> None:
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            await self.clock.deadline_becomes(self.start + 300)
+            # Written by another process whose notify never arrived.
+            await self.repo.add(
+                user_id="@alice:example.com",
+                room_id="!room:example.com",
+                text="+10m",
+                due_at_ms=int((self.start + 10 * 60) * 1000),
+                tz=TZ,
+                created_at_utc="2030-01-01T00:00:00+00:00",
+            )
+            await self._run_until_sent(1)
+        finally:
+            task.cancel()
+        self.assertEqual(self.lags, [0.0])
+
+    async def test_notify_during_load_is_not_lost(self) -> None:
+        scheduler = self.service.scheduler
+        load_started = asyncio.Event()
+        release = asyncio.Event()
+        real_next_due_times = self.repo.next_due_times
+
+        async def blocked_next_due_times(until_ms: int, limit: int):
+            # Snapshot taken before the reminder below is inserted.
+            rows = await real_next_due_times(until_ms, limit)
+            load_started.set()
+            await release.wait()
+            return rows
+
+        self.repo.next_due_times = blocked_next_due_times
+        task = asyncio.create_task(self.service.run_loop(self._send))
+        try:
+            await asyncio.wait_for(load_started.wait(), timeout=2)
+            await self._add(4)
+            release.set()
+            await self.clock.deadline_becomes(self.start + 4 * 60)
+            await self._run_until_sent(1)
+        finally:
+            task.cancel()
+        self.assertEqual(self.lags, [0.0])
+        self.assertEqual(scheduler.loads, 1)
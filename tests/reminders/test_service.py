@@ -1,8 +1,12 @@
+import asyncio
+import csv
+import tempfile
 import unittest
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from app.reminders.service import ReminderService
+from app.reminders.time_utils import utc_iso_to_ms
 
 
 class _DummyRepository:
@@ -32,3 +36,329 @@ class ReminderServiceTest(unittest.IsolatedAsyncioTestCase):
                 due_local=due_local,
                 tz_name="Asia/Taipei",
             )
+
+
+try:
+    from app.reminders.repository import ReminderRepository
+except ModuleNotFoundError:
+    ReminderRepository = None
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class DispatchDueTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.service = ReminderService(
+            repository=self.repo,
+            default_tz="Asia/Taipei",
+            dispatch_batch_size=4,
+            dispatch_concurrency=2,
+        )
+        await self.service.init()
+        for i, room in enumerate(["!a", "!b", "!a", "!c", "!a"]):
+            await self.repo.add(
+                user_id="@alice:example.com",
+                room_id=room,
+                text=f"{room}-{i}",
+                due_at_ms=utc_iso_to_ms(f"2020-01-01T00:0{i}:00+00:00"),
+                tz="Asia/Taipei",
+                created_at_utc="2020-01-01T00:00:00+00:00",
+            )
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def test_batches_with_bounded_concurrency_and_room_order(self) -> None:
+        sent = []
+        in_flight = 0
+        peak = 0
+
+        async def send(room_id: str, message: str) -> None:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if room_id == "!c":
+                raise RuntimeError("left room")
+            sent.append(message.split("：")[1].split("（")[0])
+
+        commits_before = self.repo.db.commit_count
+        claimed = await self.service.dispatch_due(send)
+
+        self.assertEqual(claimed, 4)
+        self.assertEqual(peak, 2)
+        self.assertEqual([t for t in sent if t.startswith("!a")], ["!a-0", "!a-2"])
+        self.assertEqual(sorted(sent), ["!a-0", "!a-2", "!b-1"])
+        # One claim, one batched done update, one batched pending update.
+        self.assertEqual(self.repo.db.commit_count - commits_before, 3)
+
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual([row["text"] for row in page.items], ["!c-3", "!a-4"])
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class CoalescedDispatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.service = ReminderService(
+            repository=self.repo,
+            default_tz="Asia/Taipei",
+            dispatch_batch_size=50,
+            coalesce_window_seconds=300,
+            digest_max_chars=160,
+        )
+        await self.service.init()
+        base = utc_iso_to_ms("2020-01-01T00:00:00+00:00")
+        # Seven reminders within five minutes in !a, one more an hour later, one in !b.
+        items = [("!a", f"a{i}", base + i * 30 * 1000) for i in range(7)]
+        items += [("!a", "late", base + 3600 * 1000), ("!b", "b0", base)]
+        await self.repo.add_many(
+            user_id="@alice:example.com",
+            tz="Asia/Taipei",
+            created_at_utc="2020-01-01T00:00:00+00:00",
+            items=items,
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def test_merges_room_reminders_into_capped_digests(self) -> None:
+        sent = []
+
+        async def send(room_id: str, message: str) -> None:
+            sent.append((room_id, message))
+
+        self.assertEqual(await self.service.dispatch_due(send), 9)
+        a_messages = [m for room, m in sent if room == "!a"]
+        # The window keeps "late" apart; the size cap splits the seven into two digests.
+        self.assertEqual(len(a_messages), 3)
+        self.assertTrue(a_messages[0].startswith("⏰ 提醒（"))
+        self.assertTrue(all(len(m) <= 160 for m in a_messages[:2]))
+        merged = "\n".join(a_messages[:2])
+        self.assertEqual([f"a{i}" for i in range(7) if f" a{i}" in merged], [f"a{i}" for i in range(7)])
+        self.assertIn("⏰ 提醒：late", a_messages[2])
+        self.assertEqual([m for room, m in sent if room == "!b"][0][:6], "⏰ 提醒：b")
+
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(page.items, [])
+
+    async def test_digest_header_counts_toward_cap(self) -> None:
+        # Four lines fit in 140 characters, but not with the header.
+        self.service.digest_max_chars = 140
+        sent = []
+
+        async def send(room_id: str, message: str) -> None:
+            sent.append((room_id, message))
+
+        await self.service.dispatch_due(send)
+        digests = [m for room, m in sent if room == "!a" and "則" in m]
+        self.assertEqual([m.count("\n") for m in digests], [3, 3])
+        self.assertTrue(all(len(m) <= 140 for m in digests))
+
+    async def test_failed_digest_requeues_all_of_its_rows(self) -> None:
+        async def send(room_id: str, message: str) -> None:
+            if room_id == "!a" and "則" in message:
+                raise RuntimeError("rate limited")
+
+        await self.service.dispatch_due(send)
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(sorted(row["text"] for row in page.items), [f"a{i}" for i in range(7)])
+        self.assertTrue(all(row["status"] == "retrying" for row in page.items))
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class ImportCsvStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.service = ReminderService(repository=self.repo, default_tz="Asia/Taipei")
+        await self.service.init()
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def test_imports_in_chunks_and_reports_row_errors(self) -> None:
+        lines = ["due_local,text,room_id\n"]
+        for i in range(2500):
+            lines.append(f"2099-01-01 {i % 24:02d}:00,task {i},!r{i % 3}:x\n")
+        lines[11] = "2099-13-01 09:00,bad month\n"
+        lines[12] = "2000-01-01 09:00,in the past\n"
+        lines[13] = "2099-01-01 09:00,\n"
+        for i in range(30):
+            lines.append("only-one-column\n")
+
+        commits_before = self.repo.db.commit_count
+        result = await self.service.import_csv_stream(
+            user_id="@alice:example.com",
+            default_room_id="!default:x",
+            lines=iter(lines),
+            chunk_size=1000,
+        )
+
+        self.assertEqual(result["ok"], 2497)
+        self.assertEqual(result["failed"], 33)
+        self.assertEqual(len(result["errors"]), 20)
+        self.assertEqual(result["errors"][0], {"line": 12, "reason": "時間格式錯誤：2099-13-01 09:00"})
+        self.assertEqual(self.repo.db.commit_count - commits_before, 3)
+
+        page = await self.repo.list_active_for_user("@alice:example.com", limit=1)
+        self.assertEqual(page.items[0]["text"], "task 0")
+
+    async def test_import_csv_text_keeps_default_room(self) -> None:
+        result = await self.service.import_csv_text(
+            user_id="@alice:example.com",
+            default_room_id="!default:x",
+            csv_text="2099-02-20 09:00,繳月費\n",
+        )
+        self.assertEqual((result["ok"], result["failed"]), (1, 0))
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(page.items[0]["room_id"], "!default:x")
+
+    async def test_non_utf8_file_keeps_committed_chunks_and_reschedules(self) -> None:
+        path = f"{self.tmpdir.name}/import.csv"
+        with open(path, "wb") as f:
+            # Well past the text decoder's first read.
+            for i in range(5000):
+                f.write(f"2099-01-01 09:00,task {i}\n".encode("utf-8"))
+            f.write("2099-01-01 10:00,舊編碼\n".encode("big5"))
+        reloads = []
+        self.service.scheduler.reschedule = lambda: reloads.append(1)
+
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            result = await self.service.import_csv_stream(
+                user_id="@alice:example.com",
+                default_room_id="!default:x",
+                lines=f,
+                chunk_size=1000,
+            )
+
+        self.assertGreaterEqual(result["ok"], 1000)
+        self.assertIn("UTF-8", result["aborted"])
+        self.assertEqual(reloads, [1])
+        async with self.repo.db.read() as db:
+            cur = await db.execute("SELECT COUNT(*) FROM reminders WHERE status = 'pending'")
+            self.assertEqual((await cur.fetchone())[0], result["ok"])
+
+    async def test_csv_error_is_reported(self) -> None:
+        result = await self.service.import_csv_text(
+            user_id="@alice:example.com",
+            default_room_id="!default:x",
+            csv_text="2099-02-20 09:00,ok\n2099-02-20 10:00," + "x" * (csv.field_size_limit() + 1) + "\n",
+        )
+        self.assertEqual(result["ok"], 1)
+        self.assertIn("CSV", result["aborted"])
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class RecurringDispatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.now = utc_iso_to_ms("2026-02-20T00:30:00+00:00") / 1000
+        self.service = ReminderService(
+            repository=self.repo, default_tz="Asia/Taipei", clock=lambda: self.now
+        )
+        await self.service.init()
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def test_recurring_reminder_reschedules_same_row(self) -> None:
+        user_seq = await self.service.add_reminder(
+            user_id="@alice:example.com",
+            room_id="!a",
+            text="standup",
+            due_local="2026-02-20 09:00",
+            repeat="daily",
+            repeat_count=2,
+        )
+        sent = []
+
+        async def send(room_id: str, msg: str) -> None:
+            sent.append(msg)
+
+        self.now += 3600
+        self.assertEqual(await self.service.dispatch_due(send), 1)
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(len(page.items), 1)
+        row = page.items[0]
+        self.assertEqual(row["user_seq"], user_seq)
+        self.assertEqual(row["status"], "pending")
+        self.assertEqual(row["due_at_ms"], utc_iso_to_ms("2026-02-21T01:00:00+00:00"))
+        self.assertIn("COUNT=1", row["repeat_rule"])
+
+        self.now += 86400
+        self.assertEqual(await self.service.dispatch_due(send), 1)
+        page = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(page.items, [])
+        self.assertEqual(len(sent), 2)
+
+
+@unittest.skipIf(ReminderRepository is None, "aiosqlite not installed in test environment")
+class RetryBackoffTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        self.now = utc_iso_to_ms("2026-02-20T00:00:00+00:00") / 1000
+        self.service = ReminderService(
+            repository=self.repo,
+            poll_interval_seconds=10,
+            max_attempts=3,
+            retry_max_seconds=15,
+            jitter=lambda: 1.0,
+            clock=lambda: self.now,
+        )
+        await self.service.init()
+        for text, room in (("left room", "!gone"), ("healthy", "!ok")):
+            await self.repo.add(
+                user_id="@alice:example.com",
+                room_id=room,
+                text=text,
+                due_at_ms=int(self.now * 1000),
+                tz="Asia/Taipei",
+                created_at_utc="2026-02-19T00:00:00+00:00",
+            )
+        self.sent = []
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+        self.tmpdir.cleanup()
+
+    async def _send(self, room_id: str, message: str) -> None:
+        if room_id == "!gone":
+            raise RuntimeError("M_FORBIDDEN")
+        self.sent.append(room_id)
+
+    async def test_backs_off_then_dead_letters_and_requeues(self) -> None:
+        self.assertEqual(await self.service.dispatch_due(self._send), 2)
+        self.assertEqual(self.sent, ["!ok"])
+        # Not retried before its backoff expires.
+        self.assertEqual(await self.service.dispatch_due(self._send), 0)
+
+        for delay in (10, 15):
+            self.now += delay - 0.001
+            self.assertEqual(await self.service.dispatch_due(self._send), 0)
+            self.now += 0.001
+            self.assertEqual(await self.service.dispatch_due(self._send), 1)
+
+        page = await self.service.list_failed()
+        self.assertEqual(len(page.items), 1)
+        failed = page.items[0]
+        self.assertEqual((failed["text"], failed["attempts"]), ("left room", 3))
+        self.assertEqual(failed["last_error"], "RuntimeError: M_FORBIDDEN")
+        self.now += 3600
+        self.assertEqual(await self.service.dispatch_due(self._send), 0)
+
+        self.assertEqual(await self.service.requeue_failed([failed["id"]]), 1)
+        self.assertEqual(await self.service.dispatch_due(self._send), 1)
+        page = await self.service.list_failed()
+        self.assertEqual(page.items, [])
+        active = await self.repo.list_active_for_user("@alice:example.com")
+        self.assertEqual(active.items[0]["status"], "retrying")
@@ -1,9 +1,142 @@
+import random
+import re
 import unittest
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
-from app.reminders.time_utils import parse_local_to_utc_iso
+from app.reminders.time_utils import (
+    parse_local_to_ms,
+    parse_local_to_utc_iso,
+    parse_time_expression,
+)
+
+
+ZONES = ["Asia/Taipei", "America/New_York", "Europe/London", "Australia/Lord_Howe"]
+
+
+def _legacy_parse(payload: str, tz_name: str, now: datetime):
+    # The `!remind add` parsing that predates parse_time_expression.
+    def hour_minute(token):
+        if re.fullmatch(r"\d{1,2}", token):
+            hour, minute = int(token), 0
+        elif re.fullmatch(r"\d{1,2}:\d{2}", token):
+            hour, minute = (int(x) for x in token.split(":"))
+        else:
+            raise ValueError("invalid time token")
+        if hour > 23 or minute > 59:
+            raise ValueError("invalid time range")
+        return hour, minute
+
+    tokens = payload.split()
+    if len(tokens) < 2:
+        raise ValueError("too short")
+    local_now = now.astimezone(ZoneInfo(tz_name))
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", tokens[0]) and len(tokens) >= 3:
+        due_local, text = f"{tokens[0]} {tokens[1]}", " ".join(tokens[2:])
+    elif re.fullmatch(r"\d{1,2}-\d{1,2}", tokens[0]) and len(tokens) >= 3:
+        month, day = (int(x) for x in tokens[0].split("-"))
+        hour, minute = hour_minute(tokens[1])
+        if not 1 <= month <= 12 or not 1 <= day <= 31:
+            raise ValueError("invalid date")
+        due_local = f"{local_now.year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}"
+        text = " ".join(tokens[2:])
+    else:
+        hour, minute = hour_minute(tokens[0])
+        due_local = f"{local_now:%Y-%m-%d} {hour:02d}:{minute:02d}"
+        text = " ".join(tokens[1:])
+    dt_local = datetime.strptime(due_local, "%Y-%m-%d %H:%M").replace(tzinfo=ZoneInfo(tz_name))
+    return round(dt_local.timestamp() * 1000), text
+
+
+def _random_payload(rng: random.Random) -> str:
+    def num(lo, hi, width=0):
+        value = rng.randint(lo, hi)
+        return f"{value:0{width}d}" if width and rng.random() < 0.5 else str(value)
+
+    time_token = rng.choice(
+        [
+            lambda: num(0, 26),
+            lambda: f"{num(0, 25, 2)}:{num(0, 61, 2)}",
+            lambda: f"{num(0, 23)}:{num(0, 9)}",
+            lambda: "9am",
+        ]
+    )()
+    date_token = rng.choice(
+        [
+            lambda: f"{rng.randint(2024, 2030)}-{num(1, 13, 2)}-{num(1, 32, 2)}",
+            lambda: f"{num(0, 13)}-{num(0, 32)}",
+            lambda: f"{num(1, 12)}/{num(1, 28)}",
+            lambda: "",
+        ]
+    )()
+    text = rng.choice(["繳費", "stand up  meeting", "", "12:00 lunch", "2026-01-01"])
+    return " ".join(part for part in (date_token, time_token, text) if part)
 
 
 class TimeUtilsTest(unittest.TestCase):
     def test_asia_taipei_to_utc(self) -> None:
         utc_iso = parse_local_to_utc_iso("2026-02-20 09:00", "Asia/Taipei")
         self.assertEqual(utc_iso, "2026-02-20T01:00:00+00:00")
+
+    def test_parse_local_matches_strptime(self) -> None:
+        rng = random.Random(1)
+        for _ in range(2000):
+            tz_name = rng.choice(ZONES)
+            dt = datetime(2020, 1, 1) + timedelta(minutes=rng.randint(0, 10 * 365 * 24 * 60))
+            text = dt.strftime("%Y-%m-%d %H:%M")
+            expected = datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=ZoneInfo(tz_name))
+            self.assertEqual(
+                parse_local_to_ms(text, tz_name), round(expected.timestamp() * 1000), (text, tz_name)
+            )
+        for bad in ("2026-02-30 09:00", "2026-02-20 24:00", "2026-02-20", "02-20 09:00", ""):
+            with self.assertRaises(ValueError):
+                parse_local_to_ms(bad, "Asia/Taipei")
+
+    def test_expression_matches_legacy_parser(self) -> None:
+        rng = random.Random(2)
+        compared = 0
+        for _ in range(5000):
+            tz_name = rng.choice(ZONES)
+            now = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(
+                seconds=rng.randint(0, 4 * 365 * 86400)
+            )
+            now_ms = int(now.timestamp() * 1000)
+            payload = _random_payload(rng)
+            try:
+                expected = _legacy_parse(payload, tz_name, now)
+            except ValueError:
+                continue
+            compared += 1
+            due_ms, text = parse_time_expression(payload, tz_name, now_ms)
+            self.assertEqual((due_ms, " ".join(text.split())), expected, (payload, tz_name, now))
+        self.assertGreater(compared, 500)
+
+    def test_rejects_malformed_expressions(self) -> None:
+        for payload in ("9am 起床", "12-25 聖誕", "2026-02-20 開會", "25 x", "9:60 x", "+5y x", "明天 x"):
+            with self.assertRaises(ValueError, msg=payload):
+                parse_time_expression(payload, "Asia/Taipei", 0)
+
+    def test_relative_and_named_days(self) -> None:
+        tz_name = "America/New_York"
+        now = datetime(2026, 3, 7, 10, 15, tzinfo=ZoneInfo(tz_name))
+        now_ms = int(now.timestamp() * 1000)
+
+        due_ms, text = parse_time_expression("+30m 泡麵", tz_name, now_ms)
+        self.assertEqual((due_ms - now_ms, text), (30 * 60 * 1000, "泡麵"))
+        due_ms, _ = parse_time_expression("+2h x", tz_name, now_ms)
+        self.assertEqual(due_ms - now_ms, 2 * 3600 * 1000)
+        # DST starts overnight: +1d keeps the wall time, so only 23 hours pass.
+        due_ms, _ = parse_time_expression("+1d x", tz_name, now_ms)
+        self.assertEqual(due_ms - now_ms, 23 * 3600 * 1000)
+
+        due_ms, text = parse_time_expression("tomorrow 9 開會", tz_name, now_ms)
+        self.assertEqual(due_ms, int(datetime(2026, 3, 8, 9, tzinfo=ZoneInfo(tz_name)).timestamp() * 1000))
+        self.assertEqual(text, "開會")
+        due_ms, _ = parse_time_expression("明天 9:30 x", tz_name, now_ms)
+        self.assertEqual(
+            due_ms, int(datetime(2026, 3, 8, 9, 30, tzinfo=ZoneInfo(tz_name)).timestamp() * 1000)
+        )
+        due_ms, _ = parse_time_expression("today 18 x", tz_name, now_ms)
+        self.assertEqual(
+            due_ms, int(datetime(2026, 3, 7, 18, tzinfo=ZoneInfo(tz_name)).timestamp() * 1000)
+        )
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.config import load_config
+from app.reminders.ipc import ScheduleLink
+from app.reminders.worker import build_reminder_service
+
+
+class ProcessModeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {"CONFIG_YAML": "", "DATA_PATH": self.tmp.name, "REMINDER_MODE": "process"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            cfg = load_config()
+        self.now = time.time()
+        # Two services on one reminders.db, as in the bot and worker processes.
+        self.main = build_reminder_service(
+            cfg,
+            scheduler=ScheduleLink(os.path.join(self.tmp.name, "reminders.sock")),
+            clock=lambda: self.now,
+        )
+        self.worker = build_reminder_service(cfg, clock=lambda: self.now)
+        await self.main.init()
+        await self.worker.init()
+
+    async def asyncTearDown(self) -> None:
+        await self.main.close()
+        await self.worker.close()
+        self.tmp.cleanup()
+
+    async def test_main_process_list_sees_worker_sends(self) -> None:
+        await self.main.add_reminder(
+            user_id="@alice:x",
+            room_id="!room:x",
+            text="開會",
+            due_at_ms=int((self.now + 60) * 1000),
+        )
+        page = await self.main.list_reminders(user_id="@alice:x")
+        self.assertEqual(len(page.items), 1)
+
+        sent = []
+
+        async def send(room_id: str, message: str) -> None:
+            sent.append(room_id)
+
+        self.now += 120
+        await self.worker.dispatch_due(send)
+        self.assertEqual(sent, ["!room:x"])
+        page = await self.main.list_reminders(user_id="@alice:x")
+        self.assertEqual(page.items, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from app.cache import QueryCache
+
+
+class QueryCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_counts_hits_and_misses(self) -> None:
+        cache = QueryCache(max_entries=4)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return ["row"]
+
+        self.assertEqual(await cache.get_or_load("todo", ("list",), loader), ["row"])
+        self.assertEqual(await cache.get_or_load("todo", ("list",), loader), ["row"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    async def test_evicts_least_recently_used(self) -> None:
+        cache = QueryCache(max_entries=2)
+
+        async def value(v):
+            return v
+
+        await cache.get_or_load("u", "a", lambda: value(1))
+        await cache.get_or_load("u", "b", lambda: value(2))
+        await cache.get_or_load("u", "a", lambda: value(1))
+        await cache.get_or_load("u", "c", lambda: value(3))
+
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(await cache.get_or_load("u", "a", lambda: value(-1)), 1)
+        self.assertEqual(await cache.get_or_load("u", "b", lambda: value(-2)), -2)
+
+    async def test_invalidate_only_drops_scope(self) -> None:
+        cache = QueryCache()
+
+        async def value(v):
+            return v
+
+        await cache.get_or_load("@alice", "list", lambda: value("alice"))
+        await cache.get_or_load("@bob", "list", lambda: value("bob"))
+        cache.invalidate("@alice")
+
+        self.assertEqual(await cache.get_or_load("@alice", "list", lambda: value("new")), "new")
+        self.assertEqual(await cache.get_or_load("@bob", "list", lambda: value("new")), "bob")
+
+    async def test_write_during_load_is_not_cached(self) -> None:
+        cache = QueryCache()
+        release = asyncio.Event()
+
+        async def slow_loader():
+            await release.wait()
+            return "stale"
+
+        task = asyncio.create_task(cache.get_or_load("todo", "list", slow_loader))
+        await asyncio.sleep(0)
+        cache.invalidate("todo")
+        release.set()
+        self.assertEqual(await task, "stale")
+
+        async def fresh():
+            return "fresh"
+
+        self.assertEqual(await cache.get_or_load("todo", "list", fresh), "fresh")
+
+    async def test_ttl_reloads_expired_entries(self) -> None:
+        now = [100.0]
+        cache = QueryCache(ttl_sec=5, clock=lambda: now[0])
+        calls = []
+
+        async def loader():
+            calls.append(now[0])
+            return len(calls)
+
+        self.assertEqual(await cache.get_or_load("u", "list", loader), 1)
+        now[0] = 104.9
+        self.assertEqual(await cache.get_or_load("u", "list", loader), 1)
+        now[0] = 105.0
+        self.assertEqual(await cache.get_or_load("u", "list", loader), 2)
+        self.assertEqual(calls, [100.0, 105.0])
+
@@ -0,0 +1,102 @@
+import unittest
+from types import SimpleNamespace
+
+from app.commands.registry import (
+    ACL_ADMIN,
+    ACL_ANYONE,
+    ACL_PUBLIC,
+    CommandRegistry,
+    CommandStats,
+    Invocation,
+)
+
+
+class _FakeBot:
+    def __init__(self, allow_public: bool = False):
+        self.cfg = SimpleNamespace(allow_todo_public=allow_public)
+        self.sent = []
+
+    def _is_admin(self, user_id: str, room_id=None) -> bool:
+        return user_id == "@admin:x"
+
+    def _allow_public(self, room_id=None) -> bool:
+        return self.cfg.allow_todo_public
+
+    async def _send_text(self, room_id: str, message: str) -> None:
+        self.sent.append(message)
+
+
+class CommandRegistryTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.registry = CommandRegistry(clock=lambda: self.now)
+        self.calls = []
+
+        @self.registry.command("status", acl=ACL_ADMIN)
+        async def status(bot, inv: Invocation) -> None:
+            self.calls.append(("status", inv.args))
+            self.now += 0.003
+
+        @self.registry.command("todo", acl=ACL_PUBLIC, usage="用法: !todo ...", min_args=1)
+        async def todo(bot, inv: Invocation) -> None:
+            self.calls.append(("todo", inv.args, inv.rest(1)))
+
+        @self.registry.command("ping", acl=ACL_ANYONE)
+        async def ping(bot, inv: Invocation) -> None:
+            self.now += 0.02
+            raise RuntimeError("boom")
+
+    async def test_dispatch_matches_whole_first_token(self) -> None:
+        bot = _FakeBot()
+        self.assertFalse(await self.registry.dispatch(bot, "!r", "@admin:x", "!statusfoo"))
+        self.assertFalse(await self.registry.dispatch(bot, "!r", "@admin:x", "status"))
+        self.assertTrue(await self.registry.dispatch(bot, "!r", "@admin:x", "!status  now"))
+        self.assertTrue(
+            await self.registry.dispatch(bot, "!r", "@admin:x", "!todo add  買 牛奶\n明天")
+        )
+        self.assertEqual(
+            self.calls,
+            [("status", ["now"]), ("todo", ["add", "買", "牛奶", "明天"], "買 牛奶\n明天")],
+        )
+
+    async def test_acl_and_argument_spec(self) -> None:
+        bot = _FakeBot(allow_public=False)
+        await self.registry.dispatch(bot, "!r", "@user:x", "!status")
+        await self.registry.dispatch(bot, "!r", "@user:x", "!todo list")
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.registry.stats()["!status"].denied, 1)
+
+        bot = _FakeBot(allow_public=True)
+        await self.registry.dispatch(bot, "!r", "@user:x", "!status")
+        await self.registry.dispatch(bot, "!r", "@user:x", "!todo")
+        await self.registry.dispatch(bot, "!r", "@user:x", "!todo list")
+        self.assertEqual(self.calls, [("todo", ["list"], "")])
+        self.assertEqual(bot.sent, ["用法: !todo ..."])
+
+    async def test_records_calls_errors_and_latency(self) -> None:
+        bot = _FakeBot()
+        for _ in range(3):
+            await self.registry.dispatch(bot, "!r", "@admin:x", "!status")
+        with self.assertRaises(RuntimeError):
+            await self.registry.dispatch(bot, "!r", "@user:x", "!ping")
+
+        stats = self.registry.stats()
+        self.assertEqual((stats["!status"].calls, stats["!status"].errors), (3, 0))
+        self.assertEqual(stats["!status"].percentile(0.95), 5)
+        self.assertEqual((stats["!ping"].calls, stats["!ping"].errors), (1, 1))
+        self.assertEqual(stats["!ping"].percentile(0.5), 25)
+        self.assertAlmostEqual(stats["!ping"].max_ms, 20)
+
+    def test_percentile_uses_bucket_upper_bounds(self) -> None:
+        stats = CommandStats()
+        for elapsed_ms in (1, 4, 7, 30, 30, 30, 30, 30, 30, 12000):
+            stats.observe(elapsed_ms)
+        self.assertEqual(stats.percentile(0.1), 5)
+        self.assertEqual(stats.percentile(0.3), 10)
+        self.assertEqual(stats.percentile(0.5), 50)
+        self.assertEqual(stats.percentile(0.99), 12000)
+        self.assertIsNone(CommandStats().percentile(0.5))
+
+    def test_rejects_duplicate_names(self) -> None:
+        with self.assertRaises(ValueError):
+            self.registry.command("status")(lambda bot, inv: None)
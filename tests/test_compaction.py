@@ -0,0 +1,110 @@
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+
+from app.reminders.time_utils import utc_iso_to_ms
+
+try:
+    from app.compaction import Compactor
+    from app.reminders.repository import ReminderRepository
+    from app.storage import Storage
+except ModuleNotFoundError:
+    Compactor = None
+
+
+DAY_MS = 24 * 3600 * 1000
+
+
+@unittest.skipIf(Compactor is None, "aiosqlite not installed in test environment")
+class CompactorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = Storage(f"{self.tmpdir.name}/bot.db")
+        self.repo = ReminderRepository(f"{self.tmpdir.name}/reminders.db")
+        await self.storage.init()
+        await self.repo.init()
+        self.compactor = Compactor(
+            storage=self.storage, repository=self.repo, retention_days=7, batch_size=2
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.storage.close()
+        await self.repo.close()
+        self.tmpdir.cleanup()
+
+    async def _add_reminder(self, due_at_utc: str, repeat_rule=None) -> int:
+        return await self.repo.add(
+            user_id="@alice:example.com",
+            room_id="!room:example.com",
+            text="r",
+            due_at_ms=utc_iso_to_ms(due_at_utc),
+            tz="Asia/Taipei",
+            created_at_utc="2020-01-01T00:00:00+00:00",
+            repeat_rule=repeat_rule,
+        )
+
+    async def test_moves_only_old_finished_rows_in_batches(self) -> None:
+        now_ms = int(time.time() * 1000)
+        for i in range(5):
+            todo_id = await self.storage.todo_add(f"old {i}", 0)
+            await self.storage.todo_done(todo_id, now_ms - 30 * DAY_MS)
+        recent = await self.storage.todo_add("recent", 0)
+        await self.storage.todo_done(recent, now_ms)
+        await self.storage.todo_add("open", 0)
+
+        cancelled_seq = await self._add_reminder("2020-01-02T00:00:00+00:00")
+        await self.repo.cancel_many(
+            "@alice:example.com", [cancelled_seq], cancelled_at_utc="2020-01-01T12:00:00+00:00"
+        )
+        await self._add_reminder("2020-01-03T00:00:00+00:00")
+
+        report = await self.compactor.report()
+        self.assertEqual(report["todo"]["eligible"], 5)
+        self.assertEqual(report["reminders"]["eligible"], 1)
+
+        moved = await self.compactor.run_once()
+        self.assertEqual(moved, {"todo": 5, "reminders": 1})
+
+        page = await self.storage.todo_list()
+        self.assertEqual([row[1] for row in page.items], ["recent", "open"])
+        report = await self.compactor.report()
+        self.assertEqual(report["todo"], {"hot": 2, "eligible": 0, "archived": 5})
+        self.assertEqual(report["reminders"], {"hot": 1, "eligible": 0, "archived": 1})
+
+    async def test_cancelled_rows_age_from_cancel_time(self) -> None:
+        now_ms = int(time.time() * 1000)
+
+        def iso(ms: int) -> str:
+            return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat()
+
+        self.compactor = Compactor(
+            storage=self.storage, repository=self.repo, retention_days=28, batch_size=2
+        )
+        # Monthly, last fired 29 days ago, cancelled just now: kept.
+        monthly_seq = await self._add_reminder(iso(now_ms - 29 * DAY_MS), "monthly")
+        claimed = await self.repo.claim_due(now_ms - 29 * DAY_MS)
+        self.assertEqual(len(claimed), 1)
+        await self.repo.mark_done_many(
+            [],
+            iso(now_ms - 29 * DAY_MS),
+            reschedule=[(claimed[0]["id"], now_ms + DAY_MS, "monthly")],
+        )
+        await self.repo.cancel(user_seq=monthly_seq, user_id="@alice:example.com")
+        # Due next year, cancelled a month ago: eligible.
+        far_seq = await self._add_reminder(iso(now_ms + 365 * DAY_MS))
+        await self.repo.cancel_many(
+            "@alice:example.com", [far_seq], cancelled_at_utc=iso(now_ms - 30 * DAY_MS)
+        )
+        # Due a month ago, cancelled just now: kept.
+        recent_seq = await self._add_reminder(iso(now_ms - 30 * DAY_MS))
+        await self.repo.cancel(user_seq=recent_seq, user_id="@alice:example.com")
+
+        moved = await self.compactor.run_once()
+        self.assertEqual(moved["reminders"], 1)
+        async with self.repo.db.read() as db:
+            cur = await db.execute("SELECT user_seq, cancelled_at_utc FROM reminders_archive")
+            rows = await cur.fetchall()
+        self.assertEqual([row["user_seq"] for row in rows], [far_seq])
+        self.assertEqual(rows[0]["cancelled_at_utc"], iso(now_ms - 30 * DAY_MS))
+
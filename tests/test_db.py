@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import tempfile
+import unittest
+
+try:
+    from app.db import Database
+except ModuleNotFoundError:
+    Database = None
+
+
+@unittest.skipIf(Database is None, "aiosqlite not installed in test environment")
+class DatabaseTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(f"{self.tmpdir.name}/test.db", readers=2)
+        async with self.db.write() as conn:
+            await conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        self.tmpdir.cleanup()
+
+    async def test_uses_wal_and_normal_sync(self) -> None:
+        async with self.db.read() as conn:
+            cur = await conn.execute("PRAGMA journal_mode")
+            self.assertEqual((await cur.fetchone())[0], "wal")
+            cur = await conn.execute("PRAGMA synchronous")
+            self.assertEqual((await cur.fetchone())[0], 1)
+
+    async def test_readers_see_committed_writes(self) -> None:
+        async with self.db.write() as conn:
+            await conn.execute("INSERT INTO t (v) VALUES ('a')")
+        for _ in range(3):
+            async with self.db.read() as conn:
+                cur = await conn.execute("SELECT v FROM t")
+                self.assertEqual(await cur.fetchall(), [("a",)])
+
+    async def test_write_rolls_back_on_error(self) -> None:
+        with self.assertRaises(RuntimeError):
+            async with self.db.write() as conn:
+                await conn.execute("INSERT INTO t (v) VALUES ('lost')")
+                raise RuntimeError("boom")
+        async with self.db.read() as conn:
+            cur = await conn.execute("SELECT COUNT(*) FROM t")
+            self.assertEqual((await cur.fetchone())[0], 0)
+
+    async def test_reopens_after_close(self) -> None:
+        await self.db.close()
+        self.assertFalse(self.db.is_open)
+        async with self.db.read() as conn:
+            cur = await conn.execute("SELECT COUNT(*) FROM t")
+            self.assertEqual((await cur.fetchone())[0], 0)
+        self.assertTrue(self.db.is_open)
+
+
+@unittest.skipIf(Database is None, "aiosqlite not installed in test environment")
+class GroupCommitTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(
+            f"{self.tmpdir.name}/test.db",
+            synchronous="FULL",
+            group_commit_window_ms=50,
+            group_commit_max_items=4,
+        )
+        async with self.db.write() as conn:
+            await conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT UNIQUE)")
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        self.tmpdir.cleanup()
+
+    def _insert(self, value: str):
+        async def op(conn):
+            cur = await conn.execute("INSERT INTO t (v) VALUES (?)", (value,))
+            return cur.lastrowid
+
+        return op
+
+    async def test_burst_within_window_shares_one_commit(self) -> None:
+        before = self.db.commit_count
+        ids = await asyncio.gather(*(self.db.submit(self._insert(v)) for v in "abc"))
+        self.assertEqual(sorted(ids), [1, 2, 3])
+        self.assertEqual(self.db.commit_count - before, 1)
+
+    async def test_full_batches_commit_without_waiting(self) -> None:
+        before = self.db.commit_count
+        ids = await asyncio.gather(*(self.db.submit(self._insert(str(i))) for i in range(10)))
+        self.assertEqual(sorted(ids), list(range(1, 11)))
+        self.assertEqual(self.db.commit_count - before, 3)
+
+    async def test_failing_write_only_fails_its_caller(self) -> None:
+        await self.db.submit(self._insert("dup"))
+        results = await asyncio.gather(
+            self.db.submit(self._insert("x")),
+            self.db.submit(self._insert("dup")),
+            self.db.submit(self._insert("y")),
+            return_exceptions=True,
+        )
+        self.assertIsInstance(results[1], sqlite3.IntegrityError)
+        async with self.db.read() as conn:
+            cur = await conn.execute("SELECT v FROM t ORDER BY id")
+            self.assertEqual([row[0] for row in await cur.fetchall()], ["dup", "x", "y"])
+
+    async def test_disabled_mode_commits_each_write(self) -> None:
+        self.db.group_commit_window_ms = 0
+        before = self.db.commit_count
+        await asyncio.gather(*(self.db.submit(self._insert(v)) for v in "abc"))
+        self.assertEqual(self.db.commit_count - before, 3)
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+from app.dispatch import RoomDispatcher
+
+
+class RoomDispatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self) -> None:
+        await self.dispatcher.close()
+
+    async def test_keeps_order_within_room(self) -> None:
+        self.dispatcher = RoomDispatcher(workers=4)
+        self.dispatcher.start()
+        seen = []
+
+        def job(room: str, n: int):
+            async def run() -> None:
+                # Later jobs finish faster; order must still hold per room.
+                await asyncio.sleep(0.01 * (5 - n))
+                seen.append((room, n))
+
+            return run
+
+        for n in range(5):
+            for room in ("!a", "!b"):
+                self.dispatcher.submit(room, job(room, n))
+        await self.dispatcher.join()
+
+        for room in ("!a", "!b"):
+            self.assertEqual([n for r, n in seen if r == room], list(range(5)))
+        self.assertEqual(self.dispatcher.depth(), 0)
+
+    async def test_slow_room_does_not_block_others(self) -> None:
+        self.dispatcher = RoomDispatcher(workers=2)
+        self.dispatcher.start()
+        release = asyncio.Event()
+        done = asyncio.Event()
+
+        async def slow() -> None:
+            await release.wait()
+
+        async def fast() -> None:
+            done.set()
+
+        self.dispatcher.submit("!slow", slow)
+        self.dispatcher.submit("!slow", fast)
+        self.dispatcher.submit("!fast", fast)
+        await asyncio.wait_for(done.wait(), 1)
+        self.assertEqual(self.dispatcher.depth("!slow"), 1)
+        release.set()
+        await self.dispatcher.join()
+
+    async def test_full_queue_drops_oldest(self) -> None:
+        self.dispatcher = RoomDispatcher(workers=1, room_queue_max=3)
+        seen = []
+
+        def job(n: int):
+            async def run() -> None:
+                seen.append(n)
+
+            return run
+
+        results = [self.dispatcher.submit("!a", job(n)) for n in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(self.dispatcher.depth("!a"), 3)
+
+        self.dispatcher.start()
+        await self.dispatcher.join()
+        self.assertEqual(seen, [2, 3, 4])
+        depth, stats = self.dispatcher.stats()["!a"]
+        self.assertEqual((depth, stats.dropped, stats.processed, stats.peak_depth), (0, 2, 3, 3))
+
+    async def test_failing_job_is_counted_and_queue_continues(self) -> None:
+        self.dispatcher = RoomDispatcher(workers=1)
+        self.dispatcher.start()
+        seen = []
+
+        async def boom() -> None:
+            raise RuntimeError("boom")
+
+        async def ok() -> None:
+            seen.append("ok")
+
+        self.dispatcher.submit("!a", boom)
+        self.dispatcher.submit("!a", ok)
+        with self.assertLogs("matrix-bot.dispatch", level="ERROR"):
+            await self.dispatcher.join()
+        self.assertEqual(seen, ["ok"])
+        self.assertEqual(self.dispatcher.stats()["!a"][1].errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from app.health import HealthProber
+
+
+class HealthProberTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.requests = 0
+        self.status = 200
+
+        async def versions(request: web.Request) -> web.Response:
+            self.requests += 1
+            return web.json_response({"versions": ["v1.11"]}, status=self.status)
+
+        app = web.Application()
+        app.router.add_get("/_matrix/client/versions", versions)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.session = aiohttp.ClientSession()
+        self.now = 1000.0
+        self.prober = HealthProber(
+            f"http://127.0.0.1:{port}/",
+            session=self.session,
+            ttl_sec=60,
+            window=4,
+            clock=lambda: self.now,
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.session.close()
+        await self.runner.cleanup()
+
+    async def test_current_is_served_from_cache_within_ttl(self) -> None:
+        snap = await self.prober.current()
+        self.assertEqual((snap.status, snap.samples, snap.successes), ("OK", 1, 1))
+        self.now += 30
+        snap = await self.prober.current()
+        self.assertEqual(self.requests, 1)
+        self.assertEqual(snap.age_sec, 30)
+        self.now += 31
+        await self.prober.current()
+        self.assertEqual(self.requests, 2)
+
+    async def test_concurrent_callers_share_one_probe(self) -> None:
+        await asyncio.gather(*(self.prober.current() for _ in range(5)))
+        self.assertEqual(self.requests, 1)
+
+    async def test_rolling_success_rate_and_percentiles(self) -> None:
+        await self.prober.probe()
+        self.status = 502
+        self.assertEqual(await self.prober.probe(), "HTTP 502")
+        self.status = 200
+        for _ in range(3):
+            await self.prober.probe()
+        snap = self.prober.snapshot()
+        # Window of 4: the first success has rolled out.
+        self.assertEqual((snap.samples, snap.successes), (4, 3))
+        self.assertAlmostEqual(snap.success_rate, 0.75)
+        # The fake clock does not advance during a probe.
+        self.assertEqual((snap.p50_ms, snap.p95_ms, snap.latency_ms), (0, 0, 0))
+
+    async def test_unreachable_server_reports_failed(self) -> None:
+        await self.runner.cleanup()
+        snap = await self.prober.current()
+        self.assertEqual((snap.status, snap.latency_ms, snap.p50_ms), ("FAILED", None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
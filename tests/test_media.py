@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from app.media import MediaDownloadError, MediaTooLarge, download_to_file
+
+
+class DownloadToFileTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.body = b"a,b\n" * 100
+
+        async def sized(request: web.Request) -> web.Response:
+            return web.Response(body=self.body)
+
+        async def streamed(request: web.Request) -> web.StreamResponse:
+            # No Content-Length, like a forged or missing upload size.
+            resp = web.StreamResponse()
+            resp.enable_chunked_encoding()
+            await resp.prepare(request)
+            for _ in range(100):
+                await resp.write(b"x" * 1024)
+            await resp.write_eof()
+            return resp
+
+        async def missing(request: web.Request) -> web.Response:
+            return web.Response(status=404)
+
+        self.limited = 2
+
+        async def limited(request: web.Request) -> web.Response:
+            if self.limited:
+                self.limited -= 1
+                return web.json_response(
+                    {"errcode": "M_LIMIT_EXCEEDED", "retry_after_ms": 1500}, status=429
+                )
+            return web.Response(body=self.body)
+
+        app = web.Application()
+        app.router.add_get("/sized", sized)
+        app.router.add_get("/streamed", streamed)
+        app.router.add_get("/missing", missing)
+        app.router.add_get("/limited", limited)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        self.session = aiohttp.ClientSession()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "import.csv")
+
+    async def asyncTearDown(self) -> None:
+        await self.session.close()
+        await self.runner.cleanup()
+        self.tmp.cleanup()
+
+    async def test_downloads_within_limit(self) -> None:
+        written = await download_to_file(
+            self.session, self.base + "/sized", self.path, max_bytes=len(self.body)
+        )
+        self.assertEqual(written, len(self.body))
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.body)
+
+    async def test_refuses_large_content_length(self) -> None:
+        with self.assertRaises(MediaTooLarge):
+            await download_to_file(self.session, self.base + "/sized", self.path, max_bytes=10)
+
+    async def test_stops_streaming_past_limit(self) -> None:
+        with self.assertRaises(MediaTooLarge):
+            await download_to_file(
+                self.session, self.base + "/streamed", self.path, max_bytes=8 * 1024
+            )
+        self.assertLessEqual(os.path.getsize(self.path), 8 * 1024)
+
+    async def test_http_error(self) -> None:
+        with self.assertRaises(MediaDownloadError):
+            await download_to_file(self.session, self.base + "/missing", self.path, max_bytes=10)
+
+    async def test_retries_after_rate_limit(self) -> None:
+        slept = []
+
+        async def sleep(seconds: float) -> None:
+            slept.append(seconds)
+
+        written = await download_to_file(
+            self.session, self.base + "/limited", self.path, max_bytes=10_000, sleep=sleep
+        )
+        self.assertEqual(written, len(self.body))
+        self.assertEqual(slept, [1.5, 1.5])
+
+    async def test_gives_up_after_max_rate_limited(self) -> None:
+        async def sleep(seconds: float) -> None:
+            pass
+
+        with self.assertRaises(MediaDownloadError):
+            await download_to_file(
+                self.session,
+                self.base + "/limited",
+                self.path,
+                max_bytes=10_000,
+                max_rate_limited=1,
+                sleep=sleep,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
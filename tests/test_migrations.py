@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+
+try:
+    from app.db import Database
+    from app.migrations import Migration, migrate, sql
+except ModuleNotFoundError:
+    Database = None
+
+
+@unittest.skipIf(Database is None, "aiosqlite not installed in test environment")
+class MigrateTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(f"{self.tmpdir.name}/test.db")
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+        self.tmpdir.cleanup()
+
+    async def _tables(self):
+        async with self.db.read() as conn:
+            cur = await conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+            )
+            return [row[0] for row in await cur.fetchall()]
+
+    async def test_applies_pending_steps_once(self) -> None:
+        steps = [
+            Migration(1, "a", sql("CREATE TABLE a (id INTEGER PRIMARY KEY)")),
+            Migration(2, "b", sql("CREATE TABLE b (id INTEGER PRIMARY KEY)")),
+        ]
+        self.assertEqual(await migrate(self.db, steps[:1]), 1)
+        self.assertEqual(await migrate(self.db, steps), 2)
+        self.assertEqual(await migrate(self.db, steps), 2)
+        self.assertEqual(await self._tables(), ["a", "b"])
+
+    async def test_failed_step_rolls_back_and_keeps_version(self) -> None:
+        steps = [
+            Migration(1, "a", sql("CREATE TABLE a (id INTEGER PRIMARY KEY)")),
+            Migration(2, "broken", sql("CREATE TABLE c (id INTEGER)", "NOT SQL")),
+        ]
+        with self.assertRaises(Exception):
+            await migrate(self.db, steps)
+        self.assertEqual(await self._tables(), ["a"])
+        async with self.db.read() as conn:
+            cur = await conn.execute("PRAGMA user_version")
+            self.assertEqual((await cur.fetchone())[0], 1)
+
+    async def test_rejects_unordered_versions(self) -> None:
+        noop = sql()
+        with self.assertRaises(ValueError):
+            await migrate(self.db, [Migration(2, "x", noop), Migration(1, "y", noop)])
+
+    async def test_enables_incremental_vacuum_and_maintenance_runs(self) -> None:
+        await migrate(self.db, [Migration(1, "a", sql("CREATE TABLE a (v TEXT)"))])
+        async with self.db.autocommit() as conn:
+            cur = await conn.execute("PRAGMA auto_vacuum")
+            self.assertEqual((await cur.fetchone())[0], 2)
+        await self.db.run_maintenance()
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+
+from nio import RoomSendError, RoomSendResponse
+
+from app.outbox import (
+    PRIORITY_ALERT,
+    PRIORITY_REMINDER,
+    PRIORITY_REPLY,
+    Outbox,
+    SendError,
+)
+
+
+class _FakeClient:
+    def __init__(self):
+        self.sent = []
+        self.responses = []
+        self.gate = None
+
+    async def room_send(self, room_id, message_type, content):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.responses:
+            resp = self.responses.pop(0)
+            if resp is not None:
+                return resp
+        self.sent.append((room_id, content["body"]))
+        return RoomSendResponse(f"$e{len(self.sent)}", room_id)
+
+
+class OutboxTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self) -> None:
+        await self.outbox.close()
+
+    async def test_resolves_with_event_id(self) -> None:
+        client = _FakeClient()
+        self.outbox = Outbox(client)
+        self.assertEqual(await self.outbox.send_text("!a", "hi"), "$e1")
+        self.assertEqual(client.sent, [("!a", "hi")])
+
+    async def test_higher_priority_goes_first_and_room_order_is_kept(self) -> None:
+        client = _FakeClient()
+        client.gate = asyncio.Event()
+        self.outbox = Outbox(client, concurrency=1)
+        sends = [
+            asyncio.create_task(self.outbox.send_text("!a", "r1", priority=PRIORITY_REMINDER))
+        ]
+        await asyncio.sleep(0)
+        for room, body, priority in [
+            ("!b", "r2", PRIORITY_REMINDER),
+            ("!b", "reply", PRIORITY_REPLY),
+            ("!c", "alert", PRIORITY_ALERT),
+        ]:
+            sends.append(asyncio.create_task(self.outbox.send_text(room, body, priority=priority)))
+        await asyncio.sleep(0.01)
+        client.gate.set()
+        await asyncio.gather(*sends)
+        # r1 was already in flight; then the alert, and !b's reply overtakes
+        # the reminder queued before it.
+        self.assertEqual([b for _, b in client.sent], ["r1", "alert", "reply", "r2"])
+
+    async def test_honors_retry_after_on_limit_exceeded(self) -> None:
+        client = _FakeClient()
+        client.responses = [RoomSendError("slow down", "M_LIMIT_EXCEEDED", retry_after_ms=100)]
+        self.outbox = Outbox(client)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await self.outbox.send_text("!a", "hi", priority=PRIORITY_REMINDER)
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+        self.assertEqual(client.sent, [("!a", "hi")])
+        self.assertEqual(self.outbox.stats.rate_limited, 1)
+
+    async def test_other_errors_fail_the_caller(self) -> None:
+        client = _FakeClient()
+        client.responses = [RoomSendError("nope", "M_FORBIDDEN")]
+        self.outbox = Outbox(client)
+        with self.assertRaises(SendError):
+            await self.outbox.send_text("!a", "hi")
+        self.assertEqual(self.outbox.stats.failed, 1)
+        self.assertEqual(await self.outbox.send_text("!a", "again"), "$e1")
+
+    async def test_room_token_bucket_paces_sends(self) -> None:
+        client = _FakeClient()
+        self.outbox = Outbox(client, room_rate=20, room_burst=1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(self.outbox.send_text("!a", str(i)) for i in range(3)))
+        # One token up front, then one every 50 ms.
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+        self.assertEqual([b for _, b in client.sent], ["0", "1", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
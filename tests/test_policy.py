@@ -0,0 +1,50 @@
+import dataclasses
+import os
+import unittest
+from unittest import mock
+
+from app.config import load_config
+from app.policy import compile_policy
+
+
+class PolicyTest(unittest.TestCase):
+    def _config(self, **env):
+        with mock.patch.dict(os.environ, {"CONFIG_YAML": "", **env}, clear=True):
+            return load_config()
+
+    def test_compiles_frozenset_acls(self) -> None:
+        policy = compile_policy(
+            self._config(ALLOWED_ROOMS="!a:x, !b:x", ADMIN_USERS="@admin:x")
+        )
+        self.assertEqual(policy.allowed_rooms, frozenset({"!a:x", "!b:x"}))
+        self.assertTrue(policy.room_allowed("!b:x"))
+        self.assertFalse(policy.room_allowed("!c:x"))
+        self.assertTrue(policy.is_admin("@admin:x", "!a:x"))
+        self.assertFalse(policy.allow_public("!a:x"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            policy.allow_todo_public = True
+        with self.assertRaises(TypeError):
+            policy.room_overrides["!a:x"] = None
+
+    def test_room_overrides(self) -> None:
+        policy = compile_policy(
+            self._config(
+                ADMIN_USERS="@admin:x",
+                ALLOW_TODO_PUBLIC="true",
+                ROOM_OVERRIDES='{"!a:x": {"ALLOW_TODO_PUBLIC": false, "ADMIN_USERS": ["@mod:x"]}}',
+            )
+        )
+        self.assertFalse(policy.allow_public("!a:x"))
+        self.assertTrue(policy.allow_public("!b:x"))
+        self.assertTrue(policy.is_admin("@mod:x", "!a:x"))
+        self.assertFalse(policy.is_admin("@mod:x", "!b:x"))
+        self.assertFalse(policy.is_admin("@mod:x"))
+
+    def test_rejects_unknown_override_keys(self) -> None:
+        cfg = self._config(ROOM_OVERRIDES='{"!a:x": {"CPU_THRESHOLD": 10}}')
+        with self.assertRaises(ValueError):
+            compile_policy(cfg)
+
+
+if __name__ == "__main__":
+    unittest.main()
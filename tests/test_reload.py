@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.config import load_config
+from app.reload import ConfigReloader
+
+
+class ConfigReloaderTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "config.yaml")
+        self._write("ALLOWED_ROOMS: '!a:x'\nCPU_THRESHOLD: 85\n")
+        self.env = mock.patch.dict(os.environ, {"CONFIG_YAML": self.path}, clear=True)
+        self.env.start()
+        self.applied = []
+
+        async def apply(cfg, policy, changed) -> None:
+            self.applied.append((policy, changed))
+
+        self.reloader = ConfigReloader(load_config(), apply, interval_sec=0.01)
+
+    async def asyncTearDown(self) -> None:
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def _write(self, text: str) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+        # Make sure the mtime moves even on coarse filesystem clocks.
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    async def _until(self, predicate) -> None:
+        for _ in range(200):
+            if predicate():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("condition not reached")
+
+    async def test_mtime_change_applies_hot_fields_only(self) -> None:
+        task = asyncio.create_task(self.reloader.run())
+        try:
+            self._write("ALLOWED_ROOMS: '!a:x,!b:x'\nCPU_THRESHOLD: 70\nDATA_PATH: /elsewhere\n")
+            with self.assertLogs("matrix-bot.config", level="WARNING") as logs:
+                await self._until(lambda: self.applied)
+        finally:
+            task.cancel()
+        policy, changed = self.applied[0]
+        self.assertEqual(sorted(changed), ["allowed_rooms", "cpu_threshold"])
+        self.assertTrue(policy.room_allowed("!b:x"))
+        self.assertEqual(self.reloader.current.cpu_threshold, 70)
+        self.assertEqual(self.reloader.current.data_path, "./data")
+        self.assertIn("data_path", logs.output[0])
+
+    async def test_invalid_config_keeps_current(self) -> None:
+        self._write("ROOM_OVERRIDES: [1, 2]\n")
+        with self.assertLogs("matrix-bot.config", level="ERROR"):
+            self.assertFalse(await self.reloader.reload())
+        self.assertEqual(self.applied, [])
+        self.assertEqual(self.reloader.current.allowed_rooms, ["!a:x"])
+
+    async def test_bad_timezone_keeps_current_and_loop_survives(self) -> None:
+        task = asyncio.create_task(self.reloader.run())
+        try:
+            with self.assertLogs("matrix-bot.config", level="ERROR"):
+                self._write("ALLOWED_ROOMS: '!a:x'\nTIMEZONE: Not/AZone\n")
+                await asyncio.sleep(0.1)
+            self.assertEqual(self.applied, [])
+            self.assertEqual(self.reloader.current.timezone, "Asia/Taipei")
+            # The watcher is still running and picks up the next good edit.
+            self._write("ALLOWED_ROOMS: '!a:x'\nTIMEZONE: Asia/Tokyo\n")
+            await self._until(lambda: self.applied)
+        finally:
+            task.cancel()
+        self.assertEqual(self.applied[0][1], ["timezone"])
+        self.assertEqual(self.reloader.current.timezone, "Asia/Tokyo")
+
+    async def test_failing_apply_keeps_current(self) -> None:
+        async def apply(cfg, policy, changed) -> None:
+            raise RuntimeError("boom")
+
+        self.reloader.apply = apply
+        self._write("ALLOWED_ROOMS: '!b:x'\n")
+        with self.assertLogs("matrix-bot.config", level="ERROR"):
+            self.assertFalse(await self.reloader.reload())
+        self.assertEqual(self.reloader.current.allowed_rooms, ["!a:x"])
+
+    async def test_request_triggers_reload_without_mtime_watch(self) -> None:
+        reloader = ConfigReloader(self.reloader.current, self.reloader.apply, path="")
+        task = asyncio.create_task(reloader.run())
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write("ALLOWED_ROOMS: '!c:x'\n")
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.applied, [])
+            reloader.request()
+            await self._until(lambda: self.applied)
+        finally:
+            task.cancel()
+        self.assertEqual(self.applied[0][1], ["allowed_rooms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+
+from app.startup import StartupReport
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StartupReportTest(unittest.IsolatedAsyncioTestCase):
+    async def test_overlapping_phases_keep_their_offsets(self) -> None:
+        clock = _Clock()
+        report = StartupReport(clock)
+
+        async def step(seconds: float) -> str:
+            await asyncio.sleep(0)
+            clock.now += seconds
+            return "done"
+
+        with report.phase("config"):
+            clock.now += 0.010
+        begin = report.now()
+        self.assertEqual(await report.timed("login", step(0.050)), "done")
+        report.record("first sync", begin)
+        report.finish(process_created_at=report.started_wall - 0.5)
+
+        self.assertEqual(
+            [(name, round(offset), round(elapsed)) for name, offset, elapsed in report.phases],
+            [("config", 0, 10), ("login", 10, 50), ("first sync", 10, 50)],
+        )
+        self.assertEqual(round(report.ready_ms), 60)
+        self.assertEqual(
+            report.format(),
+            "Startup ready in 60ms: boot 500ms, config 10ms@+0, login 50ms@+10, first sync 50ms@+10",
+        )
+
+    async def test_failed_phase_is_still_recorded(self) -> None:
+        report = StartupReport(_Clock())
+        with self.assertRaises(RuntimeError):
+            with report.phase("login"):
+                raise RuntimeError("bad token")
+        self.assertEqual(report.phases[0][0], "login")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sqlite3
+import tempfile
+import unittest
+
+try:
+    from app.storage import Storage
+except ModuleNotFoundError:
+    Storage = None
+
+
+@unittest.skipIf(Storage is None, "aiosqlite not installed in test environment")
+class NoteSearchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = Storage(f"{self.tmpdir.name}/bot.db")
+        await self.storage.init()
+        for text in ("明天開會討論預算", "hello world", "world hello", "繳月費", "abcdef"):
+            await self.storage.note_add(text, 0, "@alice:example.com", "!room:example.com")
+
+    async def asyncTearDown(self) -> None:
+        await self.storage.close()
+        self.tmpdir.cleanup()
+
+    async def _ids(self, query: str):
+        return [row[0] for row in await self.storage.note_search(query)]
+
+    async def test_cjk_substring_without_spaces(self) -> None:
+        self.assertTrue(self.storage.fts_enabled)
+        rows = await self.storage.note_search("開會討論")
+        self.assertEqual([row[0] for row in rows], [1])
+        self.assertIn("【開會討論】", rows[0][5])
+
+    async def test_phrase_and_prefix_queries(self) -> None:
+        self.assertEqual(await self._ids('"hello world"'), [2])
+        self.assertEqual(sorted(await self._ids("hello world")), [2, 3])
+        self.assertEqual(await self._ids("abc*"), [5])
+
+    async def test_short_terms_fall_back_to_like(self) -> None:
+        self.assertEqual(await self._ids("月費"), [4])
+
+    async def test_index_follows_delete(self) -> None:
+        async with self.storage.db.write() as db:
+            await db.execute("DELETE FROM note WHERE id = 1")
+        self.assertEqual(await self._ids("開會討論"), [])
+
+
+@unittest.skipIf(Storage is None, "aiosqlite not installed in test environment")
+class NoteSearchBackfillTest(unittest.IsolatedAsyncioTestCase):
+    async def test_init_backfills_existing_notes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = f"{tmpdir}/bot.db"
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "CREATE TABLE note (id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL, "
+                "created_at INTEGER NOT NULL, sender TEXT NOT NULL, room_id TEXT NOT NULL)"
+            )
+            conn.execute("INSERT INTO note (text, created_at, sender, room_id) VALUES ('舊的筆記內容', 0, '@a:x', '!r:x')")
+            conn.commit()
+            conn.close()
+
+            storage = Storage(db_path)
+            await storage.init()
+            rows = await storage.note_search("筆記內容")
+            await storage.close()
+        self.assertEqual([row[0] for row in rows], [1])
+
+
+@unittest.skipIf(Storage is None, "aiosqlite not installed in test environment")
+class ListingPaginationTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = Storage(f"{self.tmpdir.name}/bot.db")
+        await self.storage.init()
+        for i in range(1, 8):
+            await self.storage.todo_add(f"todo {i}", i)
+            await self.storage.note_add(f"note {i}", i, "@alice:example.com", "!room:example.com")
+        await self.storage.todo_done(2, 100)
+        await self.storage.todo_done(5, 100)
+
+    async def asyncTearDown(self) -> None:
+        await self.storage.close()
+        self.tmpdir.cleanup()
+
+    async def test_todo_pages_with_open_filter(self) -> None:
+        first = await self.storage.todo_list(limit=3, status="open")
+        self.assertEqual([row[0] for row in first.items], [1, 3, 4])
+        self.assertIsNotNone(first.next_after)
+
+        second = await self.storage.todo_list(limit=3, status="open", after=first.next_after)
+        self.assertEqual([row[0] for row in second.items], [6, 7])
+        self.assertEqual(second.offset, 3)
+        self.assertIsNone(second.next_after)
+
+    async def test_note_pages_newest_first(self) -> None:
+        first = await self.storage.note_list(4)
+        second = await self.storage.note_list(4, after=first.next_after)
+        self.assertEqual([row[0] for row in first.items], [7, 6, 5, 4])
+        self.assertEqual([row[0] for row in second.items], [3, 2, 1])
+        self.assertIsNone(second.next_after)
+
+    async def test_invalid_cursor_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            await self.storage.todo_list(after="not-a-cursor")
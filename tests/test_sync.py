@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from app.sync import SyncTokenStore, build_sync_filter, filter_digest
+
+
+class SyncFilterTest(unittest.TestCase):
+    def test_lean_filter_limits_rooms_and_event_types(self) -> None:
+        f = build_sync_filter(["!b:x", "!a:x"], timeline_limit=10)
+        room = f["room"]
+        self.assertEqual(room["rooms"], ["!a:x", "!b:x"])
+        self.assertIn("m.room.message", room["timeline"]["types"])
+        self.assertEqual(room["timeline"]["limit"], 10)
+        self.assertTrue(room["timeline"]["lazy_load_members"])
+        self.assertTrue(room["state"]["lazy_load_members"])
+        for section in (f["presence"], f["account_data"], room["ephemeral"]):
+            self.assertEqual(section, {"not_types": ["*"]})
+
+    def test_no_allowed_rooms_means_no_room_restriction(self) -> None:
+        self.assertNotIn("rooms", build_sync_filter([])["room"])
+
+    def test_digest_tracks_filter_content_not_room_order(self) -> None:
+        a = filter_digest(build_sync_filter(["!a:x", "!b:x"]))
+        self.assertEqual(a, filter_digest(build_sync_filter(["!b:x", "!a:x"])))
+        self.assertNotEqual(a, filter_digest(build_sync_filter(["!a:x"])))
+
+
+class SyncTokenStoreTest(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sync_token")
+            store = SyncTokenStore(path)
+            self.assertIsNone(store.load())
+            store.save("s1_2_3")
+            store.save("")
+            self.assertEqual(SyncTokenStore(path).load(), "s1_2_3")
+            self.assertEqual(os.listdir(tmp), ["sync_token"])
+
+
+if __name__ == "__main__":
+    unittest.main()